@@ -0,0 +1,44 @@
+"""Benchmark JWT authentication with and without token cache
+
+Measures the time spent validating an access token in a request (cold: token
+decoded and verified, warm: token found in cache).
+
+Usage::
+
+    python benchmarks/auth_token.py
+"""
+
+import functools
+import timeit
+import types
+
+import flask
+
+from bemserver_api.extensions.authentication import Auth
+from bemserver_api.settings import Config
+
+NUMBER = 10_000
+
+
+def make_auth(**config):
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(SECRET_KEY="Benchmark secret", **config)
+    return Auth(app)
+
+
+def main():
+    user = types.SimpleNamespace(email="user@example.com")
+    for name, config in (
+        ("cold", {"AUTH_TOKEN_CACHE_MAX_SIZE": 0}),
+        ("warm", {}),
+    ):
+        auth = make_auth(**config)
+        token = auth.encode(user)
+        func = functools.partial(auth.get_claims, token)
+        duration = min(timeit.repeat(func, number=NUMBER, repeat=5))
+        print(f"{name}: {duration / NUMBER * 1e6:.1f} µs per request")
+
+
+if __name__ == "__main__":
+    main()
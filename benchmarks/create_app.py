@@ -0,0 +1,60 @@
+"""Benchmark application startup
+
+Measures the time spent importing bemserver_api and creating the application,
+with all resource modules and with a subset of modules (ingestion tier). Each
+measure runs in a fresh interpreter so that import time is accounted for.
+
+BEMServer core settings file must be provided (database is not accessed)::
+
+    BEMSERVER_CORE_SETTINGS_FILE=core_settings.py python benchmarks/create_app.py
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPEAT = 5
+
+SCRIPT = """
+import time
+start = time.perf_counter()
+import bemserver_api
+app = bemserver_api.create_app()
+print(time.perf_counter() - start)
+"""
+
+CONFIGS = {
+    "all modules": "",
+    "ingestion modules": 'API_MODULES = ["timeseries", "timeseries_data"]',
+}
+
+
+def measure(settings):
+    with tempfile.NamedTemporaryFile("w", suffix=".py") as settings_file:
+        settings_file.write(settings)
+        settings_file.flush()
+        env = {**os.environ, "BEMSERVER_API_SETTINGS_FILE": settings_file.name}
+        durations = [
+            float(
+                subprocess.run(
+                    [sys.executable, "-c", SCRIPT],
+                    env=env,
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+            )
+            for _ in range(REPEAT)
+        ]
+    return statistics.median(durations)
+
+
+def main():
+    for name, settings in CONFIGS.items():
+        print(f"{name}: {measure(settings) * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark list serialization with TimeseriesSchema
+
+Measures the time spent dumping a list of timeseries with marshmallow and with
+the generated dump function, from ORM objects and from rows of a projected
+query (database time excluded).
+
+Usage::
+
+    BEMSERVER_CORE_SETTINGS_FILE=/path/to/settings.py \\
+        python benchmarks/serialization.py
+"""
+
+import collections
+import functools
+import timeit
+
+from bemserver_core.model import Timeseries
+
+from bemserver_api.extensions.smorest import AutoSchema
+from bemserver_api.resources.timeseries.schemas import TimeseriesSchema
+
+NB_ITEMS = 10_000
+
+
+def main():
+    schema = TimeseriesSchema(many=True)
+    objects = [
+        Timeseries(
+            id=i,
+            name=f"Timeseries {i}",
+            description=f"Test timeseries #{i}" if i % 2 else None,
+            unit_symbol="°C",
+            campaign_id=1,
+            campaign_scope_id=1,
+        )
+        for i in range(NB_ITEMS)
+    ]
+    _, attributes = schema._get_dump_function()
+    # Projected query rows provide the same attribute access as named tuples
+    row_cls = collections.namedtuple("Row", attributes)
+    rows = [row_cls(*(getattr(obj, attr) for attr in attributes)) for obj in objects]
+    for name, func in (
+        ("marshmallow", functools.partial(super(AutoSchema, schema).dump, objects)),
+        ("generated (objects)", functools.partial(schema.dump, objects)),
+        ("generated (rows)", functools.partial(schema.dump, rows)),
+    ):
+        duration = min(timeit.repeat(func, number=1, repeat=5))
+        print(f"{name}: {duration / NB_ITEMS * 1e6:.2f} µs per item")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
 from celery.schedules import crontab
 
 timezone = "Europe/Paris"
+# Register API tasks (timeseries data exports, description tree imports)
+# bemserver_api.worker invalidates API cache on writes. It reads API settings
+# file from BEMSERVER_API_SETTINGS_FILE environment variable.
+imports = [
+    "bemserver_api.worker",
+    "bemserver_api.resources.timeseries_data.exports",
+    "bemserver_api.resources.input_output.imports",
+]
 beat_schedule = {
     "cleanup": {
         "task": "Cleanup",
@@ -3,11 +3,10 @@
 import importlib
 
 import flask
-from werkzeug.middleware.profiler import ProfilerMiddleware
 
 from bemserver_core import BEMServerCore
 
-from . import database
+from . import database, profiling
 from .extensions import (  # noqa
     Api,
     AutoSchema,
@@ -15,6 +14,9 @@ from .extensions import (  # noqa
     Schema,
     SQLCursorPage,
     authentication,
+    cache,
+    instrumentation,
+    metrics,
 )
 from .resources import register_blueprints
 
@@ -22,11 +24,16 @@ API_VERSION = importlib.metadata.version("bemserver-api")
 OPENAPI_VERSION = "3.1.0"
 
 
+def load_config(config):
+    """Load API settings in config"""
+    config.from_object("bemserver_api.settings.Config")
+    config.from_envvar("BEMSERVER_API_SETTINGS_FILE", silent=True)
+
+
 def create_app():
     """Create application"""
     app = flask.Flask(__name__)
-    app.config.from_object("bemserver_api.settings.Config")
-    app.config.from_envvar("BEMSERVER_API_SETTINGS_FILE", silent=True)
+    load_config(app.config)
     app.json.sort_keys = False
 
     database.init_app(app)
@@ -38,13 +45,13 @@ def create_app():
     )
     api.init_app(app)
     authentication.auth.init_app(app)
-    register_blueprints(api)
+    cache.cache.init_app(app)
+    instrumentation.instrumentation.init_app(app)
+    metrics.metrics.init_app(app)
+    register_blueprints(app, api)
 
     app.extensions["bemserver_core"] = {"app": BEMServerCore()}
 
-    if profile_dir := app.config["PROFILE_DIR"]:
-        app.wsgi_app = ProfilerMiddleware(
-            app.wsgi_app, stream=None, profile_dir=profile_dir
-        )
+    profiling.init_app(app)
 
     return app
@@ -2,6 +2,8 @@
 
 import base64
 import datetime as dt
+import hmac
+import time
 from datetime import datetime
 from functools import wraps
 
@@ -20,6 +22,9 @@ from bemserver_core.model.users import User
 from bemserver_api.database import db
 from bemserver_api.exceptions import BEMServerAPIAuthenticationError
 
+from .cache import MemoryCache
+from .instrumentation import timer
+
 # https://docs.authlib.org/en/latest/jose/jwt.html#jwt-with-limited-algorithms
 jwt = JsonWebToken(["HS256"])
 
@@ -31,6 +36,9 @@ class Auth:
     ACCESS_TOKEN_LIFETIME = 60 * 15  # 15 minutes
     REFRESH_TOKEN_LIFETIME = 60 * 60 * 24 * 60  # 2 months
 
+    # User columns stored in user cache
+    USER_CACHE_FIELDS = ("id", "name", "email", "password", "_is_admin", "_is_active")
+
     GET_USER_FUNCS = {
         "Bearer": "get_user_jwt",
         "Basic": "get_user_http_basic_auth",
@@ -40,6 +48,9 @@ class Auth:
         self.key = None
         self.app = None
         self.get_user_funcs = None
+        self.user_cache = None
+        self.password_cache = None
+        self.token_cache = None
         if app is not None:
             self.init_app(app)
 
@@ -51,6 +62,22 @@ class Auth:
             for k, v in self.GET_USER_FUNCS.items()
             if k in app.config["AUTH_METHODS"]
         }
+        user_cache_ttl = app.config["AUTH_USER_CACHE_TTL"]
+        self.user_cache = (
+            MemoryCache(app.config["AUTH_USER_CACHE_MAX_SIZE"], user_cache_ttl)
+            if user_cache_ttl
+            else None
+        )
+        password_cache_ttl = app.config["AUTH_PASSWORD_CACHE_TTL"]
+        self.password_cache = (
+            MemoryCache(app.config["AUTH_PASSWORD_CACHE_MAX_SIZE"], password_cache_ttl)
+            if password_cache_ttl
+            else None
+        )
+        token_cache_max_size = app.config["AUTH_TOKEN_CACHE_MAX_SIZE"]
+        self.token_cache = (
+            MemoryCache(token_cache_max_size) if token_cache_max_size else None
+        )
 
     def encode(self, user, token_type="access"):
         token_lifetime = (
@@ -77,20 +104,90 @@ class Auth:
             },
         )
 
-    @staticmethod
-    def get_user_by_email(user_email):
-        return db.session.execute(
-            sqla.select(User).where(User.email == user_email)
-        ).scalar()
+    def get_claims(self, token):
+        """Decode and validate token, return claims
 
-    def get_user_jwt(self, creds, refresh=False):
+        If token cache is enabled, claims of valid tokens are cached until
+        token expiration to avoid decoding and verifying the token on each
+        request.
+        """
+        if self.token_cache is not None:
+            claims = self.token_cache.get(token)
+            if claims is not None:
+                return claims
         try:
-            claims = self.decode(creds)
+            claims = self.decode(token)
             claims.validate()
         except ExpiredTokenError as exc:
             raise BEMServerAPIAuthenticationError(code="expired_token") from exc
         except JoseError as exc:
             raise BEMServerAPIAuthenticationError(code="invalid_token") from exc
+        if self.token_cache is not None:
+            self.token_cache.set(
+                token,
+                claims,
+                ttl=claims["exp"] - time.time() if "exp" in claims else None,
+            )
+        return claims
+
+    def get_cache_stats(self):
+        """Return hits, misses and size of enabled authentication caches"""
+        return {
+            name: {"hits": cache.hits, "misses": cache.misses, "size": cache.size}
+            for name, cache in (
+                ("user", self.user_cache),
+                ("password", self.password_cache),
+                ("token", self.token_cache),
+            )
+            if cache is not None
+        }
+
+    def get_user_by_email(self, user_email):
+        """Return user from email, or None if not found
+
+        If user cache is enabled, user fields are cached to avoid querying the
+        database on each request.
+        """
+        if self.user_cache is None:
+            return self._query_user_by_email(user_email)
+        fields = self.user_cache.get(user_email)
+        if fields is None:
+            user = self._query_user_by_email(user_email)
+            if user is not None:
+                self.user_cache.set(
+                    user_email,
+                    {field: getattr(user, field) for field in self.USER_CACHE_FIELDS},
+                )
+            return user
+        # Use user instance if already loaded in session, as it may be newer
+        user = db.session.identity_map.get(db.session.identity_key(User, fields["id"]))
+        if user is not None:
+            return user
+        # Build user from cached fields and attach it to the session as if it
+        # was loaded from database, without querying
+        user = User(**fields)
+        sqla.orm.make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    @staticmethod
+    def _query_user_by_email(user_email):
+        return db.session.execute(
+            sqla.select(User).where(User.email == user_email)
+        ).scalar()
+
+    def invalidate_user(self, user_email):
+        """Remove user from user cache
+
+        Must be called when user is modified or deleted. Other processes get
+        the modification after AUTH_USER_CACHE_TTL.
+        """
+        if self.user_cache is not None:
+            self.user_cache.delete(user_email)
+        if self.password_cache is not None:
+            self.password_cache.delete(user_email)
+
+    def get_user_jwt(self, creds, refresh=False):
+        claims = self.get_claims(creds)
         if refresh is not (claims["type"] == "refresh"):
             raise BEMServerAPIAuthenticationError(code="invalid_token")
         user_email = claims["email"]
@@ -108,10 +205,38 @@ class Auth:
             raise BEMServerAPIAuthenticationError(code="malformed_credentials") from exc
         if (user := self.get_user_by_email(user_email)) is None:
             raise BEMServerAPIAuthenticationError(code="invalid_credentials")
-        if not user.check_password(password):
+        if not self.check_password(user, password):
             raise BEMServerAPIAuthenticationError(code="invalid_credentials")
         return user
 
+    def check_password(self, user, password):
+        """Check user password
+
+        If password cache is enabled, successful verifications are cached to
+        avoid computing the (purposely slow) password hash on each request.
+
+        The cache stores, for each user, a keyed digest of the last verified
+        password (not the password itself) and the password hash it was
+        verified against, so that it doesn't match anymore if the password
+        is changed.
+        """
+        if self.password_cache is None:
+            return user.check_password(password)
+        digest = hmac.digest(
+            self.key.encode(), f"{user.email}:{password}".encode(), "sha256"
+        )
+        cached = self.password_cache.get(user.email)
+        if (
+            cached is not None
+            and cached[1] == user.password
+            and hmac.compare_digest(cached[0], digest)
+        ):
+            return True
+        if not user.check_password(password):
+            return False
+        self.password_cache.set(user.email, (digest, user.password))
+        return True
+
     def get_user(self, refresh=False):
         if (auth_header := flask.request.headers.get("Authorization")) is None:
             raise BEMServerAPIAuthenticationError(code="missing_authentication")
@@ -137,7 +262,8 @@ class Auth:
             @wraps(func)
             def wrapper(*args, **func_kwargs):
                 try:
-                    user = self.get_user(refresh=refresh)
+                    with timer("auth"):
+                        user = self.get_user(refresh=refresh)
                 except BEMServerAPIAuthenticationError as exc:
                     abort(
                         401,
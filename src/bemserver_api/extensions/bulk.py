@@ -0,0 +1,220 @@
+"""Bulk operations
+
+Create, update or delete many items of a resource in a single request and
+transaction.
+
+Operations are first applied to all items in a savepoint and flushed at once,
+so that rows are written in batches. If an item fails (authorization,
+integrity, invalid value), the savepoint is rolled back and operations are
+applied again item by item, each in its own savepoint, to report the status of
+each item. Successful operations are committed at the end.
+
+Bulk updates and deletes don't check ETags. The number of items per request is
+limited by BULK_MAX_ITEMS setting.
+"""
+
+import http
+
+import sqlalchemy as sqla
+
+import flask
+
+import marshmallow as ma
+
+from bemserver_core.authorization import BEMServerAuthorizationError
+from bemserver_core.database import db
+from bemserver_core.exceptions import PropertyTypeInvalidError
+
+from .integrity_error import catch_integrity_error, get_integrity_error_message
+from .smorest import Schema
+
+
+class BulkItemError(Exception):
+    """Error on an item of a bulk operation"""
+
+    def __init__(self, status, message=None, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message or http.HTTPStatus(status).phrase
+        self.errors = errors
+
+
+def _get_item_error(exc):
+    """Return BulkItemError matching an exception"""
+    if isinstance(exc, BulkItemError):
+        return exc
+    if isinstance(exc, BEMServerAuthorizationError):
+        return BulkItemError(403, "Authorization error")
+    if isinstance(exc, sqla.exc.IntegrityError):
+        return BulkItemError(409, get_integrity_error_message(exc))
+    # PropertyTypeInvalidError
+    return BulkItemError(422, errors={"value": ["Invalid type."]})
+
+
+ITEM_ERRORS = (
+    BulkItemError,
+    BEMServerAuthorizationError,
+    sqla.exc.IntegrityError,
+    PropertyTypeInvalidError,
+)
+
+
+def _run_one(item_id, operation, status):
+    """Run operation in a savepoint and return result"""
+    try:
+        with db.session.begin_nested():
+            item = operation()
+            db.session.flush()
+    except ITEM_ERRORS as exc:
+        error = _get_item_error(exc)
+        result = {"status": error.status, "message": error.message}
+        if item_id is not None:
+            result["id"] = item_id
+        if error.errors is not None:
+            result["errors"] = error.errors
+        return result
+    return {"status": status, "id": item.id, "item": item}
+
+
+def _run(operations, status):
+    """Run operations
+
+    :param list operations: List of (item ID, operation). Item ID is None for
+        creations. Each operation is a callable returning the created, updated
+        or deleted item.
+    :param int status: Status of successful operations
+
+    Returns a list of results as dicts.
+    """
+    try:
+        with db.session.begin_nested():
+            items = [operation() for _, operation in operations]
+            db.session.flush()
+    except ITEM_ERRORS:
+        # Run operations one by one to get the status of each item
+        return [
+            _run_one(item_id, operation, status) for item_id, operation in operations
+        ]
+    return [{"status": status, "id": item.id, "item": item} for item in items]
+
+
+def _commit(results, schema):
+    # Dump items before commit expires them
+    for result in results:
+        if "item" in result:
+            if schema is None:
+                del result["item"]
+            else:
+                result["item"] = schema.dump(result["item"])
+    with catch_integrity_error():
+        db.session.commit()
+    return results
+
+
+def _get_items(model_cls, item_ids):
+    """Return readable items by ID"""
+    return {
+        item.id: item for item in model_cls.get().filter(model_cls.id.in_(item_ids))
+    }
+
+
+def create(model_cls, new_items, schema):
+    """Create items
+
+    :param model_cls: Model class
+    :param list new_items: Creation kwargs of each item
+    :param Schema schema: Schema used to dump created items
+    """
+
+    def make_operation(new_item):
+        return lambda: model_cls.new(**new_item)
+
+    operations = [(None, make_operation(new_item)) for new_item in new_items]
+    return _commit(_run(operations, 201), schema)
+
+
+def update(model_cls, new_items, schema):
+    """Update items
+
+    :param model_cls: Model class
+    :param list new_items: Update kwargs of each item, including item ID
+    :param Schema schema: Schema used to dump updated items
+    """
+    items = _get_items(model_cls, [new_item["id"] for new_item in new_items])
+
+    def make_operation(item_id, kwargs):
+        def operation():
+            item = items.get(item_id)
+            if item is None:
+                raise BulkItemError(404)
+            item.update(**kwargs)
+            return item
+
+        return operation
+
+    operations = []
+    for new_item in new_items:
+        kwargs = dict(new_item)
+        item_id = kwargs.pop("id")
+        operations.append((item_id, make_operation(item_id, kwargs)))
+    return _commit(_run(operations, 200), schema)
+
+
+def delete(model_cls, item_ids):
+    """Delete items
+
+    :param model_cls: Model class
+    :param list item_ids: IDs of items to delete
+    """
+    items = _get_items(model_cls, item_ids)
+
+    def make_operation(item_id):
+        def operation():
+            item = items.get(item_id)
+            if item is None:
+                raise BulkItemError(404)
+            item.delete()
+            return item
+
+        return operation
+
+    operations = [(item_id, make_operation(item_id)) for item_id in item_ids]
+    return _commit(_run(operations, 204), None)
+
+
+class BulkResultSchema(Schema):
+    """Status of an item of a bulk operation
+
+    Subclasses add an item field to return created or updated items.
+    """
+
+    status = ma.fields.Integer(
+        metadata={"description": "HTTP status code of item operation"}
+    )
+    id = ma.fields.Integer()
+    message = ma.fields.String()
+    errors = ma.fields.Dict()
+
+
+def validate_item_count(items):
+    """Check item count doesn't exceed BULK_MAX_ITEMS setting"""
+    ma.validate.Length(max=flask.current_app.config["BULK_MAX_ITEMS"])(items)
+
+
+class BulkItemsMixinSchema(Schema):
+    """Limit the number of items loaded by a bulk operation schema"""
+
+    @ma.pre_load(pass_many=True)
+    def check_item_count(self, data, many, **kwargs):
+        # Check before loading items
+        if many and isinstance(data, list):
+            validate_item_count(data)
+        return data
+
+
+class BulkDeleteSchema(Schema):
+    """IDs of items to delete"""
+
+    ids = ma.fields.List(
+        ma.fields.Integer(), required=True, validate=validate_item_count
+    )
@@ -0,0 +1,307 @@
+"""Cache
+
+Key/value cache used by resources to store computed responses.
+
+Entries are kept in separate stores, so that entries of a kind don't evict
+entries of another kind:
+
+- "responses": computed responses and counts
+- "watermarks": watermarks identifying data versions (see get_watermark)
+- "rollups": timeseries data rollup blocks
+
+Backends:
+
+- "memory": in-process LRU cache. Each worker process has its own cache.
+- "filesystem": cache stored as files in a local directory, shared by all
+  worker processes of the host.
+
+Cached data is identified by watermarks renewed on writes. Writes done in a
+process can't renew watermarks of other processes, so the memory backend is
+disabled when the server runs several processes. Celery workers renew
+watermarks of the filesystem backend (see init_worker). Writes done by other
+means are only visible after expiration, so entries must have a finite
+lifetime (CACHE_DEFAULT_TTL).
+"""
+
+import collections
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+
+import flask
+
+
+class MemoryCache:
+    """In-process LRU cache
+
+    :param int max_size: Maximum number of entries
+    :param int default_ttl: Default entry lifetime in seconds (None: no expiration)
+    """
+
+    # Not shared with other processes
+    shared = False
+
+    def __init__(self, max_size, default_ttl=None):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def size(self):
+        return len(self._entries)
+
+
+class FileSystemCache:
+    """Cache stored in a local directory
+
+    Entries are pickled in files. When the cache is full, least recently used
+    files are removed.
+
+    :param str cache_dir: Cache directory
+    :param int max_size: Maximum number of entries
+    :param int default_ttl: Default entry lifetime in seconds (None: no expiration)
+    """
+
+    # Shared with other processes of the host, including workers
+    shared = True
+
+    def __init__(self, cache_dir, max_size, default_ttl=None):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._sets = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _get_path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, key, default=None):
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+        # Wall clock time as the cache is shared between processes
+        if expires is not None and expires < time.time():
+            self.delete(key)
+            self.misses += 1
+            return default
+        # Update access time for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:  # pragma: no cover
+            pass
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires = time.time() + ttl if ttl is not None else None
+        # Write to temporary file then rename to make the write atomic
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((expires, value), f)
+        os.replace(tmp_path, self._get_path(key))
+        # Pruning scans the directory: only prune every 1% of max size
+        self._sets += 1
+        if self._sets >= self.max_size // 100:
+            self._sets = 0
+            self._prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._get_path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for entry in self._iter_entries():
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:  # pragma: no cover
+                pass
+
+    def _iter_entries(self):
+        with os.scandir(self.cache_dir) as it:
+            yield from (entry for entry in it if not entry.name.startswith("."))
+
+    def _prune(self):
+        entries = list(self._iter_entries())
+        if len(entries) <= self.max_size:
+            return
+        # Entries may be removed by another process while iterating
+        mtimes = {}
+        for entry in entries:
+            try:
+                mtimes[entry.path] = entry.stat().st_mtime
+            except FileNotFoundError:  # pragma: no cover
+                pass
+        for path in sorted(mtimes, key=mtimes.get)[: len(mtimes) - self.max_size]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # pragma: no cover
+                pass
+
+    @property
+    def size(self):
+        return sum(1 for _ in self._iter_entries())
+
+
+def get_watermark(backend, key):
+    """Return watermark stored at key
+
+    Watermarks are random tokens deleted each time the data they identify is
+    modified. Data derived from it (cached responses, ETags) is identified by
+    the watermark, so that it is never used once the data is modified.
+
+    If the watermark is missing (never set, modified or evicted), a new one is
+    started, discarding derived data.
+    """
+    token = backend.get(key)
+    if token is None:
+        token = uuid.uuid4().hex
+        backend.set(key, token)
+    return token
+
+
+# Store name -> setting of the maximum number of entries
+STORES = {
+    "responses": "CACHE_MAX_SIZE",
+    "watermarks": "CACHE_WATERMARKS_MAX_SIZE",
+    "rollups": "CACHE_ROLLUPS_MAX_SIZE",
+}
+
+
+def _make_stores(config):
+    backend = config["CACHE_BACKEND"]
+    default_ttl = config["CACHE_DEFAULT_TTL"]
+    if backend is None:
+        return None
+    if default_ttl is None:
+        raise ValueError("CACHE_DEFAULT_TTL must be set when cache is enabled")
+    if backend == "memory":
+        return {
+            name: MemoryCache(config[setting], default_ttl)
+            for name, setting in STORES.items()
+        }
+    if backend == "filesystem":
+        return {
+            name: FileSystemCache(
+                os.path.join(config["CACHE_DIR"], name), config[setting], default_ttl
+            )
+            for name, setting in STORES.items()
+        }
+    raise ValueError(f'Unknown cache backend "{backend}"')
+
+
+class Cache:
+    """Cache extension
+
+    The backend is chosen with CACHE_BACKEND setting. Cache is disabled if
+    CACHE_BACKEND is None.
+    """
+
+    def __init__(self, app=None):
+        # Stores used outside of application context, in workers
+        self._worker_stores = None
+        if app is not None:
+            self.init_app(app)
+
+    @staticmethod
+    def init_app(app):
+        app.extensions["cache"] = _make_stores(app.config)
+
+    def init_worker(self, config):
+        """Open cache in a process running no application (e.g. Celery worker)
+
+        Watermarks of data written by the process are renewed outside of
+        application context. Only the filesystem backend is shared with the API
+        processes, other backends are ignored.
+
+        :param dict config: API settings
+        """
+        if config["CACHE_BACKEND"] == "filesystem":
+            self._worker_stores = _make_stores(config)
+
+    def get_store(self, name):
+        """Return store of current app, or None if cache is disabled"""
+        if not flask.has_app_context():
+            return None if self._worker_stores is None else self._worker_stores[name]
+        app = flask.current_app
+        stores = app.extensions.get("cache")
+        if stores is None:
+            return None
+        if (
+            isinstance(stores[name], MemoryCache)
+            and flask.has_request_context()
+            and flask.request.environ.get("wsgi.multiprocess", False)
+        ):
+            app.logger.warning(
+                "Memory cache disabled as server runs several processes. "
+                'Use "filesystem" CACHE_BACKEND.'
+            )
+            app.extensions["cache"] = None
+            return None
+        return stores[name]
+
+    @property
+    def backend(self):
+        """Response store of current app, or None if cache is disabled"""
+        return self.get_store("responses")
+
+    @property
+    def watermarks(self):
+        """Watermark store of current app, or None if cache is disabled"""
+        return self.get_store("watermarks")
+
+    def clear(self):
+        """Clear all stores"""
+        for name in STORES:
+            if (store := self.get_store(name)) is not None:
+                store.clear()
+
+
+cache = Cache()
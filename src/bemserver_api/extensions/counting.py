@@ -0,0 +1,73 @@
+"""Item count estimates
+
+Exact counts of paginated listings require a scan of all matching rows. When
+an estimate is enough, counts are
+
+- read from cache, if cache is enabled. Cached counts are computed exactly on
+  cache miss and discarded after a TTL or when a table involved in the query
+  is modified through the API.
+- estimated by the query planner otherwise. Small estimates are not reliable,
+  so counts estimated below a threshold are computed exactly.
+"""
+
+import hashlib
+
+import sqlalchemy as sqla
+from sqlalchemy.ext.compiler import compiles
+
+import flask
+
+from bemserver_core.database import db
+
+from . import watermarks
+from .cache import cache
+
+COUNT_KEY = "item_count:{}"
+
+
+class Explain(sqla.sql.expression.Executable, sqla.sql.expression.ClauseElement):
+    """EXPLAIN statement returning query plan as JSON"""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kwargs):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kwargs)
+
+
+def planner_estimate(query):
+    """Return row count of query estimated by the query planner"""
+    (plan,) = db.session.execute(Explain(query.statement)).scalar()
+    return plan["Plan"]["Plan Rows"]
+
+
+def count_key(query):
+    """Return cache key for query count"""
+    version = watermarks.get_query_version(cache.watermarks, query)
+    return COUNT_KEY.format(hashlib.sha256(version.encode()).hexdigest())
+
+
+def estimate_count(query):
+    """Return estimated count of query items
+
+    Returns a tuple (count, exact) where exact is True if the count was
+    computed in this call.
+    """
+    config = flask.current_app.config
+    backend = cache.backend
+    if backend is not None:
+        key = count_key(query)
+        count = backend.get(key)
+        if count is not None:
+            return count, False
+        count = query.count()
+        backend.set(key, count, ttl=config["PAGINATION_COUNT_CACHE_TTL"])
+        return count, True
+    count = planner_estimate(query)
+    if count < config["PAGINATION_COUNT_ESTIMATE_THRESHOLD"]:
+        return query.count(), True
+    return count, False
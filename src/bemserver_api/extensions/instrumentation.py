@@ -0,0 +1,230 @@
+"""Instrumentation
+
+Lightweight per-request instrumentation, cheap enough to run in production.
+
+For each request, the following is recorded:
+
+- number of SQL queries and time spent in database
+- time spent authenticating user
+- time spent serializing response
+
+Values are exposed in a Server-Timing response header and aggregated per
+endpoint. Aggregated values are published by the metrics endpoint, if enabled.
+
+Data streamed after the response is returned is not accounted for.
+
+Worker threads running parts of a request record their own instrumentation,
+which is merged into the request's in the request thread.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import sqlalchemy as sqla
+
+import flask
+
+# Timed request steps
+STEPS = ("db", "auth", "serialization")
+
+# Instrumentation of current worker thread, if any
+_thread_stats = contextvars.ContextVar("instrumentation_thread_stats", default=None)
+
+
+class RequestStats:
+    """Instrumentation of a request"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.auth = 0.0
+        self.serialization = 0.0
+        # End of view function execution, to compute serialization time
+        self.view_end = None
+
+    def get_server_timing(self, total):
+        """Return Server-Timing header value (durations in ms)"""
+        return ", ".join(
+            [
+                f'db;dur={self.db * 1000:.3f};desc="{self.queries} queries"',
+                f"auth;dur={self.auth * 1000:.3f}",
+                f"serialization;dur={self.serialization * 1000:.3f}",
+                f"total;dur={total * 1000:.3f}",
+            ]
+        )
+
+
+class EndpointStats:
+    """Instrumentation aggregated per endpoint"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, request_stats, total):
+        with self._lock:
+            stats = self._stats.setdefault(
+                endpoint,
+                {"count": 0, "queries": 0, "total": 0.0, **dict.fromkeys(STEPS, 0.0)},
+            )
+            stats["count"] += 1
+            stats["queries"] += request_stats.queries
+            stats["total"] += total
+            for step in STEPS:
+                stats[step] += getattr(request_stats, step)
+
+    def get(self):
+        """Return endpoint -> counters mapping
+
+        Counters are request count, query count, and total, database,
+        authentication and serialization times in seconds.
+        """
+        with self._lock:
+            return {endpoint: stats.copy() for endpoint, stats in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def get_request_stats():
+    """Return instrumentation of current request, or None if disabled
+
+    In a worker thread started with start_thread_stats, return the instrumentation
+    of the thread.
+    """
+    if (stats := _thread_stats.get()) is not None:
+        return stats
+    if not flask.has_app_context():
+        return None
+    return flask.g.get("_instrumentation")
+
+
+def start_thread_stats():
+    """Record instrumentation of current worker thread apart from the request's
+
+    Must be called in the worker thread, running in a copy of the request
+    context. Returns thread instrumentation, to be merged in the request thread
+    with merge_thread_stats, or None if disabled.
+    """
+    if get_request_stats() is None:
+        return None
+    stats = RequestStats()
+    _thread_stats.set(stats)
+    return stats
+
+
+def merge_thread_stats(thread_stats):
+    """Add instrumentation of a worker thread to current request's
+
+    Times spent in parallel threads are summed.
+    """
+    if thread_stats is None or (stats := get_request_stats()) is None:
+        return
+    stats.queries += thread_stats.queries
+    for step in STEPS:
+        setattr(stats, step, getattr(stats, step) + getattr(thread_stats, step))
+
+
+@contextmanager
+def timer(step):
+    """Add time spent in context to a step of current request"""
+    stats = get_request_stats()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(stats, step, getattr(stats, step) + time.perf_counter() - start)
+
+
+def time_serialization(response_decorator, func):
+    """Apply a response decorator to a view function, timing serialization
+
+    Serialization time is the time spent in the response decorator after the
+    view function returns.
+    """
+
+    @wraps(func)
+    def view(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if (stats := get_request_stats()) is not None:
+            stats.view_end = time.perf_counter()
+        return result
+
+    decorated = response_decorator(view)
+
+    @wraps(decorated)
+    def wrapper(*args, **kwargs):
+        resp = decorated(*args, **kwargs)
+        if (stats := get_request_stats()) is not None and stats.view_end is not None:
+            stats.serialization += time.perf_counter() - stats.view_end
+            stats.view_end = None
+        return resp
+
+    return wrapper
+
+
+@sqla.event.listens_for(sqla.engine.Engine, "before_cursor_execute")
+def receive_before_cursor_execute(conn, cursor, statement, params, context, many):
+    if context is not None and get_request_stats() is not None:
+        context._instrumentation_start = time.perf_counter()
+
+
+@sqla.event.listens_for(sqla.engine.Engine, "after_cursor_execute")
+def receive_after_cursor_execute(conn, cursor, statement, params, context, many):
+    start = getattr(context, "_instrumentation_start", None)
+    if start is None:
+        return
+    if (stats := get_request_stats()) is not None:
+        stats.queries += 1
+        stats.db += time.perf_counter() - start
+
+
+def _start_request(sender, **kwargs):
+    flask.g._instrumentation = RequestStats()
+
+
+def _finish_request(sender, response, **kwargs):
+    stats = flask.g.pop("_instrumentation", None)
+    if stats is None:
+        return
+    total = time.perf_counter() - stats.start
+    response.headers["Server-Timing"] = stats.get_server_timing(total)
+    sender.extensions["instrumentation"].record(
+        flask.request.endpoint or "<unknown>", stats, total
+    )
+
+
+class Instrumentation:
+    """Instrumentation extension
+
+    Instrumentation is enabled with INSTRUMENTATION setting.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    @staticmethod
+    def init_app(app):
+        if not app.config["INSTRUMENTATION"]:
+            app.extensions["instrumentation"] = None
+            return
+        app.extensions["instrumentation"] = EndpointStats()
+        flask.request_started.connect(_start_request, app)
+        flask.request_finished.connect(_finish_request, app)
+
+    @property
+    def stats(self):
+        """Endpoint stats of current app, or None if instrumentation is disabled"""
+        return flask.current_app.extensions.get("instrumentation")
+
+
+instrumentation = Instrumentation()
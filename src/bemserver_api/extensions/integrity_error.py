@@ -11,6 +11,16 @@ import sqlalchemy as sqla
 from flask_smorest import abort
 
 
+def get_integrity_error_message(exc):
+    """Return error message matching an integrity error"""
+    if isinstance(exc.orig, ppe.UniqueViolation):
+        return "Unique constraint violation"
+    if isinstance(exc.orig, ppe.ForeignKeyViolation):
+        return "Foreign key constraint violation"
+    # Shouldn't happen
+    return None
+
+
 class catch_integrity_error(contextlib.ContextDecorator):
     """Context manager catching integrity errors
 
@@ -22,10 +32,8 @@ class catch_integrity_error(contextlib.ContextDecorator):
 
     def __exit__(self, exc_type, exc_value, traceback):
         if exc_type and issubclass(exc_type, sqla.exc.IntegrityError):
-            if isinstance(exc_value.orig, ppe.UniqueViolation):
-                abort(409, message="Unique constraint violation")
-            if isinstance(exc_value.orig, ppe.ForeignKeyViolation):
-                abort(409, message="Foreign key constraint violation")
-            # Shouldn't happen
-            abort(409)
+            message = get_integrity_error_message(exc_value)
+            if message is None:
+                abort(409)
+            abort(409, message=message)
         return False
@@ -0,0 +1,347 @@
+"""Metrics
+
+Request metrics exposed in Prometheus text format:
+
+- request count per blueprint, endpoint, method and status
+- request duration and response size histograms per blueprint and endpoint
+- in-flight requests
+- database connection pool usage
+- timeseries data points inserted (duplicate points are not counted)
+- authentication and response cache hits and misses
+- SQL queries and time spent per request step per endpoint, if instrumentation
+  is enabled (see instrumentation)
+
+Each process has its own metrics. When running several processes, metrics
+should be scraped from each process or aggregated by a multiprocess-aware
+collector.
+
+Durations don't include the time spent streaming responses.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+
+import sqlalchemy as sqla
+
+import flask
+
+from bemserver_core.database import db
+from bemserver_core.model import TimeseriesData
+
+from .authentication import auth
+from .cache import cache
+from .instrumentation import STEPS, instrumentation
+
+PREFIX = "bemserver_api"
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Session info key storing the number of timeseries data points inserted in
+# transaction
+POINTS_KEY = "metrics_timeseries_data_points"
+
+# Number of rows inserted by the timeseries data insert being executed
+_inserted_rows = contextvars.ContextVar("inserted_rows", default=None)
+
+
+class Histogram:
+    """Histogram counts, sum and count"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        if idx < len(self.buckets):
+            self.counts[idx] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels):
+    def escape(value):
+        return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+    return ",".join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+def _iter_metric(name, metric_type, description, values):
+    """Iterate over lines of a metric
+
+    :param dict values: Mapping of labels -> value
+    """
+    yield f"# HELP {name} {description}"
+    yield f"# TYPE {name} {metric_type}"
+    for labels, value in values.items():
+        if labels:
+            yield f"{name}{{{_format_labels(labels)}}} {value}"
+        else:
+            yield f"{name} {value}"
+
+
+def _iter_histogram(name, description, histograms):
+    """Iterate over lines of a histogram metric
+
+    :param dict histograms: Mapping of labels -> Histogram
+    """
+    yield f"# HELP {name} {description}"
+    yield f"# TYPE {name} histogram"
+    for labels, hist in histograms.items():
+        cumulative = 0
+        for bound, count in zip(hist.buckets, hist.counts, strict=True):
+            cumulative += count
+            bucket_labels = _format_labels((*labels, ("le", bound)))
+            yield f"{name}_bucket{{{bucket_labels}}} {cumulative}"
+        bucket_labels = _format_labels((*labels, ("le", "+Inf")))
+        yield f"{name}_bucket{{{bucket_labels}}} {hist.count}"
+        yield f"{name}_sum{{{_format_labels(labels)}}} {hist.sum}"
+        yield f"{name}_count{{{_format_labels(labels)}}} {hist.count}"
+
+
+class MetricsRegistry:
+    """Metrics of an application"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = {}
+        self.durations = {}
+        self.sizes = {}
+        self.points = {}
+
+    def start_request(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def end_request(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_request(self, blueprint, endpoint, method, status, duration, size):
+        key = (("blueprint", blueprint), ("endpoint", endpoint))
+        with self._lock:
+            req_key = (*key, ("method", method), ("status", status))
+            self.requests[req_key] = self.requests.get(req_key, 0) + 1
+            if key not in self.durations:
+                self.durations[key] = Histogram(DURATION_BUCKETS)
+            self.durations[key].observe(duration)
+            if size is not None:
+                if key not in self.sizes:
+                    self.sizes[key] = Histogram(SIZE_BUCKETS)
+                self.sizes[key].observe(size)
+
+    def record_points(self, endpoint, count):
+        key = (("endpoint", endpoint),)
+        with self._lock:
+            self.points[key] = self.points.get(key, 0) + count
+
+    def _iter_lines(self):
+        yield from _iter_metric(
+            f"{PREFIX}_requests_total", "counter", "Number of requests", self.requests
+        )
+        yield from _iter_histogram(
+            f"{PREFIX}_request_duration_seconds", "Request duration", self.durations
+        )
+        yield from _iter_histogram(
+            f"{PREFIX}_response_size_bytes", "Response size", self.sizes
+        )
+        yield from _iter_metric(
+            f"{PREFIX}_requests_in_flight",
+            "gauge",
+            "Number of requests being processed",
+            {(): self.in_flight},
+        )
+        yield from _iter_metric(
+            f"{PREFIX}_timeseries_data_points_total",
+            "counter",
+            "Number of timeseries data points inserted",
+            self.points,
+        )
+
+    def render(self):
+        """Return metrics in Prometheus text format"""
+        with self._lock:
+            lines = list(self._iter_lines())
+        lines.extend(_iter_pool_lines())
+        lines.extend(_iter_cache_lines())
+        lines.extend(_iter_instrumentation_lines())
+        return "\n".join(lines) + "\n"
+
+
+def _iter_pool_lines():
+    pool = db.engine.pool if db.engine is not None else None
+    # Only QueuePool provides usage statistics
+    if not isinstance(pool, sqla.pool.QueuePool):
+        return
+    for name, description, value in (
+        ("size", "Size of database connection pool", pool.size()),
+        ("checked_out", "Database connections in use", pool.checkedout()),
+        ("overflow", "Database connections in overflow", pool.overflow()),
+    ):
+        yield from _iter_metric(
+            f"{PREFIX}_db_pool_{name}", "gauge", description, {(): value}
+        )
+
+
+def _iter_cache_lines():
+    caches = {
+        (("cache", name),): stats for name, stats in auth.get_cache_stats().items()
+    }
+    for name, label in (
+        ("responses", "response"),
+        ("watermarks", "watermark"),
+        ("rollups", "rollup"),
+    ):
+        if (store := cache.get_store(name)) is not None:
+            caches[(("cache", label),)] = {"hits": store.hits, "misses": store.misses}
+    for counter in ("hits", "misses"):
+        yield from _iter_metric(
+            f"{PREFIX}_cache_{counter}_total",
+            "counter",
+            f"Number of cache {counter}",
+            {labels: stats[counter] for labels, stats in caches.items()},
+        )
+
+
+def _iter_instrumentation_lines():
+    if (stats := instrumentation.stats) is None:
+        return
+    endpoints = stats.get()
+    yield from _iter_metric(
+        f"{PREFIX}_db_queries_total",
+        "counter",
+        "Number of SQL queries",
+        {
+            (("endpoint", endpoint),): counters["queries"]
+            for endpoint, counters in endpoints.items()
+        },
+    )
+    yield from _iter_metric(
+        f"{PREFIX}_request_step_seconds_total",
+        "counter",
+        "Time spent in request steps",
+        {
+            (("endpoint", endpoint), ("step", step)): counters[step]
+            for endpoint, counters in endpoints.items()
+            for step in STEPS
+        },
+    )
+
+
+def _start_request(sender, **kwargs):
+    flask.g._metrics_start = time.perf_counter()
+    sender.extensions["metrics"].start_request()
+
+
+def _finish_request(sender, response, **kwargs):
+    start = flask.g.get("_metrics_start")
+    if start is None:
+        return
+    request = flask.request
+    sender.extensions["metrics"].record_request(
+        request.blueprint or "",
+        request.endpoint or "",
+        request.method,
+        response.status_code,
+        time.perf_counter() - start,
+        None if response.is_streamed else response.content_length,
+    )
+
+
+def _tear_down_request(sender, **kwargs):
+    if flask.g.pop("_metrics_start", None) is not None:
+        sender.extensions["metrics"].end_request()
+
+
+@sqla.event.listens_for(db.session, "do_orm_execute")
+def receive_do_orm_execute(orm_execute_state):
+    """Count timeseries data points inserted in transaction
+
+    The statement is executed here to count rows inserted by the cursor rather
+    than parameters, as duplicate points are ignored (ON CONFLICT DO NOTHING).
+    """
+    if not flask.has_request_context() or not flask.current_app.extensions.get(
+        "metrics"
+    ):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if (
+        orm_execute_state.is_insert
+        and mapper is not None
+        and mapper.class_ is TimeseriesData
+    ):
+        inserted_rows = [0]
+        token = _inserted_rows.set(inserted_rows)
+        try:
+            result = orm_execute_state.invoke_statement()
+        finally:
+            _inserted_rows.reset(token)
+        info = orm_execute_state.session.info
+        info[POINTS_KEY] = info.get(POINTS_KEY, 0) + inserted_rows[0]
+        return result
+
+
+@sqla.event.listens_for(sqla.engine.Engine, "after_cursor_execute")
+def receive_after_cursor_execute(conn, cursor, statement, params, context, many):
+    """Count rows inserted by timeseries data insert"""
+    inserted_rows = _inserted_rows.get()
+    if (
+        inserted_rows is not None
+        and context is not None
+        and context.isinsert
+        and context.compiled.statement.table.name == TimeseriesData.__table__.name
+        and cursor.rowcount > 0
+    ):
+        inserted_rows[0] += cursor.rowcount
+
+
+@sqla.event.listens_for(db.session, "after_commit")
+def receive_after_commit(session):
+    """Record timeseries data points inserted in transaction"""
+    count = session.info.pop(POINTS_KEY, 0)
+    if count and flask.has_request_context():
+        flask.current_app.extensions["metrics"].record_points(
+            flask.request.endpoint or "", count
+        )
+
+
+@sqla.event.listens_for(db.session, "after_rollback")
+def receive_after_rollback(session):
+    """Forget timeseries data points of rolled back transaction"""
+    session.info.pop(POINTS_KEY, None)
+
+
+class Metrics:
+    """Metrics extension
+
+    Metrics are enabled with METRICS setting.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    @staticmethod
+    def init_app(app):
+        if not app.config["METRICS"]:
+            app.extensions["metrics"] = None
+            return
+        app.extensions["metrics"] = MetricsRegistry()
+        flask.request_started.connect(_start_request, app)
+        flask.request_finished.connect(_finish_request, app)
+        flask.request_tearing_down.connect(_tear_down_request, app)
+
+    @property
+    def registry(self):
+        """Metrics registry of current app, or None if metrics are disabled"""
+        return flask.current_app.extensions.get("metrics")
+
+
+metrics = Metrics()
@@ -0,0 +1,163 @@
+"""Keyset pagination
+
+Keyset pagination selects the items following the last item of the previous
+page by comparing sort keys rather than by skipping items with OFFSET, so that
+the cost of a page doesn't depend on its depth.
+
+The last item is identified by an opaque cursor containing its sort key values.
+The primary key is appended to the sort keys to ensure the order is total.
+"""
+
+import base64
+import binascii
+import datetime as dt
+import enum
+import json
+
+import sqlalchemy as sqla
+from sqlalchemy.sql import operators
+
+import marshmallow as ma
+
+
+class SortKey:
+    """Sort key of a query: mapped attribute name, column and direction"""
+
+    def __init__(self, name, column, descending):
+        self.name = name
+        self.column = column
+        self.descending = descending
+
+    @property
+    def signature(self):
+        return f"-{self.name}" if self.descending else self.name
+
+    def after(self, value):
+        """Condition selecting rows strictly after value
+
+        Assumes PostgreSQL NULL ordering (NULLS LAST in ascending order, NULLS
+        FIRST in descending order).
+        """
+        col = self.column
+        if self.descending:
+            return col.is_not(None) if value is None else col < value
+        if value is None:
+            return sqla.false()
+        if col.nullable:
+            return sqla.or_(col > value, col.is_(None))
+        return col > value
+
+    def equal(self, value):
+        return self.column.is_(None) if value is None else self.column == value
+
+
+def get_sort_keys(query):
+    """Return sort keys of a query
+
+    The primary key is appended to the sort keys, if not already sorted upon.
+
+    Raises ValueError if the query is sorted by an expression that is not a
+    column of the queried entity.
+    """
+    mapper = sqla.inspect(query.column_descriptions[0]["entity"])
+    keys = []
+    for clause in query._order_by_clauses:
+        descending = False
+        if isinstance(clause, sqla.UnaryExpression):
+            if clause.modifier not in (operators.asc_op, operators.desc_op):
+                raise ValueError(f"Unsupported sort expression: {clause}")
+            descending = clause.modifier is operators.desc_op
+            clause = clause.element
+        try:
+            prop = mapper.get_property_by_column(clause)
+        except (sqla.orm.exc.UnmappedColumnError, AttributeError) as exc:
+            raise ValueError(f"Unsupported sort expression: {clause}") from exc
+        keys.append(SortKey(prop.key, clause, descending))
+    (pk,) = mapper.primary_key
+    pk_name = mapper.get_property_by_column(pk).key
+    if all(key.name != pk_name for key in keys):
+        keys.append(SortKey(pk_name, pk, False))
+    return keys
+
+
+def sort_by_keys(query, keys):
+    """Sort query by sort keys"""
+    return query.order_by(None).order_by(
+        *(sqla.desc(k.column) if k.descending else sqla.asc(k.column) for k in keys)
+    )
+
+
+def filter_after(query, keys, values):
+    """Filter query items strictly after sort key values"""
+    # Bind values with column types, so that invalid values fail in database
+    values = [
+        None if value is None else sqla.literal(value, key.column.type)
+        for key, value in zip(keys, values, strict=True)
+    ]
+    directions = {key.descending for key in keys}
+    nullable = any(key.column.nullable for key in keys)
+    # Row value comparison can use a multi-column index
+    if len(directions) == 1 and not nullable:
+        columns = sqla.tuple_(*(key.column for key in keys))
+        values = sqla.tuple_(*values)
+        if keys[0].descending:
+            return query.filter(columns < values)
+        return query.filter(columns > values)
+    conditions = []
+    equal = []
+    for key, value in zip(keys, values, strict=True):
+        conditions.append(sqla.and_(*equal, key.after(value)))
+        equal.append(key.equal(value))
+    return query.filter(sqla.or_(*conditions))
+
+
+def _encode_value(value):
+    if isinstance(value, dt.datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        return dt.datetime.fromisoformat(value["$dt"])
+    return value
+
+
+def encode_cursor(keys, item):
+    """Return cursor pointing at item"""
+    cursor = [
+        [key.signature for key in keys],
+        [_encode_value(getattr(item, key.name)) for key in keys],
+    ]
+    return base64.urlsafe_b64encode(
+        json.dumps(cursor, separators=(",", ":")).encode()
+    ).decode()
+
+
+def decode_cursor(cursor):
+    """Return (sort signatures, values) from cursor
+
+    Raises ValueError if cursor is invalid.
+    """
+    try:
+        signatures, values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(signatures) != len(values):
+            raise ValueError("Invalid cursor")
+        return signatures, [_decode_value(v) for v in values]
+    except (binascii.Error, TypeError, KeyError, json.JSONDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+class Cursor(ma.fields.String):
+    """Opaque keyset pagination cursor"""
+
+    default_error_messages = {"invalid_cursor": "Invalid cursor."}
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        value = super()._deserialize(value, attr, data, **kwargs)
+        try:
+            return decode_cursor(value)
+        except ValueError as exc:
+            raise self.make_error("invalid_cursor") from exc
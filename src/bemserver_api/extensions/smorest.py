@@ -1,10 +1,15 @@
 """REST API extension"""
 
+import gzip
+import hashlib
 import http
+import itertools
 from copy import deepcopy
 from functools import wraps
 from textwrap import dedent
 
+import sqlalchemy as sqla
+
 import flask
 
 import flask_smorest
@@ -12,12 +17,22 @@ import marshmallow as ma
 import marshmallow_sqlalchemy as msa
 from apispec.ext.marshmallow import MarshmallowPlugin as MarshmallowPluginOrig
 from apispec.ext.marshmallow import OpenAPIConverter as OrigOpenAPIConverter
-from apispec.ext.marshmallow.common import resolve_schema_cls
+from apispec.ext.marshmallow.common import resolve_schema_cls, resolve_schema_instance
+from flask_smorest import abort
+from flask_smorest.utils import get_appcontext, unpack_tuple_response
 
 from bemserver_core.authorization import get_current_user
 
-from . import integrity_error
+from . import (
+    counting,
+    dumping,
+    instrumentation,
+    integrity_error,
+    pagination,
+    watermarks,
+)
 from .authentication import auth
+from .cache import cache
 from .ma_fields import DictStr, Timezone
 
 
@@ -45,6 +60,9 @@ SECURITY_SCHEMES = {
 }
 
 
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
 class OpenAPIConverter(OrigOpenAPIConverter):
     def _field2parameter(self, field, *, name, location):
         ret: dict = {"in": location, "name": name}
@@ -85,6 +103,10 @@ class Api(flask_smorest.Api):
         super().__init__(app=app, spec_kwargs=spec_kwargs)
 
     def init_app(self, app, *, spec_kwargs=None):
+        # Precomputed spec file. If set, views are not documented at startup.
+        self._spec_file = app.config["OPENAPI_SPEC_FILE"]
+        # Spec as JSON: (content, gzipped content, digest)
+        self._spec_json = None
         spec_kwargs = spec_kwargs or {}
         spec_kwargs["security"] = [
             {SECURITY_SCHEMES[scheme][0]: []} for scheme in app.config["AUTH_METHODS"]
@@ -96,6 +118,59 @@ class Api(flask_smorest.Api):
         for scheme in app.config["AUTH_METHODS"]:
             self.spec.components.security_scheme(*SECURITY_SCHEMES[scheme])
 
+    def _register_pagination_header(self):
+        super()._register_pagination_header()
+        if self.spec.openapi_version.major >= 3:
+            self.spec.components.header(
+                "CURSOR_PAGINATION", CURSOR_PAGINATION_HEADER, lazy=True
+            )
+
+    def register_blueprint(self, blp, *, parameters=None, **options):
+        """Register a blueprint in the application
+
+        If spec is precomputed, blueprint views are not documented.
+        """
+        if not self._spec_file:
+            super().register_blueprint(blp, parameters=parameters, **options)
+            return
+        blp_name = options.get("name", blp.name)
+        self._app.extensions["flask-smorest"]["blp_name_to_api"][blp_name] = self
+        self._app.register_blueprint(blp, **options)
+
+    def _get_spec_json(self):
+        """Return spec as JSON, gzipped JSON and digest
+
+        Spec is loaded from precomputed spec file, if any, or generated, on
+        first call.
+        """
+        if self._spec_json is None:
+            if self._spec_file:
+                with open(self._spec_file, "rb") as f:
+                    content = f.read()
+            else:
+                content = flask.json.dumps(
+                    self.spec.to_dict(), indent=2, sort_keys=False
+                ).encode("utf-8")
+            self._spec_json = (
+                content,
+                gzip.compress(content),
+                hashlib.sha256(content).hexdigest(),
+            )
+        return self._spec_json
+
+    def _openapi_json(self):
+        """Serve JSON spec, with ETag and gzip compression"""
+        content, gzipped_content, digest = self._get_spec_json()
+        if "gzip" in flask.request.accept_encodings:
+            resp = flask.Response(gzipped_content, mimetype="application/json")
+            resp.content_encoding = "gzip"
+            resp.set_etag(f"{digest}-gzip")
+        else:
+            resp = flask.Response(content, mimetype="application/json")
+            resp.set_etag(digest)
+        resp.vary.add("Accept-Encoding")
+        return resp.make_conditional(flask.request)
+
 
 class Blueprint(flask_smorest.Blueprint):
     """Blueprint class"""
@@ -103,6 +178,224 @@ class Blueprint(flask_smorest.Blueprint):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._prepare_doc_cbks.append(self._prepare_auth_doc)
+        self._prepare_doc_cbks.append(self._prepare_cursor_pagination_doc)
+
+    def response(self, status_code, schema=None, *, ndjson=False, **kwargs):
+        """Decorator generating an endpoint response
+
+        Same as flask-smorest's, with serialization instrumentation.
+
+        If ndjson is True, the list of items returned by the view function is
+        streamed as newline-delimited JSON when requested in Accept header.
+
+        If the view function returns a query and schema is a many AutoSchema,
+        only the dumped columns are selected (see AutoSchema.project).
+        """
+        decorator = super().response(status_code, schema, **kwargs)
+        if ndjson:
+            schema = resolve_schema_instance(schema)
+
+        def instrumented_decorator(func):
+            if isinstance(schema, AutoSchema) and schema.many:
+                func = self._project(func, schema)
+            if ndjson:
+                func = self._ndjson(func, schema)
+            wrapper = instrumentation.time_serialization(decorator, func)
+            if ndjson:
+                # Document NDJSON response (one item per line)
+                wrapper._apidoc = deepcopy(wrapper._apidoc)
+                wrapper._apidoc["response"]["responses"][status_code].append(
+                    {
+                        "schema": type(schema),
+                        "description": "Items as newline-delimited JSON",
+                        "content_type": NDJSON_MIMETYPE,
+                    }
+                )
+            return wrapper
+
+        return instrumented_decorator
+
+    @staticmethod
+    def _project(func, schema):
+        """Select dumped columns of query returned by view function"""
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            result, status, headers = unpack_tuple_response(func(*args, **kwargs))
+            if isinstance(result, sqla.orm.Query):
+                result = schema.project(result)
+            return result, status, headers
+
+        return wrapper
+
+    @staticmethod
+    def _ndjson(func, schema):
+        """Stream result of view function as NDJSON if requested"""
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            best_match = flask.request.accept_mimetypes.best_match(
+                ("application/json", NDJSON_MIMETYPE)
+            )
+            if best_match != NDJSON_MIMETYPE:
+                return func(*args, **kwargs)
+            result, status, headers = unpack_tuple_response(func(*args, **kwargs))
+            batch_size = flask.current_app.config["NDJSON_BATCH_SIZE"]
+            if isinstance(result, sqla.orm.Query):
+                result = result.yield_per(batch_size)
+            items = iter(result)
+
+            def iter_lines():
+                while batch := list(itertools.islice(items, batch_size)):
+                    yield "".join(
+                        f"{flask.json.dumps(item)}\n" for item in schema.dump(batch)
+                    )
+
+            lines = iter_lines()
+            # Get first lines before returning response so that errors are
+            # caught in the view function
+            first_lines = next(lines, "")
+            resp = flask.Response(
+                flask.stream_with_context(itertools.chain((first_lines,), lines)),
+                mimetype=NDJSON_MIMETYPE,
+            )
+            return resp, status, headers
+
+        return wrapper
+
+    def _set_etag_in_response(self, response):
+        """Set ETag in response object
+
+        Same as flask-smorest's, except streamed responses get no ETag unless
+        it is set explicitly, as their content is not known in advance.
+        """
+        appcontext = get_appcontext()
+        if "result_dump" not in appcontext and "etag" not in appcontext.get("etag", {}):
+            return
+        super()._set_etag_in_response(response)
+
+    def paginate(
+        self,
+        pager=None,
+        *,
+        page=None,
+        page_size=None,
+        max_page_size=None,
+        optional=False,
+    ):
+        """Decorator adding pagination to the endpoint
+
+        Same as flask-smorest's. With SQLCursorPage, adds keyset pagination
+        (cursor parameter) and allows to estimate or skip total count (count
+        parameter).
+
+        If optional is True (SQLCursorPage only), items are only paginated if
+        page, page_size or cursor parameter is passed.
+
+        With SQLCursorPage, if cache is enabled, ETag is computed from table
+        watermarks rather than from response content.
+        """
+        decorator = super().paginate(
+            pager, page=page, page_size=page_size, max_page_size=max_page_size
+        )
+        if pager is None or not issubclass(pager, SQLCursorPage):
+            return decorator
+        defaults = self.DEFAULT_PAGINATION_PARAMETERS
+        page_params_schema = _pagination_parameters_schema_factory(
+            page or defaults["page"],
+            page_size or defaults["page_size"],
+            max_page_size or defaults["max_page_size"],
+            optional=optional,
+        )
+
+        def cursor_decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                page_params = self.PAGINATION_ARGUMENTS_PARSER.parse(
+                    page_params_schema, flask.request, location="query"
+                )
+                result, status, headers = unpack_tuple_response(func(*args, **kwargs))
+                self._set_query_etag(result)
+                if page_params is None:
+                    return result, status, headers
+                page = pager(result, page_params=page_params)
+                result = page.items
+                if self.PAGINATION_HEADER_NAME is not None:
+                    if headers is None:
+                        headers = {}
+                    headers[self.PAGINATION_HEADER_NAME] = flask.json.dumps(
+                        self._make_cursor_pagination_metadata(page)
+                    )
+                return result, status, headers
+
+            # Document pagination parameters
+            wrapper._apidoc = deepcopy(decorator(func)._apidoc)
+            wrapper._apidoc["pagination"]["parameters"]["schema"] = page_params_schema
+            wrapper._apidoc["pagination"]["cursor"] = True
+            return wrapper
+
+        return cursor_decorator
+
+    def _set_query_etag(self, query):
+        """Set ETag from the version of the tables involved in a query
+
+        This is only done if cache is enabled and shared with other processes,
+        as table watermarks are stored in cache and only renewed by writes of
+        processes using the cache. Otherwise, ETag is computed from response.
+        If ETag matches, 304 is returned before items are queried and
+        serialized.
+        """
+        store = cache.watermarks
+        if store is None or not store.shared or not self._is_etag_enabled():
+            return
+        self.set_etag(
+            {
+                "query": watermarks.get_query_version(
+                    store, query, include_related=True
+                ),
+                "args": sorted(flask.request.args.items(multi=True)),
+                "accept": flask.request.accept_mimetypes.best_match(
+                    ("application/json", NDJSON_MIMETYPE)
+                ),
+            }
+        )
+
+    def _make_cursor_pagination_metadata(self, page):
+        page_params = page.page_params
+        if page_params.cursor is not None:
+            metadata = {}
+            if page_params.item_count is not None:
+                metadata["total"] = page_params.item_count
+        elif page_params.item_count is not None:
+            metadata = self._make_pagination_metadata(
+                page_params.page, page_params.page_size, page_params.item_count
+            )
+        else:
+            metadata = {"page": page_params.page}
+            if page_params.page > 1:
+                metadata["previous_page"] = page_params.page - 1
+            if page.has_next:
+                metadata["next_page"] = page_params.page + 1
+        if page.count_estimated:
+            metadata["total_estimated"] = True
+        if (next_cursor := page.next_cursor) is not None:
+            metadata["next_cursor"] = next_cursor
+        return metadata
+
+    def _prepare_cursor_pagination_doc(self, doc, doc_info, *, spec, **kwargs):
+        """Document cursor pagination metadata header of SQLCursorPage endpoints"""
+        if not doc_info.get("pagination", {}).get("cursor", False):
+            return doc
+        header = (
+            "CURSOR_PAGINATION"
+            if spec.openapi_version.major >= 3
+            else CURSOR_PAGINATION_HEADER
+        )
+        for status_code in doc_info.get("success_status_codes", []):
+            headers = doc["responses"][status_code].get("headers", {})
+            if self.PAGINATION_HEADER_NAME in headers:
+                headers[self.PAGINATION_HEADER_NAME] = header
+        return doc
 
     @staticmethod
     def login_required(func=None, **kwargs):
@@ -179,13 +472,211 @@ class AutoSchema(msa.SQLAlchemyAutoSchema, Schema):
     def remove_none_values(self, data, **kwargs):
         return {key: value for key, value in data.items() if value is not None}
 
+    def _get_dump_function(self):
+        # Generated functions skip None values, like remove_none_values
+        return dumping.get_dump_function(self, ("remove_none_values",))
+
+    def dump(self, obj, *, many=None):
+        """Serialize an object or a list of objects
+
+        Same as marshmallow's, except lists are dumped by a generated function
+        if the schema allows it, which is much faster.
+        """
+        if self.many if many is None else many:
+            dump_function = self._get_dump_function()
+            if dump_function is not None:
+                func, _ = dump_function
+                return [func(item) for item in obj]
+        return super().dump(obj, many=many)
+
+    def project(self, query):
+        """Select the dumped columns of a query of model instances
+
+        Rows are dumped faster than ORM objects as they don't need identity
+        map and attribute instrumentation. The query is returned unmodified if
+        the schema is dumped by marshmallow or dumps non-column attributes.
+        """
+        dump_function = self._get_dump_function()
+        model = self.opts.model
+        if dump_function is None or model is None:
+            return query
+        _, attributes = dump_function
+        descriptions = query.column_descriptions
+        if len(descriptions) != 1 or descriptions[0]["expr"] is not model:
+            return query
+        column_attrs = sqla.inspect(model).column_attrs
+        if not attributes or any(attr not in column_attrs for attr in attributes):
+            return query
+        return query.with_entities(*(getattr(model, attr) for attr in attributes))
+
+
+COUNT_MODES = ("exact", "estimate", "none")
+
+
+class CursorPaginationMetadataSchema(flask_smorest.pagination.PaginationMetadataSchema):
+    """Pagination metadata schema for SQLCursorPage endpoints
+
+    Same as flask-smorest's, with estimated total flag and next page cursor.
+
+    Total, page count and first/last page are absent if count mode is "none"
+    or if page is selected by cursor (total is present if counted).
+    """
+
+    total = ma.fields.Int(
+        metadata={"description": "Item count. Absent if count mode is none."}
+    )
+    total_estimated = ma.fields.Bool(
+        metadata={"description": "True if total is estimated. Absent otherwise."}
+    )
+    next_cursor = ma.fields.String(
+        metadata={
+            "description": (
+                "Cursor of next page, to pass as cursor parameter. "
+                "Absent on last page or if sort order can't be used as cursor."
+            )
+        }
+    )
+
+
+CURSOR_PAGINATION_HEADER = {
+    "description": "Pagination metadata",
+    "schema": CursorPaginationMetadataSchema,
+}
+
+
+def _pagination_parameters_schema_factory(
+    def_page, def_page_size, def_max_page_size, *, optional=False
+):
+    """Generate a pagination parameters schema for SQLCursorPage endpoints
+
+    Same as flask-smorest's, with cursor and count parameters.
+
+    If optional is True, loading returns None when no page, page_size or
+    cursor parameter is passed.
+    """
+
+    class PaginationParametersSchema(ma.Schema):
+        class Meta:
+            ordered = True
+            unknown = ma.EXCLUDE
+
+        page = ma.fields.Integer(validate=ma.validate.Range(min=1))
+        page_size = ma.fields.Integer(
+            load_default=ma.missing if optional else def_page_size,
+            validate=ma.validate.Range(min=1, max=def_max_page_size),
+        )
+        cursor = pagination.Cursor(
+            metadata={
+                "description": (
+                    "Get items following this cursor instead of a page. "
+                    "Next page cursor is returned in pagination metadata."
+                )
+            },
+        )
+        count = ma.fields.String(
+            load_default="exact",
+            validate=ma.validate.OneOf(COUNT_MODES),
+            metadata={
+                "description": (
+                    "Count items exactly (extra query), estimate count or don't "
+                    "count. Estimated total is flagged in pagination metadata."
+                )
+            },
+        )
+
+        @ma.validates_schema
+        def validate_page_or_cursor(self, data, **kwargs):
+            if "page" in data and "cursor" in data:
+                raise ma.ValidationError("page and cursor are mutually exclusive.")
+
+        @ma.post_load
+        def make_paginator(self, data, **kwargs):
+            if optional and data.keys().isdisjoint(("page", "page_size", "cursor")):
+                return None
+            page_params = flask_smorest.pagination.PaginationParameters(
+                data.get("page", def_page), data.get("page_size", def_page_size)
+            )
+            page_params.cursor = data.get("cursor")
+            page_params.count = data["count"]
+            return page_params
+
+    return PaginationParametersSchema
+
 
 class SQLCursorPage(flask_smorest.Page):
-    """SQL cursor pager"""
+    """SQL cursor pager
+
+    Items are sorted by primary key after the sort keys of the query to ensure
+    a stable order.
+
+    Pages are selected by page number (OFFSET) or by cursor (keyset
+    pagination). The cost of a page selected by cursor doesn't depend on its
+    depth. Total count can be estimated or skipped as it requires an extra
+    query.
+    """
+
+    def __init__(self, collection, page_params):
+        try:
+            self.sort_keys = pagination.get_sort_keys(collection)
+        except ValueError:
+            # Sort can't be used as keyset: offset pagination only
+            self.sort_keys = None
+        else:
+            collection = pagination.sort_by_keys(collection, self.sort_keys)
+        self.has_next = None
+        self.count_estimated = False
+        self._items = None
+        super().__init__(collection, page_params)
+
+    @property
+    def items(self):
+        if self._items is None:
+            page_params = self.page_params
+            query = self.collection
+            if (cursor := getattr(page_params, "cursor", None)) is not None:
+                signatures, values = cursor
+                if self.sort_keys is None or signatures != [
+                    key.signature for key in self.sort_keys
+                ]:
+                    abort(
+                        422,
+                        errors={
+                            "query": {"cursor": ["Cursor doesn't match sort order."]}
+                        },
+                    )
+                query = pagination.filter_after(query, self.sort_keys, values)
+            else:
+                query = query.offset(page_params.first_item)
+            # Get one more item to know if there is a next page
+            try:
+                items = query.limit(page_params.page_size + 1).all()
+            except sqla.exc.StatementError:
+                if cursor is None:
+                    raise
+                # Cursor values don't match sort key types
+                abort(422, errors={"query": {"cursor": ["Invalid cursor."]}})
+            self.has_next = len(items) > page_params.page_size
+            self._items = items[: page_params.page_size]
+        return self._items
 
     @property
     def item_count(self):
-        return self.collection.count()
+        count_mode = getattr(self.page_params, "count", "exact")
+        if count_mode == "none":
+            return None
+        query = self.collection.order_by(None)
+        if count_mode == "estimate":
+            count, exact = counting.estimate_count(query)
+            self.count_estimated = not exact
+            return count
+        return query.count()
+
+    @property
+    def next_cursor(self):
+        """Cursor of next page, or None if there is no next page"""
+        if not self.items or not self.has_next or self.sort_keys is None:
+            return None
+        return pagination.encode_cursor(self.sort_keys, self.items[-1])
 
 
 AUTH_BLP_DESC = dedent("""Authentication operations
@@ -0,0 +1,144 @@
+"""Table watermarks
+
+Watermarks are random tokens stored in cache for each table and renewed each
+time the table is modified through the API. They are used to identify data
+derived from queries (cached counts, ETags) without running the queries.
+
+Modified tables are detected on the DB session. Watermarks of modified tables
+are renewed after commit.
+
+Tables modified by Celery workers are detected if the workers share the cache
+(see bemserver_api.worker). Tables modified by other means are only detected
+after watermarks expiration (CACHE_DEFAULT_TTL).
+"""
+
+import functools
+import json
+
+import sqlalchemy as sqla
+from sqlalchemy.sql.util import find_tables
+
+from bemserver_core.database import db
+
+from .cache import cache, get_watermark
+
+WATERMARK_KEY = "watermark:{}"
+
+# Session info key storing names of tables modified in transaction
+CHANGED_TABLES_KEY = "watermarks_changed_tables"
+
+
+def get_tables(query, *, include_related=False):
+    """Return names of tables involved in query
+
+    :param bool include_related: Also return tables of the relationships of
+        queried entity, which may be loaded when serializing items
+    """
+    statement = query.statement
+    tables = set(find_tables(statement, include_joins=True, include_aliases=True))
+    if include_related:
+        mapper = sqla.inspect(query.column_descriptions[0]["entity"])
+        for rel in mapper.relationships:
+            tables.update(rel.mapper.tables)
+            if rel.secondary is not None:
+                tables.add(rel.secondary)
+    return sorted({table.name for table in tables if isinstance(table, sqla.Table)})
+
+
+def get_table_watermark(backend, table_name):
+    """Return watermark of table"""
+    return get_watermark(backend, WATERMARK_KEY.format(table_name))
+
+
+def get_query_version(backend, query, *, include_related=False):
+    """Return a string identifying the result of a query
+
+    Version depends on query statement and parameters, including
+    authorization filters, and on watermarks of the tables involved in the
+    query.
+    """
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    return json.dumps(
+        {
+            "sql": str(compiled),
+            "params": compiled.params,
+            "tables": {
+                name: get_table_watermark(backend, name)
+                for name in get_tables(query, include_related=include_related)
+            },
+        },
+        sort_keys=True,
+        default=str,
+    )
+
+
+@functools.cache
+def _get_dependent_tables(table):
+    """Return table and tables referencing it, recursively
+
+    Rows of those tables may be removed by ON DELETE CASCADE.
+    """
+    tables = {table}
+    to_visit = [table]
+    while to_visit:
+        referenced = to_visit.pop()
+        for other in referenced.metadata.tables.values():
+            if other not in tables and any(
+                fk.references(referenced) for fk in other.foreign_keys
+            ):
+                tables.add(other)
+                to_visit.append(other)
+    return frozenset(tables)
+
+
+def _get_modified_tables(mapper, delete):
+    tables = set(mapper.tables)
+    if delete:
+        for table in mapper.tables:
+            tables.update(_get_dependent_tables(table))
+    return {table.name for table in tables}
+
+
+@sqla.event.listens_for(db.session, "after_flush")
+def receive_after_flush(session, flush_context):
+    """Record tables of instances modified in flush"""
+    if cache.watermarks is None:
+        return
+    changed = session.info.setdefault(CHANGED_TABLES_KEY, set())
+    for obj in (*session.new, *session.dirty):
+        changed.update(_get_modified_tables(sqla.inspect(obj).mapper, False))
+    for obj in session.deleted:
+        changed.update(_get_modified_tables(sqla.inspect(obj).mapper, True))
+
+
+@sqla.event.listens_for(db.session, "do_orm_execute")
+def receive_do_orm_execute(orm_execute_state):
+    """Record tables modified by ORM-enabled INSERT, UPDATE and DELETE"""
+    if cache.watermarks is None:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        orm_execute_state.session.info.setdefault(CHANGED_TABLES_KEY, set()).update(
+            _get_modified_tables(mapper, orm_execute_state.is_delete)
+        )
+
+
+@sqla.event.listens_for(db.session, "after_commit")
+def receive_after_commit(session):
+    """Renew watermarks of tables modified in transaction"""
+    changed = session.info.pop(CHANGED_TABLES_KEY, set())
+    store = cache.watermarks
+    if store is None:
+        return
+    for table_name in changed:
+        store.delete(WATERMARK_KEY.format(table_name))
+
+
+@sqla.event.listens_for(db.session, "after_rollback")
+def receive_after_rollback(session):
+    """Forget changes of rolled back transaction"""
+    session.info.pop(CHANGED_TABLES_KEY, None)
@@ -0,0 +1,120 @@
+"""Background jobs
+
+Jobs run by Celery workers store their state in a directory shared by the API
+and the workers. Each job has its own directory, named after the job ID, with a
+JSON file describing the job and the job files (input or output).
+"""
+
+import datetime as dt
+import json
+import os
+import re
+import shutil
+import tempfile
+import uuid
+
+JOB_FILE_NAME = "job.json"
+JOB_ID_RE = re.compile(r"[0-9a-f]{32}")
+JOB_DATETIME_KEYS = ("created_at", "updated_at")
+
+
+def _read_job(path):
+    with open(path, encoding="utf-8") as f:
+        job = json.load(f)
+    for key in JOB_DATETIME_KEYS:
+        job[key] = dt.datetime.fromisoformat(job[key])
+    return job
+
+
+def _write_job(path, job):
+    job = {
+        **job,
+        **{key: job[key].isoformat() for key in JOB_DATETIME_KEYS},
+    }
+    # Write to temporary file then rename to make the write atomic
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, path)
+
+
+def get_job_dir(jobs_dir, job_id):
+    """Return job directory, or None if job ID is invalid"""
+    if not JOB_ID_RE.fullmatch(job_id):
+        return None
+    return os.path.join(jobs_dir, job_id)
+
+
+def get_job(jobs_dir, job_id):
+    """Return job, or None if it doesn't exist"""
+    job_dir = get_job_dir(jobs_dir, job_id)
+    if job_dir is None:
+        return None
+    try:
+        return _read_job(os.path.join(job_dir, JOB_FILE_NAME))
+    except FileNotFoundError:
+        return None
+
+
+def update_job(jobs_dir, job_id, **kwargs):
+    """Update job
+
+    Returns updated job, or None if job was deleted.
+    """
+    job = get_job(jobs_dir, job_id)
+    if job is None:
+        return None
+    job.update(kwargs, updated_at=dt.datetime.now(tz=dt.UTC))
+    try:
+        _write_job(os.path.join(jobs_dir, job_id, JOB_FILE_NAME), job)
+    except FileNotFoundError:
+        return None
+    return job
+
+
+def create_job(jobs_dir, user_id, **kwargs):
+    """Create a job in pending state
+
+    Extra keyword arguments are stored in the job.
+    """
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(jobs_dir, job_id)
+    os.makedirs(job_dir)
+    now = dt.datetime.now(tz=dt.UTC)
+    job = {
+        "id": job_id,
+        "user_id": user_id,
+        **kwargs,
+        "status": "pending",
+        "created_at": now,
+        "updated_at": now,
+    }
+    _write_job(os.path.join(job_dir, JOB_FILE_NAME), job)
+    return job
+
+
+def delete_job(jobs_dir, job_id):
+    """Delete job and its files"""
+    shutil.rmtree(get_job_dir(jobs_dir, job_id), ignore_errors=True)
+
+
+def delete_expired_jobs(jobs_dir, retention):
+    """Delete jobs done or failed for more than retention seconds
+
+    Pending and running jobs are kept.
+    """
+    expiration_dt = dt.datetime.now(tz=dt.UTC) - dt.timedelta(seconds=retention)
+    try:
+        entries = list(os.scandir(jobs_dir))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if not entry.is_dir() or not JOB_ID_RE.fullmatch(entry.name):
+            continue
+        job = get_job(jobs_dir, entry.name)
+        if (
+            job is not None
+            and job["status"] in ("done", "failed")
+            and job["updated_at"] <= expiration_dt
+        ):
+            delete_job(jobs_dir, entry.name)
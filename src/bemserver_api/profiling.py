@@ -0,0 +1,280 @@
+"""Sampling profiler
+
+WSGI middleware profiling a sample of requests with cProfile, to profile live
+traffic at a low cost.
+
+Requests are selected by endpoint and sampled (1 in N). Profiles of requests
+faster than a threshold are discarded. Kept profiles are aggregated and stats
+are written periodically and at exit in the profile directory, keeping only the
+most recent files.
+
+Response bodies are profiled while they are iterated, so that streamed
+responses are not buffered.
+
+Optionally, call stacks of profiled requests are sampled by a background thread
+and written in collapsed format ("frame;frame;frame count"), to be rendered as
+flame graphs.
+"""
+
+import atexit
+import cProfile
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+
+from werkzeug.exceptions import HTTPException
+
+STATS_FILE_NAME = "profile-{}.prof"
+STACKS_FILE_NAME = "profile-{}.folded"
+
+
+class StackSampler:
+    """Sample call stacks of registered threads
+
+    :param float interval: Sampling interval in seconds
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = {}
+        self._threads = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add_thread(self, thread_id):
+        with self._lock:
+            self._threads.add(thread_id)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def remove_thread(self, thread_id):
+        with self._lock:
+            self._threads.discard(thread_id)
+
+    def pop_stacks(self):
+        """Return and reset collected stacks"""
+        with self._lock:
+            stacks, self.stacks = self.stacks, {}
+        return stacks
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._threads:
+                    continue
+                frames = sys._current_frames()
+                for thread_id in self._threads:
+                    if (frame := frames.get(thread_id)) is not None:
+                        stack = self._collapse(frame)
+                        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+class ProfiledResponse:
+    """Iterate over a WSGI response, profiling the application
+
+    The application call and each iteration step are profiled. Time spent by
+    the server sending the response is not. The profile is handed over to the
+    middleware when the response is closed.
+    """
+
+    def __init__(self, middleware, environ, start_response):
+        self._middleware = middleware
+        self._profile = cProfile.Profile()
+        self._duration = 0
+        self._closed = False
+        try:
+            self._app_iter = self._run(middleware.wsgi_app, environ, start_response)
+            self._iterator = self._run(iter, self._app_iter)
+        except BaseException:
+            self._end()
+            raise
+
+    def _run(self, func, *args):
+        stack_sampler = self._middleware.stack_sampler
+        thread_id = threading.get_ident()
+        if stack_sampler is not None:
+            stack_sampler.add_thread(thread_id)
+        start = time.perf_counter()
+        try:
+            return self._profile.runcall(func, *args)
+        finally:
+            self._duration += time.perf_counter() - start
+            if stack_sampler is not None:
+                stack_sampler.remove_thread(thread_id)
+
+    def _end(self):
+        self._closed = True
+        self._middleware.add_profile(self._profile, self._duration)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._run(next, self._iterator)
+
+    def close(self):
+        if self._closed:
+            return
+        try:
+            if hasattr(self._app_iter, "close"):
+                self._run(self._app_iter.close)
+        finally:
+            self._end()
+
+
+class SamplingProfilerMiddleware:
+    """Profile a sample of requests
+
+    :param Flask app: Flask application, used to resolve endpoints
+    :param wsgi_app: WSGI application to profile
+    :param str profile_dir: Directory where stats are written
+    :param int sample_rate: Profile 1 in sample_rate requests
+    :param float min_duration: Discard profiles of requests faster than
+        min_duration (in seconds)
+    :param list endpoints: Only profile these endpoints (all if empty)
+    :param float dump_interval: Write stats every dump_interval seconds (each
+        profile is written in its own file if 0)
+    :param int max_files: Number of stats files to keep
+    :param float stacks_interval: Sample call stacks every stacks_interval
+        seconds (disabled if 0)
+    """
+
+    def __init__(
+        self,
+        app,
+        wsgi_app,
+        profile_dir,
+        *,
+        sample_rate=1,
+        min_duration=0,
+        endpoints=None,
+        dump_interval=60,
+        max_files=100,
+        stacks_interval=0,
+    ):
+        self.app = app
+        self.wsgi_app = wsgi_app
+        self.profile_dir = profile_dir
+        self.sample_rate = sample_rate
+        self.min_duration = min_duration
+        self.endpoints = set(endpoints or ())
+        self.dump_interval = dump_interval
+        self.max_files = max_files
+        self.stack_sampler = StackSampler(stacks_interval) if stacks_interval else None
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = None
+        self._last_dump = time.monotonic()
+        self._timer = None
+        os.makedirs(profile_dir, exist_ok=True)
+        atexit.register(self.flush)
+
+    def _get_endpoint(self, environ):
+        adapter = self.app.url_map.bind_to_environ(environ)
+        try:
+            rule, _ = adapter.match(return_rule=True)
+        except HTTPException:
+            return None
+        return rule.endpoint
+
+    def _is_sampled(self, environ):
+        if self.endpoints and self._get_endpoint(environ) not in self.endpoints:
+            return False
+        return next(self._counter) % self.sample_rate == 0
+
+    def __call__(self, environ, start_response):
+        if not self._is_sampled(environ):
+            return self.wsgi_app(environ, start_response)
+        return ProfiledResponse(self, environ, start_response)
+
+    def add_profile(self, profile, duration):
+        """Add profile of a request to stats
+
+        :param float duration: Time spent in application (in seconds)
+        """
+        if duration < self.min_duration:
+            return
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            elapsed = time.monotonic() - self._last_dump
+            if elapsed >= self.dump_interval:
+                self._dump()
+            elif self._timer is None:
+                # Write stats at the end of the interval even if no request
+                # comes in afterwards
+                self._timer = threading.Timer(self.dump_interval - elapsed, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write collected stats, if any"""
+        with self._lock:
+            if self._stats is not None:
+                self._dump()
+
+    def _dump(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        stats, self._stats = self._stats, None
+        self._last_dump = time.monotonic()
+        timestamp = f"{time.time():.6f}"
+        stats.dump_stats(
+            os.path.join(self.profile_dir, STATS_FILE_NAME.format(timestamp))
+        )
+        if self.stack_sampler is not None:
+            stacks = self.stack_sampler.pop_stacks()
+            with open(
+                os.path.join(self.profile_dir, STACKS_FILE_NAME.format(timestamp)),
+                "w",
+                encoding="utf-8",
+            ) as f:
+                for stack, count in stacks.items():
+                    f.write(f"{stack} {count}\n")
+        self._rotate()
+
+    def _rotate(self):
+        file_names = sorted(
+            name
+            for name in os.listdir(self.profile_dir)
+            if name.startswith("profile-") and name.endswith(".prof")
+        )
+        for name in file_names[: -self.max_files]:
+            for file_name in (name, name.removesuffix(".prof") + ".folded"):
+                try:
+                    os.remove(os.path.join(self.profile_dir, file_name))
+                except FileNotFoundError:
+                    pass
+
+
+def init_app(app):
+    """Wrap application in sampling profiler if PROFILE_DIR is set"""
+    if profile_dir := app.config["PROFILE_DIR"]:
+        app.wsgi_app = SamplingProfilerMiddleware(
+            app,
+            app.wsgi_app,
+            profile_dir,
+            sample_rate=app.config["PROFILE_SAMPLE_RATE"],
+            min_duration=app.config["PROFILE_MIN_DURATION"],
+            endpoints=app.config["PROFILE_ENDPOINTS"],
+            dump_interval=app.config["PROFILE_DUMP_INTERVAL"],
+            max_files=app.config["PROFILE_MAX_FILES"],
+            stacks_interval=app.config["PROFILE_STACKS_INTERVAL"],
+        )
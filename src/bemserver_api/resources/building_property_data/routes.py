@@ -7,7 +7,7 @@ from flask_smorest import abort
 from bemserver_core.exceptions import PropertyTypeInvalidError
 from bemserver_core.model import BuildingPropertyData
 
-from bemserver_api import Blueprint
+from bemserver_api import Blueprint, SQLCursorPage
 from bemserver_api.database import db
 
 from .schemas import (
@@ -28,7 +28,8 @@ class BuildingPropertyDataViews(MethodView):
     @blp.login_required
     @blp.etag
     @blp.arguments(BuildingPropertyDataQueryArgsSchema, location="query")
-    @blp.response(200, BuildingPropertyDataSchema(many=True))
+    @blp.response(200, BuildingPropertyDataSchema(many=True), ndjson=True)
+    @blp.paginate(SQLCursorPage, optional=True)
     def get(self, args):
         """List building property data"""
         return BuildingPropertyData.get(**args)
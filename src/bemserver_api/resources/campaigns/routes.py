@@ -6,7 +6,7 @@ from flask_smorest import abort
 
 from bemserver_core.model import Campaign
 
-from bemserver_api import Blueprint
+from bemserver_api import Blueprint, SQLCursorPage
 from bemserver_api.database import db
 
 from .schemas import CampaignQueryArgsSchema, CampaignSchema
@@ -21,7 +21,8 @@ class CampaignViews(MethodView):
     @blp.login_required
     @blp.etag
     @blp.arguments(CampaignQueryArgsSchema, location="query")
-    @blp.response(200, CampaignSchema(many=True))
+    @blp.response(200, CampaignSchema(many=True), ndjson=True)
+    @blp.paginate(SQLCursorPage, optional=True)
     def get(self, args):
         """List campaigns"""
         return Campaign.get(**args)
@@ -0,0 +1,434 @@
+"""Bulk import of sites and timeseries description trees
+
+Same CSV files and semantics as core importers, but suited to large files:
+
+- rows are read as a stream and processed in batches
+- existing items (timeseries, site tree) are fetched once at the beginning
+  rather than queried for each row
+- each batch is flushed at once and committed, so that locks are only held
+  for the duration of a batch
+
+Since batches are committed independently, an error in a batch leaves the
+previous batches imported. The report tells how many rows were imported.
+"""
+
+import csv
+import itertools
+
+import sqlalchemy as sqla
+
+from bemserver_core import model
+from bemserver_core.database import db
+from bemserver_core.exceptions import (
+    BEMServerCoreUndefinedUnitError,
+    PropertyTypeInvalidError,
+    SitesCSVIOError,
+    TimeseriesCSVIOError,
+)
+from bemserver_core.input_output.sites_io import SitesCSVIO
+from bemserver_core.input_output.timeseries_io import TimeseriesCSVIO
+
+# Structural element levels: model, columns identifying the parent, properties
+SITE_LEVELS = {
+    "sites": {
+        "label": "Site",
+        "model": model.Site,
+        "fields": SitesCSVIO.SITE_FIELDS,
+        "parent": None,
+        "parent_columns": (),
+        "parent_field": "campaign_id",
+        "property_model": model.SiteProperty,
+        "data_model": model.SitePropertyData,
+        "data_field": "site_id",
+        "data_property_field": "site_property_id",
+    },
+    "buildings": {
+        "label": "Building",
+        "model": model.Building,
+        "fields": SitesCSVIO.BUILDING_FIELDS,
+        "parent": "sites",
+        "parent_columns": ("Site",),
+        "parent_field": "site_id",
+        "property_model": model.BuildingProperty,
+        "data_model": model.BuildingPropertyData,
+        "data_field": "building_id",
+        "data_property_field": "building_property_id",
+    },
+    "storeys": {
+        "label": "Storey",
+        "model": model.Storey,
+        "fields": SitesCSVIO.STOREY_FIELDS,
+        "parent": "buildings",
+        "parent_columns": ("Site", "Building"),
+        "parent_field": "building_id",
+        "property_model": model.StoreyProperty,
+        "data_model": model.StoreyPropertyData,
+        "data_field": "storey_id",
+        "data_property_field": "storey_property_id",
+    },
+    "spaces": {
+        "label": "Space",
+        "model": model.Space,
+        "fields": SitesCSVIO.SPACE_FIELDS,
+        "parent": "storeys",
+        "parent_columns": ("Site", "Building", "Storey"),
+        "parent_field": "storey_id",
+        "property_model": model.SpaceProperty,
+        "data_model": model.SpacePropertyData,
+        "data_field": "space_id",
+        "data_property_field": "space_property_id",
+    },
+    "zones": {
+        "label": "Zone",
+        "model": model.Zone,
+        "fields": SitesCSVIO.ZONE_FIELDS,
+        "parent": None,
+        "parent_columns": (),
+        "parent_field": "campaign_id",
+        "property_model": model.ZoneProperty,
+        "data_model": model.ZonePropertyData,
+        "data_field": "zone_id",
+        "data_property_field": "zone_property_id",
+    },
+}
+
+TIMESERIES_RELATIONS = {
+    "Site": ("sites", model.TimeseriesBySite, "site_id"),
+    "Building": ("buildings", model.TimeseriesByBuilding, "building_id"),
+    "Storey": ("storeys", model.TimeseriesByStorey, "storey_id"),
+    "Space": ("spaces", model.TimeseriesBySpace, "space_id"),
+    "Zone": ("zones", model.TimeseriesByZone, "zone_id"),
+}
+
+
+def _iter_batches(reader, batch_size):
+    while batch := list(itertools.islice(reader, batch_size)):
+        yield batch
+
+
+def _get_reader(csv_file, required_fields, error_cls):
+    reader = csv.DictReader(csv_file)
+    if reader.fieldnames is None:
+        raise error_cls("Empty CSV file")
+    missing_fields = required_fields - set(reader.fieldnames)
+    if missing_fields:
+        raise error_cls(f"Missing columns: {list(missing_fields)}")
+    return reader
+
+
+def _pop_row(row, fields):
+    return {field: row.pop(field) for field in fields}
+
+
+class BaseBulkImporter:
+    """Base class for bulk importers
+
+    :param Campaign campaign: Campaign to import items in
+    :param int batch_size: Number of rows processed at once
+    :param callable progress: Function called with the report after each batch
+    """
+
+    ERROR = None
+
+    def __init__(self, campaign, *, batch_size, progress=None):
+        self.campaign_id = campaign.id
+        self.batch_size = batch_size
+        self.progress = progress
+        self.report = {"rows": 0, "created": 0, "updated": 0}
+        # Element IDs by level and path of names, e.g. ("Site 1", "Building 1")
+        self._tree = {}
+
+    def _fetch_tree(self, levels):
+        """Fetch IDs of existing site tree elements in a single query per level"""
+        for level in levels:
+            if level in self._tree:
+                continue
+            spec = SITE_LEVELS[level]
+            model_cls = spec["model"]
+            parent_col = getattr(model_cls, spec["parent_field"])
+            query = model_cls.get(campaign_id=self.campaign_id).with_entities(
+                model_cls.id, parent_col, model_cls.name
+            )
+            if spec["parent"] is None:
+                self._tree[level] = {(name,): id_ for id_, _, name in query}
+            else:
+                self._fetch_tree((spec["parent"],))
+                parent_paths = {
+                    id_: path for path, id_ in self._tree[spec["parent"]].items()
+                }
+                self._tree[level] = {
+                    (*parent_paths[parent_id], name): id_
+                    for id_, parent_id, name in query
+                }
+
+    def _get_element_id(self, level, path):
+        try:
+            return self._tree[level][path]
+        except KeyError as exc:
+            label = SITE_LEVELS[level]["label"].lower()
+            raise self.ERROR(f'Unknown {label}: "{"/".join(path)}"') from exc
+
+    def _flush(self, message, batch_start, batch_len):
+        try:
+            db.session.flush()
+        except (
+            sqla.exc.DataError,
+            BEMServerCoreUndefinedUnitError,
+            PropertyTypeInvalidError,
+        ) as exc:
+            batch_end = batch_start + batch_len - 1
+            raise self.ERROR(
+                f"{message} can't be imported (rows {batch_start}-{batch_end})."
+            ) from exc
+
+    def _commit_batch(self, rows, created, updated):
+        db.session.commit()
+        self.report["rows"] += rows
+        self.report["created"] += created
+        self.report["updated"] += updated
+        if self.progress is not None:
+            self.progress(self.report)
+
+    @staticmethod
+    def _set_property_data(data_model, existing, create_kwargs, value):
+        if existing is None:
+            existing = data_model.new(**create_kwargs)
+        existing.value = value
+
+
+class SitesBulkImporter(BaseBulkImporter):
+    """Import site description tree"""
+
+    ERROR = SitesCSVIOError
+
+    def _get_properties(self, level, reader):
+        spec = SITE_LEVELS[level]
+        names = set(reader.fieldnames) - spec["fields"]
+        prop_model = spec["property_model"]
+        properties = {
+            prop.structural_element_property.name: prop.id
+            for prop in db.session.query(prop_model)
+            .join(model.StructuralElementProperty)
+            .filter(model.StructuralElementProperty.name.in_(names))
+        }
+        if unknown := names - set(properties):
+            raise self.ERROR(f'Unknown property: "{sorted(unknown)[0]}"')
+        return properties
+
+    def _import_level(self, level, csv_file):
+        spec = SITE_LEVELS[level]
+        model_cls = spec["model"]
+        data_model = spec["data_model"]
+        data_field = getattr(data_model, spec["data_field"])
+        reader = _get_reader(csv_file, spec["fields"], self.ERROR)
+        properties = self._get_properties(level, reader)
+        self._fetch_tree((level,))
+        elements = self._tree[level]
+
+        for batch_idx, batch in enumerate(_iter_batches(reader, self.batch_size)):
+            batch_start = batch_idx * self.batch_size + 1
+            # Last row wins if an element appears several times in the batch
+            rows = {}
+            for row in batch:
+                values = _pop_row(
+                    row, ("Name", "Description", "IFC_ID", *spec["parent_columns"])
+                )
+                parent_path = tuple(values[col] for col in spec["parent_columns"])
+                if spec["parent"] is None:
+                    parent_id = self.campaign_id
+                else:
+                    parent_id = self._get_element_id(spec["parent"], parent_path)
+                kwargs = {
+                    spec["parent_field"]: parent_id,
+                    "name": values["Name"],
+                    "description": values["Description"],
+                    "ifc_id": values["IFC_ID"],
+                }
+                rows[(*parent_path, values["Name"])] = (kwargs, row)
+
+            existing_ids = [elements[path] for path in rows if path in elements]
+            existing = {
+                elem.id: elem
+                for elem in model_cls.get().filter(model_cls.id.in_(existing_ids))
+            }
+            existing_data = {
+                (
+                    getattr(data, spec["data_field"]),
+                    getattr(data, spec["data_property_field"]),
+                ): data
+                for data in data_model.get().filter(data_field.in_(existing_ids))
+            }
+
+            created = {}
+            for path, (kwargs, _) in rows.items():
+                if (elem_id := elements.get(path)) is None:
+                    created[path] = model_cls.new(**kwargs)
+                else:
+                    existing[elem_id].update(**kwargs)
+            self._flush(f"{spec['label']}s", batch_start, len(batch))
+            elements.update({path: elem.id for path, elem in created.items()})
+
+            for path, (_, row) in rows.items():
+                elem_id = elements[path]
+                for key, value in ((k, v) for k, v in row.items() if k is not None):
+                    if value:
+                        prop_id = properties[key]
+                        self._set_property_data(
+                            data_model,
+                            existing_data.get((elem_id, prop_id)),
+                            {
+                                spec["data_field"]: elem_id,
+                                spec["data_property_field"]: prop_id,
+                            },
+                            value,
+                        )
+            self._flush(f"{spec['label']} properties", batch_start, len(batch))
+
+            self._commit_batch(len(batch), len(created), len(rows) - len(created))
+
+    def import_csv(
+        self,
+        sites_csv=None,
+        buildings_csv=None,
+        storeys_csv=None,
+        spaces_csv=None,
+        zones_csv=None,
+    ):
+        """Import site description tree from CSV files"""
+        for level, csv_file in (
+            ("sites", sites_csv),
+            ("buildings", buildings_csv),
+            ("storeys", storeys_csv),
+            ("spaces", spaces_csv),
+            ("zones", zones_csv),
+        ):
+            if csv_file is not None:
+                self._import_level(level, csv_file)
+        return self.report
+
+
+class TimeseriesBulkImporter(BaseBulkImporter):
+    """Import timeseries description tree"""
+
+    ERROR = TimeseriesCSVIOError
+
+    def _get_properties(self, reader):
+        names = set(reader.fieldnames) - TimeseriesCSVIO.TS_FIELDS
+        properties = {
+            prop.name: prop.id
+            for prop in db.session.query(model.TimeseriesProperty).filter(
+                model.TimeseriesProperty.name.in_(names)
+            )
+        }
+        if unknown := names - set(properties):
+            raise self.ERROR(f'Unknown property: "{sorted(unknown)[0]}"')
+        return properties
+
+    def _get_relation(self, values):
+        """Return relation model and kwargs of a timeseries row
+
+        Timeseries is associated with the deepest site tree element and a zone.
+        """
+        relations = []
+        path = ()
+        for column, parent_column in (
+            ("Site", None),
+            ("Building", "Site"),
+            ("Storey", "Building"),
+            ("Space", "Storey"),
+        ):
+            if name := values[column]:
+                if parent_column is not None and not values[parent_column]:
+                    raise self.ERROR(
+                        f'Missing {parent_column.lower()} for {column.lower()} "{name}"'
+                    )
+                path = (*path, name)
+        if path:
+            column = ("Site", "Building", "Storey", "Space")[len(path) - 1]
+            level, rel_model, field = TIMESERIES_RELATIONS[column]
+            relations.append((rel_model, {field: self._get_element_id(level, path)}))
+        if name := values["Zone"]:
+            level, rel_model, field = TIMESERIES_RELATIONS["Zone"]
+            relations.append((rel_model, {field: self._get_element_id(level, (name,))}))
+        return relations
+
+    def import_csv(self, timeseries_csv):
+        """Import timeseries from CSV file"""
+        reader = _get_reader(timeseries_csv, TimeseriesCSVIO.TS_FIELDS, self.ERROR)
+        properties = self._get_properties(reader)
+        campaign_scopes = {
+            cs.name: cs.id
+            for cs in model.CampaignScope.get(campaign_id=self.campaign_id)
+        }
+        self._fetch_tree(("spaces", "zones"))
+        timeseries = dict(
+            model.Timeseries.get(campaign_id=self.campaign_id).with_entities(
+                model.Timeseries.name, model.Timeseries.id
+            )
+        )
+
+        for batch_idx, batch in enumerate(_iter_batches(reader, self.batch_size)):
+            batch_start = batch_idx * self.batch_size + 1
+            # Last row wins if a timeseries appears several times in the batch
+            rows = {}
+            for row in batch:
+                values = _pop_row(row, TimeseriesCSVIO.TS_FIELDS)
+                cs_name = values["Campaign scope"]
+                try:
+                    cs_id = campaign_scopes[cs_name]
+                except KeyError as exc:
+                    raise self.ERROR(f'Unknown campaign scope: "{cs_name}"') from exc
+                kwargs = {
+                    "campaign_id": self.campaign_id,
+                    "name": values["Name"],
+                    "description": values["Description"],
+                    "unit_symbol": values["Unit"],
+                    "campaign_scope_id": cs_id,
+                }
+                rows[values["Name"]] = (kwargs, self._get_relation(values), row)
+
+            existing_ids = [timeseries[name] for name in rows if name in timeseries]
+            existing = {
+                ts.id: ts
+                for ts in model.Timeseries.get().filter(
+                    model.Timeseries.id.in_(existing_ids)
+                )
+            }
+            for _, rel_model, _ in TIMESERIES_RELATIONS.values():
+                for relation in rel_model.get().filter(
+                    rel_model.timeseries_id.in_(existing_ids)
+                ):
+                    relation.delete()
+            existing_data = {
+                (data.timeseries_id, data.property_id): data
+                for data in model.TimeseriesPropertyData.get().filter(
+                    model.TimeseriesPropertyData.timeseries_id.in_(existing_ids)
+                )
+            }
+
+            created = {}
+            for name, (kwargs, _, _) in rows.items():
+                if (ts_id := timeseries.get(name)) is None:
+                    created[name] = model.Timeseries.new(**kwargs)
+                else:
+                    existing[ts_id].update(**kwargs)
+            self._flush("Timeseries", batch_start, len(batch))
+            timeseries.update({name: ts.id for name, ts in created.items()})
+
+            for name, (_, relations, row) in rows.items():
+                ts_id = timeseries[name]
+                for rel_model, rel_kwargs in relations:
+                    rel_model.new(timeseries_id=ts_id, **rel_kwargs)
+                for key, value in ((k, v) for k, v in row.items() if k is not None):
+                    if value:
+                        prop_id = properties[key]
+                        self._set_property_data(
+                            model.TimeseriesPropertyData,
+                            existing_data.get((ts_id, prop_id)),
+                            {"timeseries_id": ts_id, "property_id": prop_id},
+                            value,
+                        )
+            self._flush("Timeseries properties", batch_start, len(batch))
+
+            self._commit_batch(len(batch), len(created), len(rows) - len(created))
+        return self.report
@@ -0,0 +1,83 @@
+"""Description tree import jobs
+
+Large imports are run in the background by a Celery worker, using bulk
+importers. Uploaded CSV files are stored in the job directory, in the import
+directory, which must be shared by the API and the worker. The job report is
+updated after each batch to expose the import progress.
+
+The worker must import this module to register the task, for instance with the
+``imports`` Celery setting.
+"""
+
+import contextlib
+import os
+
+from celery import Task
+
+from bemserver_core.authorization import CurrentUser, OpenBar
+from bemserver_core.celery import celery
+from bemserver_core.database import db
+from bemserver_core.model import Campaign, User
+
+from bemserver_api.jobs import update_job
+
+from .bulk import SitesBulkImporter, TimeseriesBulkImporter
+
+IMPORTERS = {
+    "sites": SitesBulkImporter,
+    "timeseries": TimeseriesBulkImporter,
+}
+
+
+def get_job_file_path(import_dir, job_id, file_name):
+    """Return path of uploaded CSV file"""
+    return os.path.join(import_dir, job_id, f"{file_name}.csv")
+
+
+class ImportDescriptionTreeTask(Task):
+    """Import sites or timeseries description tree from CSV files"""
+
+    name = "ImportDescriptionTree"
+
+    def run(self, import_dir, job_id, user_id, campaign_id, file_names, *, batch_size):
+        job = update_job(import_dir, job_id, status="running")
+        if job is None:
+            return
+        paths = {
+            name: get_job_file_path(import_dir, job_id, name) for name in file_names
+        }
+        importer = None
+        try:
+            with OpenBar():
+                user = User.get_by_id(user_id)
+            with CurrentUser(user), contextlib.ExitStack() as stack:
+                importer = IMPORTERS[job["kind"]](
+                    Campaign.get_by_id(campaign_id),
+                    batch_size=batch_size,
+                    progress=lambda report: update_job(
+                        import_dir, job_id, report=report
+                    ),
+                )
+                csv_files = {
+                    name: stack.enter_context(open(path, encoding="utf-8", newline=""))
+                    for name, path in paths.items()
+                }
+                report = importer.import_csv(**csv_files)
+        except Exception as exc:
+            db.session.rollback()
+            update_job(
+                import_dir,
+                job_id,
+                status="failed",
+                message=str(exc),
+                report=importer.report if importer is not None else None,
+            )
+            raise
+        finally:
+            for path in paths.values():
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+        update_job(import_dir, job_id, status="done", report=report)
+
+
+import_task = celery.register_task(ImportDescriptionTreeTask())
@@ -2,16 +2,23 @@
 
 import io
 
+import flask
+
 from flask_smorest import abort
 
+from bemserver_core.authorization import get_current_user
 from bemserver_core.database import db
 from bemserver_core.exceptions import BEMServerCoreIOError
 from bemserver_core.input_output import sites_csv_io, timeseries_csv_io
 from bemserver_core.model import Campaign
 
-from bemserver_api import Blueprint
+from bemserver_api import Blueprint, jobs
 
+from . import imports
+from .bulk import SitesBulkImporter, TimeseriesBulkImporter
 from .schemas import (
+    BulkImportReportSchema,
+    ImportJobSchema,
     SitesCSVUploadFileSchema,
     SitesCSVUploadQueryArgsSchema,
     TimeseriesCSVUploadFileSchema,
@@ -71,3 +78,155 @@ def timeseries_csv_io_post(args, files):
         abort(422, message=str(exc))
 
     db.session.commit()
+
+
+def _get_campaign(campaign_id):
+    campaign = Campaign.get_by_id(campaign_id)
+    if campaign is None:
+        abort(422, errors={"query": {"campaign_id": ["Unknown campaign ID."]}})
+    return campaign
+
+
+def _bulk_import(importer, csv_files):
+    try:
+        return importer.import_csv(**csv_files)
+    except (BEMServerCoreIOError, UnicodeDecodeError) as exc:
+        abort(
+            422,
+            message=f"Invalid CSV file content: {exc}",
+            errors={"report": importer.report},
+        )
+
+
+@blp.post("/sites/bulk")
+@blp.login_required
+@blp.arguments(SitesCSVUploadQueryArgsSchema, location="query")
+@blp.arguments(SitesCSVUploadFileSchema, location="files")
+@blp.response(201, BulkImportReportSchema)
+def sites_csv_io_bulk_post(args, files):
+    """Import site description tree in batches
+
+    Rows are imported in batches, each batch being committed separately, to
+    avoid holding locks during the whole import. On error, previous batches
+    are kept and the error response contains the import report.
+
+    Recommended for large files.
+    """
+    importer = SitesBulkImporter(
+        _get_campaign(args["campaign_id"]),
+        batch_size=flask.current_app.config["IO_IMPORT_BATCH_SIZE"],
+    )
+    csv_files = {
+        k: io.TextIOWrapper(v, encoding="utf-8")
+        for k, v in files.items()
+        if v is not None
+    }
+    return _bulk_import(importer, csv_files)
+
+
+@blp.post("/timeseries/bulk")
+@blp.login_required
+@blp.arguments(TimeseriesCSVUploadQueryArgsSchema, location="query")
+@blp.arguments(TimeseriesCSVUploadFileSchema, location="files")
+@blp.response(201, BulkImportReportSchema)
+def timeseries_csv_io_bulk_post(args, files):
+    """Import timeseries description tree in batches
+
+    Rows are imported in batches, each batch being committed separately, to
+    avoid holding locks during the whole import. On error, previous batches
+    are kept and the error response contains the import report.
+
+    Recommended for large files.
+    """
+    importer = TimeseriesBulkImporter(
+        _get_campaign(args["campaign_id"]),
+        batch_size=flask.current_app.config["IO_IMPORT_BATCH_SIZE"],
+    )
+    timeseries_csv = io.TextIOWrapper(files["timeseries_csv"], encoding="utf-8")
+    return _bulk_import(importer, {"timeseries_csv": timeseries_csv})
+
+
+def _get_import_dir():
+    import_dir = flask.current_app.config["IO_IMPORT_DIR"]
+    if not import_dir:
+        abort(501, message="Import jobs are disabled")
+    return import_dir
+
+
+def _create_import_job(kind, campaign_id, files):
+    import_dir = _get_import_dir()
+    campaign = _get_campaign(campaign_id)
+    files = {k: v for k, v in files.items() if v is not None}
+    retention = flask.current_app.config["IO_IMPORT_RETENTION"]
+    if retention is not None:
+        jobs.delete_expired_jobs(import_dir, retention)
+    user = get_current_user()
+    job = jobs.create_job(import_dir, user.id, kind=kind)
+    for name, file in files.items():
+        file.save(imports.get_job_file_path(import_dir, job["id"], name))
+    imports.import_task.delay(
+        import_dir,
+        job["id"],
+        user.id,
+        campaign.id,
+        list(files),
+        batch_size=flask.current_app.config["IO_IMPORT_BATCH_SIZE"],
+    )
+    return job
+
+
+def _get_import_job(job_id):
+    import_dir = _get_import_dir()
+    job = jobs.get_job(import_dir, job_id) or abort(404)
+    user = get_current_user()
+    if job["user_id"] != user.id and not user.is_admin:
+        abort(403)
+    return import_dir, job
+
+
+@blp.post("/sites/jobs")
+@blp.login_required
+@blp.arguments(SitesCSVUploadQueryArgsSchema, location="query")
+@blp.arguments(SitesCSVUploadFileSchema, location="files")
+@blp.response(202, ImportJobSchema)
+def sites_csv_io_job_post(args, files):
+    """Start a site description tree import job
+
+    Files are imported in background in batches. Use the job resource to get
+    the job status and the import progress. Jobs are deleted some time after
+    they are done.
+    """
+    return _create_import_job("sites", args["campaign_id"], files)
+
+
+@blp.post("/timeseries/jobs")
+@blp.login_required
+@blp.arguments(TimeseriesCSVUploadQueryArgsSchema, location="query")
+@blp.arguments(TimeseriesCSVUploadFileSchema, location="files")
+@blp.response(202, ImportJobSchema)
+def timeseries_csv_io_job_post(args, files):
+    """Start a timeseries description tree import job
+
+    File is imported in background in batches. Use the job resource to get the
+    job status and the import progress. Jobs are deleted some time after they
+    are done.
+    """
+    return _create_import_job("timeseries", args["campaign_id"], files)
+
+
+@blp.get("/jobs/<string:job_id>")
+@blp.login_required
+@blp.response(200, ImportJobSchema)
+def import_job_get(job_id):
+    """Get description tree import job"""
+    _, job = _get_import_job(job_id)
+    return job
+
+
+@blp.delete("/jobs/<string:job_id>")
+@blp.login_required
+@blp.response(204)
+def import_job_delete(job_id):
+    """Delete description tree import job"""
+    import_dir, _ = _get_import_job(job_id)
+    jobs.delete_job(import_dir, job_id)
@@ -4,6 +4,7 @@ import marshmallow as ma
 from flask_smorest.fields import Upload
 
 from bemserver_api import Schema
+from bemserver_api.extensions import ma_fields
 
 
 class SitesCSVUploadQueryArgsSchema(Schema):
@@ -24,3 +25,60 @@ class TimeseriesCSVUploadQueryArgsSchema(Schema):
 
 class TimeseriesCSVUploadFileSchema(Schema):
     timeseries_csv = Upload(required=True)
+
+
+class BulkImportReportSchema(Schema):
+    rows = ma.fields.Int(
+        metadata={
+            "description": "Number of CSV rows imported",
+        },
+    )
+    created = ma.fields.Int(
+        metadata={
+            "description": "Number of items created",
+        },
+    )
+    updated = ma.fields.Int(
+        metadata={
+            "description": "Number of items updated",
+        },
+    )
+
+
+class ImportJobSchema(Schema):
+    id = ma.fields.String(
+        metadata={
+            "description": "Job ID",
+        },
+    )
+    kind = ma.fields.String(
+        metadata={
+            "description": "Imported description tree (sites or timeseries)",
+        },
+    )
+    status = ma.fields.String(
+        metadata={
+            "description": "Job status (pending, running, done or failed)",
+        },
+    )
+    created_at = ma_fields.AwareDateTime(
+        metadata={
+            "description": "Creation datetime",
+        },
+    )
+    updated_at = ma_fields.AwareDateTime(
+        metadata={
+            "description": "Last status update datetime",
+        },
+    )
+    report = ma.fields.Nested(
+        BulkImportReportSchema,
+        metadata={
+            "description": "Import report, updated after each batch",
+        },
+    )
+    message = ma.fields.String(
+        metadata={
+            "description": "Error message (if failed)",
+        },
+    )
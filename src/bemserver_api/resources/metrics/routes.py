@@ -0,0 +1,23 @@
+"""Metrics resources"""
+
+import flask
+
+from bemserver_api import Blueprint
+from bemserver_api.extensions.metrics import metrics
+
+PROMETHEUS_MIME_TYPE = "text/plain; version=0.0.4"
+
+blp = Blueprint(
+    "Metrics", __name__, url_prefix="/metrics", description="Application metrics"
+)
+
+
+@blp.get("/")
+@blp.response(200, schema={"type": "string"}, content_type="text/plain")
+def get_metrics():
+    """Get application metrics
+
+    Metrics are exposed in Prometheus text format. Each process exposes its own
+    metrics.
+    """
+    return flask.Response(metrics.registry.render(), mimetype=PROMETHEUS_MIME_TYPE)
@@ -18,7 +18,7 @@ from bemserver_core.model import Site
 from bemserver_core.process.degree_days import compute_dd_for_site
 from bemserver_core.process.weather import wdp
 
-from bemserver_api import Blueprint
+from bemserver_api import Blueprint, SQLCursorPage
 from bemserver_api.database import db
 
 from .schemas import (
@@ -53,7 +53,8 @@ class SiteViews(MethodView):
     @blp.login_required
     @blp.etag
     @blp.arguments(SiteQueryArgsSchema, location="query")
-    @blp.response(200, SiteSchema(many=True))
+    @blp.response(200, SiteSchema(many=True), ndjson=True)
+    @blp.paginate(SQLCursorPage, optional=True)
     def get(self, args):
         """List sites"""
         return Site.get(**args)
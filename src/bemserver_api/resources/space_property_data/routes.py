@@ -7,7 +7,7 @@ from flask_smorest import abort
 from bemserver_core.exceptions import PropertyTypeInvalidError
 from bemserver_core.model import SpacePropertyData
 
-from bemserver_api import Blueprint
+from bemserver_api import Blueprint, SQLCursorPage
 from bemserver_api.database import db
 
 from .schemas import (
@@ -28,7 +28,8 @@ class SpacePropertyDataViews(MethodView):
     @blp.login_required
     @blp.etag
     @blp.arguments(SpacePropertyDataQueryArgsSchema, location="query")
-    @blp.response(200, SpacePropertyDataSchema(many=True))
+    @blp.response(200, SpacePropertyDataSchema(many=True), ndjson=True)
+    @blp.paginate(SQLCursorPage, optional=True)
     def get(self, args):
         """List space property data"""
         return SpacePropertyData.get(**args)
@@ -8,8 +8,16 @@ from bemserver_core.model import Space
 
 from bemserver_api import Blueprint
 from bemserver_api.database import db
+from bemserver_api.extensions import bulk
 
-from .schemas import SpacePutSchema, SpaceQueryArgsSchema, SpaceSchema
+from .schemas import (
+    SpaceBulkPostSchema,
+    SpaceBulkPutSchema,
+    SpaceBulkResultSchema,
+    SpacePutSchema,
+    SpaceQueryArgsSchema,
+    SpaceSchema,
+)
 
 blp = Blueprint(
     "Space", __name__, url_prefix="/spaces", description="Operations on spaces"
@@ -38,6 +46,42 @@ class SpaceViews(MethodView):
         return item
 
 
+@blp.route("/bulk")
+class SpaceBulkViews(MethodView):
+    @blp.login_required
+    @blp.arguments(SpaceBulkPostSchema(many=True))
+    @blp.response(200, SpaceBulkResultSchema(many=True))
+    def post(self, new_items):
+        """Add new spaces in bulk
+
+        Items are created in a single transaction. Returns the status of each
+        item, in request order.
+        """
+        return bulk.create(Space, new_items, SpaceSchema())
+
+    @blp.login_required
+    @blp.arguments(SpaceBulkPutSchema(many=True))
+    @blp.response(200, SpaceBulkResultSchema(many=True))
+    def put(self, new_items):
+        """Update existing spaces in bulk
+
+        Items are updated in a single transaction, without ETag check. Returns
+        the status of each item, in request order.
+        """
+        return bulk.update(Space, new_items, SpaceSchema())
+
+    @blp.login_required
+    @blp.arguments(bulk.BulkDeleteSchema)
+    @blp.response(200, bulk.BulkResultSchema(many=True))
+    def delete(self, args):
+        """Delete spaces in bulk
+
+        Items are deleted in a single transaction, without ETag check. Returns
+        the status of each item, in request order.
+        """
+        return bulk.delete(Space, args["ids"])
+
+
 @blp.route("/<int:item_id>")
 class SpaceByIdViews(MethodView):
     @blp.login_required
@@ -7,6 +7,7 @@ from bemserver_core.model import Space
 
 from bemserver_api import AutoSchema, Schema
 from bemserver_api.extensions import ma_fields
+from bemserver_api.extensions.bulk import BulkItemsMixinSchema, BulkResultSchema
 
 
 class SpaceSchema(AutoSchema):
@@ -22,6 +23,18 @@ class SpacePutSchema(SpaceSchema):
         exclude = ("storey_id",)
 
 
+class SpaceBulkPostSchema(SpaceSchema, BulkItemsMixinSchema):
+    pass
+
+
+class SpaceBulkPutSchema(SpacePutSchema, BulkItemsMixinSchema):
+    id = ma.fields.Integer(required=True)
+
+
+class SpaceBulkResultSchema(BulkResultSchema):
+    item = ma.fields.Nested(SpaceSchema)
+
+
 class SpaceQueryArgsSchema(Schema):
     sort = ma_fields.SortField(("name",))
     name = ma.fields.Str()
@@ -7,7 +7,7 @@ from flask_smorest import abort
 from bemserver_core.exceptions import PropertyTypeInvalidError
 from bemserver_core.model import StoreyPropertyData
 
-from bemserver_api import Blueprint
+from bemserver_api import Blueprint, SQLCursorPage
 from bemserver_api.database import db
 
 from .schemas import (
@@ -28,7 +28,8 @@ class StoreyPropertyDataViews(MethodView):
     @blp.login_required
     @blp.etag
     @blp.arguments(StoreyPropertyDataQueryArgsSchema, location="query")
-    @blp.response(200, StoreyPropertyDataSchema(many=True))
+    @blp.response(200, StoreyPropertyDataSchema(many=True), ndjson=True)
+    @blp.paginate(SQLCursorPage, optional=True)
     def get(self, args):
         """List storey property data"""
         return StoreyPropertyData.get(**args)
@@ -6,7 +6,7 @@ from flask_smorest import abort
 
 from bemserver_core.model import TaskByCampaign
 
-from bemserver_api import Blueprint
+from bemserver_api import Blueprint, SQLCursorPage
 from bemserver_api.database import db
 
 from .schemas import (
@@ -28,7 +28,8 @@ class TaskByCampaignViews(MethodView):
     @blp.login_required
     @blp.etag
     @blp.arguments(TaskByCampaignQueryArgsSchema, location="query")
-    @blp.response(200, TaskByCampaignSchema(many=True))
+    @blp.response(200, TaskByCampaignSchema(many=True), ndjson=True)
+    @blp.paginate(SQLCursorPage, optional=True)
     def get(self, args):
         """List scheduled tasks x campaign associations"""
         return TaskByCampaign.get(**args)
@@ -8,8 +8,16 @@ from bemserver_core.model import Timeseries
 
 from bemserver_api import Blueprint, SQLCursorPage
 from bemserver_api.database import db
+from bemserver_api.extensions import bulk
 
-from .schemas import TimeseriesPutSchema, TimeseriesQueryArgsSchema, TimeseriesSchema
+from .schemas import (
+    TimeseriesBulkPostSchema,
+    TimeseriesBulkPutSchema,
+    TimeseriesBulkResultSchema,
+    TimeseriesPutSchema,
+    TimeseriesQueryArgsSchema,
+    TimeseriesSchema,
+)
 
 blp = Blueprint(
     "Timeseries",
@@ -42,6 +50,42 @@ class TimeseriesViews(MethodView):
         return item
 
 
+@blp.route("/bulk")
+class TimeseriesBulkViews(MethodView):
+    @blp.login_required
+    @blp.arguments(TimeseriesBulkPostSchema(many=True))
+    @blp.response(200, TimeseriesBulkResultSchema(many=True))
+    def post(self, new_items):
+        """Add new timeseries in bulk
+
+        Items are created in a single transaction. Returns the status of each
+        item, in request order.
+        """
+        return bulk.create(Timeseries, new_items, TimeseriesSchema())
+
+    @blp.login_required
+    @blp.arguments(TimeseriesBulkPutSchema(many=True))
+    @blp.response(200, TimeseriesBulkResultSchema(many=True))
+    def put(self, new_items):
+        """Update existing timeseries in bulk
+
+        Items are updated in a single transaction, without ETag check. Returns
+        the status of each item, in request order.
+        """
+        return bulk.update(Timeseries, new_items, TimeseriesSchema())
+
+    @blp.login_required
+    @blp.arguments(bulk.BulkDeleteSchema)
+    @blp.response(200, bulk.BulkResultSchema(many=True))
+    def delete(self, args):
+        """Delete timeseries in bulk
+
+        Items are deleted in a single transaction, without ETag check. Returns
+        the status of each item, in request order.
+        """
+        return bulk.delete(Timeseries, args["ids"])
+
+
 @blp.route("/<int:item_id>")
 class TimeseriesByIdViews(MethodView):
     @blp.login_required
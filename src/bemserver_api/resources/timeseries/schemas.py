@@ -7,6 +7,7 @@ from bemserver_core.model import Timeseries
 
 from bemserver_api import AutoSchema, Schema
 from bemserver_api.extensions import ma_fields
+from bemserver_api.extensions.bulk import BulkItemsMixinSchema, BulkResultSchema
 
 
 class TimeseriesSchema(AutoSchema):
@@ -23,6 +24,18 @@ class TimeseriesPutSchema(TimeseriesSchema):
         exclude = ("campaign_id", "campaign_scope_id")
 
 
+class TimeseriesBulkPostSchema(TimeseriesSchema, BulkItemsMixinSchema):
+    pass
+
+
+class TimeseriesBulkPutSchema(TimeseriesPutSchema, BulkItemsMixinSchema):
+    id = ma.fields.Integer(required=True)
+
+
+class TimeseriesBulkResultSchema(BulkResultSchema):
+    item = ma.fields.Nested(TimeseriesSchema)
+
+
 class TimeseriesQueryArgsSchema(Schema):
     sort = ma_fields.SortField(("name",))
     name = ma.fields.String()
@@ -8,8 +8,11 @@ from bemserver_core.model import TimeseriesBySite
 
 from bemserver_api import Blueprint, SQLCursorPage
 from bemserver_api.database import db
+from bemserver_api.extensions import bulk
 
 from .schemas import (
+    TimeseriesBySiteBulkPostSchema,
+    TimeseriesBySiteBulkResultSchema,
     TimeseriesBySiteQueryArgsSchema,
     TimeseriesBySiteSchema,
 )
@@ -43,6 +46,31 @@ class TimeseriesBySiteViews(MethodView):
         return item
 
 
+@blp.route("/bulk")
+class TimeseriesBySiteBulkViews(MethodView):
+    @blp.login_required
+    @blp.arguments(TimeseriesBySiteBulkPostSchema(many=True))
+    @blp.response(200, TimeseriesBySiteBulkResultSchema(many=True))
+    def post(self, new_items):
+        """Add new timeseries x site associations in bulk
+
+        Items are created in a single transaction. Returns the status of each
+        item, in request order.
+        """
+        return bulk.create(TimeseriesBySite, new_items, TimeseriesBySiteSchema())
+
+    @blp.login_required
+    @blp.arguments(bulk.BulkDeleteSchema)
+    @blp.response(200, bulk.BulkResultSchema(many=True))
+    def delete(self, args):
+        """Delete timeseries x site associations in bulk
+
+        Items are deleted in a single transaction, without ETag check. Returns
+        the status of each item, in request order.
+        """
+        return bulk.delete(TimeseriesBySite, args["ids"])
+
+
 @blp.route("/<int:item_id>")
 class TimeseriesBySiteByIdViews(MethodView):
     @blp.login_required
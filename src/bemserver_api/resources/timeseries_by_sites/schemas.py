@@ -6,6 +6,7 @@ import marshmallow_sqlalchemy as msa
 from bemserver_core.model import TimeseriesBySite
 
 from bemserver_api import AutoSchema, Schema
+from bemserver_api.extensions.bulk import BulkItemsMixinSchema, BulkResultSchema
 
 from ..sites.schemas import SiteSchema
 
@@ -18,6 +19,14 @@ class TimeseriesBySiteSchema(AutoSchema):
     site = ma.fields.Nested(SiteSchema(exclude=("id",)), dump_only=True)
 
 
+class TimeseriesBySiteBulkPostSchema(TimeseriesBySiteSchema, BulkItemsMixinSchema):
+    pass
+
+
+class TimeseriesBySiteBulkResultSchema(BulkResultSchema):
+    item = ma.fields.Nested(TimeseriesBySiteSchema)
+
+
 class TimeseriesBySiteQueryArgsSchema(Schema):
     site_id = ma.fields.Int()
     timeseries_id = ma.fields.Int()
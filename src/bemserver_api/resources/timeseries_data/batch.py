@@ -0,0 +1,164 @@
+"""Timeseries data batch queries
+
+Several queries are run in a single request. The timeseries and data states of
+all queries are fetched at once, then queries are run, sequentially or in a
+thread pool, and their results are returned in a single JSON response.
+
+Errors are reported per query and don't prevent other queries from running.
+"""
+
+import concurrent.futures
+import contextvars
+import json
+
+import sqlalchemy as sqla
+
+from bemserver_core.authorization import BEMServerAuthorizationError, auth_mgr
+from bemserver_core.database import db
+from bemserver_core.exceptions import BEMServerCoreError, TimeseriesNotFoundError
+from bemserver_core.model import Timeseries, TimeseriesDataState
+
+from bemserver_api.extensions import instrumentation
+
+
+class BatchQueryError(Exception):
+    """Invalid batch query"""
+
+
+class Lookup:
+    """Timeseries and data states of a batch
+
+    :param dict timeseries: Mapping of timeseries label (ID or name) ->
+        timeseries, or authorization error if timeseries can't be read
+    :param dict data_states: Mapping of data state ID -> data state
+    """
+
+    def __init__(self, timeseries, data_states):
+        self._timeseries = timeseries
+        self._data_states = data_states
+
+    def get_timeseries(self, labels):
+        """Return timeseries list from labels"""
+        unknown = [label for label in labels if label not in self._timeseries]
+        if unknown:
+            raise TimeseriesNotFoundError(f"Unknown timeseries: {unknown}")
+        timeseries = [self._timeseries[label] for label in labels]
+        for ts in timeseries:
+            if isinstance(ts, BEMServerAuthorizationError):
+                raise ts
+        # Objects are loaded in request session. Attach them to current session
+        # in case query runs in a worker thread.
+        return [db.session.merge(ts, load=False) for ts in timeseries]
+
+    def get_data_state(self, data_state_id):
+        """Return data state from ID"""
+        data_state = self._data_states.get(data_state_id)
+        if data_state is None:
+            raise BatchQueryError("Unknown data state ID")
+        return db.session.merge(data_state, load=False)
+
+
+def _authorize(timeseries):
+    ret = {}
+    for label, ts in timeseries.items():
+        try:
+            auth_mgr.authorize("read", ts)
+        except BEMServerAuthorizationError as exc:
+            ret[label] = exc
+        else:
+            ret[label] = ts
+    return ret
+
+
+def _get_data_states(queries):
+    data_state_ids = {query["data_state"] for query in queries}
+    return {
+        ds.id: ds
+        for ds in db.session.scalars(
+            sqla.select(TimeseriesDataState).where(
+                TimeseriesDataState.id.in_(data_state_ids)
+            )
+        )
+    }
+
+
+def get_lookup_by_id(queries):
+    """Fetch timeseries by ID and data states of all queries"""
+    timeseries_ids = {ts_id for query in queries for ts_id in query["timeseries"]}
+    timeseries = {
+        ts.id: ts
+        for ts in db.session.scalars(
+            sqla.select(Timeseries).where(Timeseries.id.in_(timeseries_ids))
+        )
+    }
+    return Lookup(_authorize(timeseries), _get_data_states(queries))
+
+
+def get_lookup_by_name(campaign, queries):
+    """Fetch timeseries by name and data states of all queries"""
+    timeseries_names = {name for query in queries for name in query["timeseries"]}
+    timeseries = {
+        ts.name: ts
+        for ts in db.session.scalars(
+            sqla.select(Timeseries)
+            .where(Timeseries.campaign_id == campaign.id)
+            .where(Timeseries.name.in_(timeseries_names))
+        )
+    }
+    return Lookup(_authorize(timeseries), _get_data_states(queries))
+
+
+def _run_query(run_query, query):
+    """Run query and return result as JSON string"""
+    try:
+        data = run_query(query)
+    except BEMServerAuthorizationError as exc:
+        return json.dumps({"status": 403, "message": str(exc)})
+    except (BEMServerCoreError, BatchQueryError) as exc:
+        return json.dumps({"status": 422, "message": str(exc)})
+    # Data is already serialized: don't decode and encode it again
+    return f'{{"status": 200, "data": {data}}}'
+
+
+def _run_query_in_thread(run_query, query):
+    """Run query and return result and thread instrumentation"""
+    # Don't update request instrumentation concurrently from worker threads
+    stats = instrumentation.start_thread_stats()
+    try:
+        return _run_query(run_query, query), stats
+    finally:
+        # Release the thread-local session and its connection
+        db.session.remove()
+
+
+def run_queries(queries, run_query, *, max_workers=1):
+    """Run batch queries and return JSON response
+
+    :param list queries: Queries
+    :param callable run_query: Function running a query and returning its
+        result as a JSON string
+    :param int max_workers: Maximum number of queries run in parallel
+    """
+    if max_workers > 1 and len(queries) > 1:
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(max_workers, len(queries))
+        ) as executor:
+            # Run each query in a copy of current context to pass app context
+            # and current user
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    _run_query_in_thread,
+                    run_query,
+                    query,
+                )
+                for query in queries
+            ]
+            results = []
+            for future in futures:
+                result, stats = future.result()
+                instrumentation.merge_thread_stats(stats)
+                results.append(result)
+    else:
+        results = [_run_query(run_query, query) for query in queries]
+    return f'{{"results": [{", ".join(results)}]}}'
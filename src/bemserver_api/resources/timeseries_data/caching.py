@@ -0,0 +1,297 @@
+"""Timeseries data response cache
+
+Responses are cached with a key built from query arguments and a watermark for
+each timeseries x data state. Watermarks are random tokens renewed each time
+data is written or deleted, so that cached responses are never stale.
+
+Rollups also use watermarks per timeseries x data state and UTC day, month and
+year, so that only rollups of the modified periods are discarded.
+
+Inserts are detected on the DB session and deletes are recorded by the
+resources. Watermarks are renewed after commit.
+
+Watermarks are also used to compute ETags of timeseries data read requests.
+Without cache, data changes can't be detected without reading data, so no ETag
+is computed. A wrong 304 being worse than no ETag, ETags are only computed if
+the cache is shared with the other processes, including the workers writing
+data, as watermarks are only renewed by writes of processes using the cache.
+"""
+
+import datetime as dt
+import json
+from zoneinfo import ZoneInfo
+
+import sqlalchemy as sqla
+
+from bemserver_core.authorization import auth_mgr
+from bemserver_core.database import db
+from bemserver_core.model import TimeseriesByDataState, TimeseriesData
+from bemserver_core.time_utils import ceil, floor, make_date_offset
+
+from bemserver_api.extensions.cache import cache, get_watermark
+
+WATERMARK_KEY = "timeseries_data:watermark:{}"
+PERIOD_WATERMARK_KEY = "timeseries_data:watermark:{}:{}:{}"
+AGGREGATE_KEY = "timeseries_data:aggregate:{}"
+
+# Periods of rollup watermarks
+WATERMARK_PERIODS = ("day", "month", "year")
+# Changes spanning more days are handled by clearing the whole cache
+MAX_INVALIDATED_DAYS = 10 * 366
+
+# Session info key storing changes in transaction:
+# timeseries x data state ID -> (first timestamp, last timestamp)
+CHANGES_KEY = "timeseries_data_changes"
+# Session info key flagging unknown changes in transaction
+ALL_CHANGED_KEY = "timeseries_data_all_changed"
+
+
+def get_tsbds_ids(timeseries, data_state):
+    """Return timeseries ID -> timeseries x data state ID mapping"""
+    return dict(
+        db.session.query(TimeseriesByDataState.timeseries_id, TimeseriesByDataState.id)
+        .filter(TimeseriesByDataState.data_state_id == data_state.id)
+        .filter(TimeseriesByDataState.timeseries_id.in_(ts.id for ts in timeseries))
+        .all()
+    )
+
+
+def record_changes(changes):
+    """Record timeseries data modified in current transaction
+
+    :param dict changes: Mapping of timeseries x data state ID ->
+        (first timestamp, last timestamp) of modified data
+    """
+    if cache.watermarks is None:
+        return
+    recorded = db.session.info.setdefault(CHANGES_KEY, {})
+    for tsbds_id, (start_dt, end_dt) in changes.items():
+        if tsbds_id in recorded:
+            rec_start_dt, rec_end_dt = recorded[tsbds_id]
+            start_dt = min(start_dt, rec_start_dt)
+            end_dt = max(end_dt, rec_end_dt)
+        recorded[tsbds_id] = (start_dt, end_dt)
+
+
+def record_delete(start_dt, end_dt, timeseries, data_state):
+    """Record timeseries data deleted in current transaction"""
+    if cache.watermarks is None:
+        return
+    record_changes(
+        {
+            tsbds_id: (start_dt, end_dt)
+            for tsbds_id in get_tsbds_ids(timeseries, data_state).values()
+        }
+    )
+
+
+def _iter_periods(start_dt, end_dt, period):
+    """Iterate over UTC periods intersecting [start_dt, end_dt]"""
+    period_start = floor(start_dt.astimezone(dt.UTC), period)
+    offset = make_date_offset(period, 1)
+    while period_start <= end_dt:
+        yield period_start
+        period_start += offset
+
+
+def get_period_watermark(store, tsbds_id, period, start_dt, end_dt):
+    """Return watermark of timeseries x data state data in [start_dt, end_dt)
+
+    :param str period: UTC period used to track changes. One of "day", "month"
+        and "year". Interval should not span more than a few periods.
+    """
+    return "-".join(
+        get_watermark(
+            store,
+            PERIOD_WATERMARK_KEY.format(tsbds_id, period, period_start.isoformat()),
+        )
+        for period_start in _iter_periods(
+            start_dt, end_dt - dt.timedelta.resolution, period
+        )
+    )
+
+
+def get_readable_tsbds_ids(timeseries, data_state):
+    """Check timeseries data permissions and return timeseries x data states
+
+    Cached responses and ETags are checked without querying core, so
+    permissions are checked here.
+
+    Returns timeseries ID -> timeseries x data state ID mapping, or None if
+    cache is disabled, as cached responses and ETags are not used.
+    """
+    if cache.watermarks is None:
+        return None
+    for ts in timeseries:
+        auth_mgr.authorize("read_ts_data", ts)
+    return get_tsbds_ids(timeseries, data_state)
+
+
+def aggregate_key(args, timeseries, tsbds_ids, mime_type):
+    """Return cache key for aggregate data, or None if cache is disabled
+
+    :param dict tsbds_ids: Mapping returned by get_readable_tsbds_ids
+    """
+    store = cache.watermarks
+    if store is None or tsbds_ids is None:
+        return None
+    key = {
+        "args": args,
+        "mime_type": mime_type,
+        "timeseries": [
+            (
+                ts.id,
+                ts.unit_symbol,
+                get_watermark(store, WATERMARK_KEY.format(tsbds_ids[ts.id]))
+                if ts.id in tsbds_ids
+                else None,
+            )
+            for ts in timeseries
+        ],
+    }
+    return AGGREGATE_KEY.format(json.dumps(key, sort_keys=True, default=str))
+
+
+def _get_etag_period(start_dt, end_dt):
+    """Return period of watermarks used to check interval data is unchanged"""
+    if end_dt - start_dt <= dt.timedelta(days=31):
+        return "day"
+    if end_dt - start_dt <= dt.timedelta(days=2 * 366):
+        return "month"
+    return "year"
+
+
+def get_etag_data(args, timeseries, tsbds_ids, mime_type):
+    """Return data identifying response of a timeseries data read request
+
+    Data is built from watermarks, so that no data is read. Returns None if
+    cache is disabled or not shared with other processes, as there is no cheap
+    way to detect data changes.
+
+    Only data in requested interval, if any, is considered, so that writes
+    outside of the interval don't modify the ETag.
+
+    :param dict tsbds_ids: Mapping returned by get_readable_tsbds_ids
+    """
+    store = cache.watermarks
+    if store is None or not store.shared or tsbds_ids is None:
+        return None
+    start_dt = args.get("start_time")
+    end_dt = args.get("end_time")
+    if start_dt is None:
+        versions = {
+            tsbds_id: get_watermark(store, WATERMARK_KEY.format(tsbds_id))
+            for tsbds_id in tsbds_ids.values()
+        }
+    else:
+        if "bucket_width_unit" in args:
+            # Buckets may extend beyond requested interval
+            tz_info = ZoneInfo(args["timezone"])
+            start_dt = floor(
+                start_dt.astimezone(tz_info),
+                args["bucket_width_unit"],
+                args["bucket_width_value"],
+            )
+            end_dt = ceil(
+                end_dt.astimezone(tz_info),
+                args["bucket_width_unit"],
+                args["bucket_width_value"],
+            )
+        period = _get_etag_period(start_dt, end_dt)
+        versions = {
+            tsbds_id: get_period_watermark(store, tsbds_id, period, start_dt, end_dt)
+            for tsbds_id in tsbds_ids.values()
+        }
+    return json.dumps(
+        {
+            "args": args,
+            "mime_type": mime_type,
+            "timeseries": [
+                (ts.id, ts.unit_symbol, versions.get(tsbds_ids.get(ts.id)))
+                for ts in timeseries
+            ],
+        },
+        sort_keys=True,
+        default=str,
+    )
+
+
+def get_response(key):
+    """Get cached response, or None if not in cache"""
+    if key is None:
+        return None
+    return cache.backend.get(key)
+
+
+def set_response(key, value):
+    """Store response in cache"""
+    if key is not None:
+        cache.backend.set(key, value)
+
+
+def _invalidate(store, tsbds_id, start_dt, end_dt):
+    store.delete(WATERMARK_KEY.format(tsbds_id))
+    for period in WATERMARK_PERIODS:
+        for period_start in _iter_periods(start_dt, end_dt, period):
+            store.delete(
+                PERIOD_WATERMARK_KEY.format(tsbds_id, period, period_start.isoformat())
+            )
+
+
+@sqla.event.listens_for(db.session, "do_orm_execute")
+def receive_do_orm_execute(orm_execute_state):
+    """Record timeseries x data states and timestamps of inserted data"""
+    if cache.watermarks is None:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if (
+        orm_execute_state.is_insert
+        and mapper is not None
+        and mapper.class_ is TimeseriesData
+    ):
+        params = orm_execute_state.parameters
+        if isinstance(params, dict):
+            params = (params,)
+        changes = {}
+        try:
+            for row in params:
+                tsbds_id = row["timeseries_by_data_state_id"]
+                timestamp = row["timestamp"]
+                if tsbds_id in changes:
+                    start_dt, end_dt = changes[tsbds_id]
+                    changes[tsbds_id] = (
+                        min(start_dt, timestamp),
+                        max(end_dt, timestamp),
+                    )
+                else:
+                    changes[tsbds_id] = (timestamp, timestamp)
+        except (TypeError, KeyError):
+            # Inserted rows are unknown (e.g. values passed in statement)
+            orm_execute_state.session.info[ALL_CHANGED_KEY] = True
+        else:
+            record_changes(changes)
+
+
+@sqla.event.listens_for(db.session, "after_commit")
+def receive_after_commit(session):
+    """Renew watermarks of timeseries data modified in transaction"""
+    changes = session.info.pop(CHANGES_KEY, {})
+    all_changed = session.info.pop(ALL_CHANGED_KEY, False)
+    store = cache.watermarks
+    if store is None:
+        return
+    if all_changed or any(
+        end_dt - start_dt > dt.timedelta(days=MAX_INVALIDATED_DAYS)
+        for start_dt, end_dt in changes.values()
+    ):
+        cache.clear()
+        return
+    for tsbds_id, (start_dt, end_dt) in changes.items():
+        _invalidate(store, tsbds_id, start_dt, end_dt)
+
+
+@sqla.event.listens_for(db.session, "after_rollback")
+def receive_after_rollback(session):
+    """Forget changes of rolled back transaction"""
+    session.info.pop(CHANGES_KEY, None)
+    session.info.pop(ALL_CHANGED_KEY, None)
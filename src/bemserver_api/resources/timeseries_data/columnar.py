@@ -0,0 +1,137 @@
+"""Timeseries data columnar formats (Apache Arrow, Apache Parquet)
+
+Dataframes are converted to Arrow tables as is, so timestamps and values are
+passed as typed columns rather than text. Likewise, uploaded payloads are read
+into a dataframe without any text parsing.
+
+Those formats require pyarrow.
+"""
+
+import flask
+
+from flask_smorest import abort
+
+import pandas as pd
+
+from bemserver_core.exceptions import (
+    TimeseriesDataIODatetimeError,
+    TimeseriesDataIOError,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+
+ARROW_STREAM_MIME_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MIME_TYPE = "application/vnd.apache.parquet"
+MIME_TYPES = (ARROW_STREAM_MIME_TYPE, PARQUET_MIME_TYPE)
+
+
+def _get_compression():
+    return flask.current_app.config["TIMESERIES_DATA_COLUMNAR_COMPRESSION"]
+
+
+def _check_pyarrow(status_code):
+    if pa is None:  # pragma: no cover
+        abort(status_code, message="Columnar formats are not available")
+
+
+def df_to_table(data_df, schema=None):
+    """Convert timeseries dataframe to Arrow table
+
+    Column labels are turned into strings, as in CSV/JSON payloads.
+    Index is exported as a "Datetime" column.
+    """
+    data_df = data_df.copy(deep=False)
+    data_df.columns = data_df.columns.astype(str)
+    data_df.index.name = "Datetime"
+    return pa.Table.from_pandas(data_df, schema=schema, preserve_index=True)
+
+
+def new_arrow_stream_writer(sink, schema):
+    options = pa.ipc.IpcWriteOptions(compression=_get_compression())
+    return pa.ipc.new_stream(sink, schema, options=options)
+
+
+def _write_arrow_stream(table):
+    sink = pa.BufferOutputStream()
+    with new_arrow_stream_writer(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _write_parquet(table):
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression=_get_compression() or "none")
+    return sink.getvalue().to_pybytes()
+
+
+def check_export_available():
+    """Abort with 406 if pyarrow is not installed"""
+    _check_pyarrow(406)
+
+
+def export_df(data_df, mime_type):
+    """Export timeseries dataframe in columnar format"""
+    check_export_available()
+    table = df_to_table(data_df)
+    if mime_type == PARQUET_MIME_TYPE:
+        return _write_parquet(table)
+    return _write_arrow_stream(table)
+
+
+def check_import_available():
+    """Abort with 415 if pyarrow is not installed"""
+    _check_pyarrow(415)
+
+
+def _read_table(data, mime_type):
+    # Wrap request payload in an Arrow buffer without copying it
+    buffer = pa.py_buffer(data)
+    try:
+        if mime_type == PARQUET_MIME_TYPE:
+            return pq.read_table(pa.BufferReader(buffer))
+        return pa.ipc.open_stream(buffer).read_all()
+    except (pa.ArrowInvalid, OSError) as exc:
+        raise TimeseriesDataIOError("Invalid file") from exc
+
+
+def read_df(data, mime_type):
+    """Read timeseries dataframe from columnar payload
+
+    :param bytes data: Arrow IPC stream or Parquet payload
+    :param str mime_type: Payload MIME type
+
+    The payload is expected to contain a "Datetime" column of timezone aware
+    timestamps. Each other column is a timeseries.
+    """
+    table = _read_table(data, mime_type)
+
+    # Drop pandas metadata to ignore index information stored by writer
+    table = table.replace_schema_metadata(None)
+    if "Datetime" not in table.column_names:
+        raise TimeseriesDataIOError("Missing Datetime column")
+    index = table.column("Datetime")
+    if not pa.types.is_timestamp(index.type) or index.type.tz is None:
+        raise TimeseriesDataIODatetimeError("Invalid or TZ-naive timestamp")
+    table = table.drop_columns("Datetime")
+
+    # Values
+    try:
+        table = table.cast(
+            pa.schema([(name, pa.float64()) for name in table.column_names])
+        )
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as exc:
+        raise TimeseriesDataIOError("Invalid values") from exc
+
+    data_df = table.to_pandas(split_blocks=True, self_destruct=True)
+    data_df.index = (
+        pd.DatetimeIndex(index.to_pandas(), name="timestamp")
+        .tz_convert("UTC")
+        .as_unit("us")
+    )
+    return data_df
@@ -0,0 +1,124 @@
+"""Timeseries data downsampling
+
+Reduce the number of points of each timeseries while preserving the shape of
+the curve, for instance to plot data on a chart.
+
+Methods:
+
+- "lttb": Largest-Triangle-Three-Buckets. Points are split in buckets of equal
+  count. In each bucket, the point forming the largest triangle with the point
+  selected in previous bucket and the average of next bucket is selected.
+- "minmax": Interval is split in buckets of equal width (typically one per
+  pixel). In each bucket, minimum and maximum values are selected.
+"""
+
+import numpy as np
+import pandas as pd
+
+from bemserver_core.input_output.timeseries_data_io import (
+    TimeseriesDataCSVIO,
+    TimeseriesDataJSONIO,
+)
+
+DOWNSAMPLING_METHODS = ("lttb", "minmax")
+
+
+def lttb(x, y, max_points):
+    """Select points using Largest-Triangle-Three-Buckets algorithm
+
+    :param ndarray x: Point abscissas, sorted
+    :param ndarray y: Point values
+    :param int max_points: Maximum number of points (at least 3)
+
+    Returns positions of selected points.
+    """
+    nb_points = len(x)
+    if nb_points <= max_points:
+        return np.arange(nb_points)
+    # First and last points are always selected. Others are split in buckets.
+    edges = np.linspace(1, nb_points - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = nb_points - 1
+    prev = 0
+    for idx in range(max_points - 2):
+        start, end = edges[idx], edges[idx + 1]
+        next_end = edges[idx + 2] if idx < max_points - 3 else nb_points
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        # Double of triangle areas (constant factor doesn't matter)
+        areas = np.abs(
+            (x[prev] - next_x) * (y[start:end] - y[prev])
+            - (x[prev] - x[start:end]) * (next_y - y[prev])
+        )
+        prev = start + np.argmax(areas)
+        selected[idx + 1] = prev
+    return selected
+
+
+def minmax(x, y, max_points):
+    """Select minimum and maximum points in buckets of equal width
+
+    :param ndarray x: Point abscissas, sorted
+    :param ndarray y: Point values
+    :param int max_points: Maximum number of points (at least 2)
+
+    Returns positions of selected points.
+    """
+    nb_points = len(x)
+    if nb_points <= max_points:
+        return np.arange(nb_points)
+    nb_buckets = max_points // 2
+    width = (x[-1] - x[0]) / nb_buckets
+    buckets = np.minimum(((x - x[0]) / width).astype(np.int64), nb_buckets - 1)
+    # Sort by bucket then value: min and max are first and last of each bucket
+    order = np.lexsort((y, buckets))
+    sorted_buckets = buckets[order]
+    firsts = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+    lasts = np.r_[firsts[1:] - 1, nb_points - 1]
+    return np.unique(np.r_[order[firsts], order[lasts]])
+
+
+def downsample(data_df, max_points, method="lttb"):
+    """Downsample each timeseries of a dataframe
+
+    :param DataFrame data_df: Timeseries data, as returned by
+        ``tsdio.get_timeseries_data``
+    :param int max_points: Maximum number of points per timeseries
+    :param str method: Downsampling method, "lttb" or "minmax"
+
+    Returns a dataframe. Timestamps not selected for a timeseries have NaN values.
+    """
+    if data_df.empty:
+        return data_df
+    select = {"lttb": lttb, "minmax": minmax}[method]
+    columns = {}
+    for col in data_df.columns:
+        values = data_df[col].dropna()
+        if values.empty:
+            columns[col] = values
+            continue
+        # Use seconds from first timestamp as abscissa to keep float precision
+        x = (values.index - values.index[0]).total_seconds().to_numpy()
+        columns[col] = values.iloc[select(x, values.to_numpy(), max_points)]
+    ret_df = pd.concat(columns, axis=1).reindex(columns=data_df.columns)
+    ret_df.index.name = data_df.index.name
+    ret_df.columns.name = data_df.columns.name
+    return ret_df
+
+
+def make_io(max_points, method="lttb"):
+    """Return core timeseries data CSV and JSON IO exporting downsampled data
+
+    :param int max_points: Maximum number of points per timeseries
+    :param str method: Downsampling method, "lttb" or "minmax"
+    """
+
+    class DownsampledTimeseriesDataIO(TimeseriesDataCSVIO, TimeseriesDataJSONIO):
+        @classmethod
+        def get_timeseries_data(cls, *args, **kwargs):
+            return downsample(
+                super().get_timeseries_data(*args, **kwargs), max_points, method
+            )
+
+    return DownsampledTimeseriesDataIO()
@@ -0,0 +1,135 @@
+"""Timeseries data export jobs
+
+Large exports are run in the background by a Celery worker, which writes the
+data to a compressed file (gzipped CSV or Parquet) in the export directory.
+
+Each job has its own directory containing a JSON file describing the job and,
+once the job is done, the data file. The export directory must be shared by
+the API and the worker.
+
+The worker must import this module to register the task, for instance with the
+``imports`` Celery setting.
+"""
+
+import gzip
+import os
+
+from celery import Task
+
+from bemserver_core.authorization import CurrentUser, OpenBar
+from bemserver_core.celery import celery
+from bemserver_core.input_output import tsdio
+from bemserver_core.model import Timeseries, TimeseriesDataState, User
+
+from bemserver_api.jobs import update_job
+
+from . import columnar, streaming
+
+EXPORT_FORMATS = {
+    "csv": {"file_name": "data.csv.gz", "mime_type": "application/gzip"},
+    "parquet": {"file_name": "data.parquet", "mime_type": columnar.PARQUET_MIME_TYPE},
+}
+
+
+def get_job_file_path(export_dir, job):
+    """Return path of job data file"""
+    return os.path.join(
+        export_dir, job["id"], EXPORT_FORMATS[job["format"]]["file_name"]
+    )
+
+
+def _write_csv(path, start_dt, end_dt, timeseries, data_state, **kwargs):
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        for chunk in streaming.iter_csv(
+            start_dt, end_dt, timeseries, data_state, **kwargs
+        ):
+            f.write(chunk)
+
+
+def _write_parquet(
+    path, start_dt, end_dt, timeseries, data_state, *, chunk_size, compression, **kwargs
+):
+    # Write each time window as a row group
+    writer = None
+    try:
+        for win_start, win_end in streaming.iter_windows(start_dt, end_dt, chunk_size):
+            data_df = tsdio.get_timeseries_data(
+                win_start, win_end, timeseries, data_state, **kwargs
+            )
+            if writer is None:
+                table = columnar.df_to_table(data_df)
+                writer = columnar.pq.ParquetWriter(
+                    path, table.schema, compression=compression or "none"
+                )
+            elif data_df.empty:
+                continue
+            else:
+                table = columnar.df_to_table(data_df, schema=writer.schema)
+            writer.write_table(table)
+    finally:
+        # Release file handle even if a window fails
+        if writer is not None:
+            writer.close()
+
+
+class ExportTimeseriesDataTask(Task):
+    """Export timeseries data to a file"""
+
+    name = "ExportTimeseriesData"
+
+    def run(
+        self,
+        export_dir,
+        job_id,
+        user_id,
+        timeseries_ids,
+        data_state_id,
+        start_dt,
+        end_dt,
+        *,
+        chunk_size,
+        compression=None,
+        convert_to=None,
+        timezone="UTC",
+    ):
+        job = update_job(export_dir, job_id, status="running")
+        if job is None:
+            return
+        path = get_job_file_path(export_dir, job)
+        tmp_path = f"{path}.tmp"
+        try:
+            with OpenBar():
+                user = User.get_by_id(user_id)
+            with CurrentUser(user):
+                timeseries = Timeseries.get_many_by_id(timeseries_ids)
+                data_state = TimeseriesDataState.get_by_id(data_state_id)
+                kwargs = {
+                    "chunk_size": chunk_size,
+                    # Passed as (timeseries ID, unit) pairs as JSON keys are strings
+                    "convert_to": dict(convert_to) if convert_to else None,
+                    "timezone": timezone,
+                }
+                if job["format"] == "parquet":
+                    _write_parquet(
+                        tmp_path,
+                        start_dt,
+                        end_dt,
+                        timeseries,
+                        data_state,
+                        compression=compression,
+                        **kwargs,
+                    )
+                else:
+                    _write_csv(
+                        tmp_path, start_dt, end_dt, timeseries, data_state, **kwargs
+                    )
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            update_job(export_dir, job_id, status="failed", message=str(exc))
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        update_job(export_dir, job_id, status="done", size=os.path.getsize(path))
+
+
+export_task = celery.register_task(ExportTimeseriesDataTask())
@@ -0,0 +1,242 @@
+"""Timeseries data streaming import
+
+Request body is read from the input stream and inserted in batches, each batch
+being committed on its own, so that the whole payload never sits in memory.
+
+Timeseries are checked (existence, permissions) before any of their values is
+inserted: CSV header is checked before reading data and JSON timeseries are
+checked when first read. Timeseries errors abort the import. Batches committed
+before a timeseries error, if any, are kept.
+
+Other errors in a batch don't prevent other batches from being inserted. They
+are reported at the end.
+"""
+
+import io
+import itertools
+import json
+
+from bemserver_core.authorization import BEMServerAuthorizationError
+from bemserver_core.database import db
+from bemserver_core.exceptions import (
+    TimeseriesDataIOError,
+    TimeseriesDataJSONIOError,
+    TimeseriesNotFoundError,
+)
+from bemserver_core.input_output import tsdcsvio, tsdjsonio
+
+# Size of the chunks read from the input stream when parsing JSON
+READ_SIZE = 64 * 1024
+
+JSON_WHITESPACE = " \t\n\r"
+JSON_DELIMITERS = tuple(JSON_WHITESPACE + ",:]}")
+
+
+def iter_csv_batches(text_stream, batch_size):
+    """Iterate over CSV payload as (row count, CSV string) batches
+
+    Each batch is a CSV file with the header of the payload.
+    """
+    header = text_stream.readline()
+    yield 0, header
+    while True:
+        lines = list(itertools.islice(text_stream, batch_size))
+        if not lines:
+            break
+        rows = [line for line in lines if line.strip()]
+        if rows:
+            yield len(rows), header + "".join(rows)
+
+
+class _JSONTokenizer:
+    """Minimal incremental JSON tokenizer
+
+    Reads a text stream in chunks and returns JSON values or structural
+    characters on demand.
+    """
+
+    def __init__(self, text_stream):
+        self._stream = text_stream
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        data = self._stream.read(READ_SIZE)
+        if not data:
+            self._eof = True
+        self._buffer = self._buffer[self._pos :] + data
+        self._pos = 0
+
+    def _skip_whitespace(self):
+        while True:
+            while (
+                self._pos < len(self._buffer)
+                and self._buffer[self._pos] in JSON_WHITESPACE
+            ):
+                self._pos += 1
+            if self._pos < len(self._buffer) or self._eof:
+                return
+            self._fill()
+
+    def accept(self, char):
+        """Consume char if it is next in stream"""
+        self._skip_whitespace()
+        if self._buffer[self._pos : self._pos + 1] == char:
+            self._pos += 1
+            return True
+        return False
+
+    def expect(self, chars):
+        """Consume and return next char, which must be one of chars"""
+        self._skip_whitespace()
+        char = self._buffer[self._pos : self._pos + 1]
+        if not char or char not in chars:
+            raise TimeseriesDataJSONIOError("Wrong JSON file")
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Consume and return next JSON value"""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as exc:
+                if self._eof:
+                    raise TimeseriesDataJSONIOError("Wrong JSON file") from exc
+                self._fill()
+                continue
+            # A value not followed by a delimiter may be truncated (e.g. a number)
+            if self._buffer[end : end + 1] not in JSON_DELIMITERS and not self._eof:
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+    def string(self):
+        """Consume and return next JSON string"""
+        value = self.value()
+        if not isinstance(value, str):
+            raise TimeseriesDataJSONIOError("Wrong JSON file")
+        return value
+
+    def end(self):
+        """Check there is nothing left in stream"""
+        self._skip_whitespace()
+        if self._pos < len(self._buffer):
+            raise TimeseriesDataJSONIOError("Wrong JSON file")
+
+
+def iter_json_values(text_stream, check_timeseries=None):
+    """Iterate over JSON payload as (timeseries, timestamp, value) tuples
+
+    :param callable check_timeseries: Function called on each timeseries label
+        before its values are read
+    """
+    tokenizer = _JSONTokenizer(text_stream)
+    tokenizer.expect("{")
+    if not tokenizer.accept("}"):
+        while True:
+            label = tokenizer.string()
+            if check_timeseries is not None:
+                check_timeseries(label)
+            tokenizer.expect(":")
+            tokenizer.expect("{")
+            if not tokenizer.accept("}"):
+                while True:
+                    timestamp = tokenizer.string()
+                    tokenizer.expect(":")
+                    yield label, timestamp, tokenizer.value()
+                    if tokenizer.expect(",}") == "}":
+                        break
+            if tokenizer.expect(",}") == "}":
+                break
+    tokenizer.end()
+
+
+def iter_json_batches(text_stream, batch_size, check_timeseries=None):
+    """Iterate over JSON payload as (value count, JSON string) batches"""
+    batch = {}
+    count = 0
+    for label, timestamp, value in iter_json_values(text_stream, check_timeseries):
+        batch.setdefault(label, {})[timestamp] = value
+        count += 1
+        if count == batch_size:
+            yield count, json.dumps(batch)
+            batch = {}
+            count = 0
+    if count:
+        yield count, json.dumps(batch)
+
+
+def _import_batches(batches, import_func, data_state, campaign):
+    report = {"row_count": 0, "batch_count": 0, "errors": []}
+    batches = iter(batches)
+    while True:
+        # Errors while reading the stream can't be recovered from
+        # Timeseries errors raised while reading the stream are propagated
+        try:
+            count, data = next(batches)
+        except StopIteration:
+            break
+        except (TimeseriesDataJSONIOError, UnicodeDecodeError) as exc:
+            report["errors"].append(
+                {"batch": report["batch_count"], "message": str(exc)}
+            )
+            break
+        try:
+            import_func(data, data_state, campaign=campaign)
+        except (
+            TimeseriesNotFoundError,
+            TimeseriesDataIOError,
+            BEMServerAuthorizationError,
+        ) as exc:
+            db.session.rollback()
+            report["errors"].append(
+                {"batch": report["batch_count"], "message": str(exc)}
+            )
+        else:
+            db.session.commit()
+            report["row_count"] += count
+        report["batch_count"] += 1
+    return report
+
+
+def import_csv(stream, data_state, campaign=None, *, batch_size):
+    """Import CSV payload from binary stream in batches
+
+    The header is checked before any data is inserted. Header errors are raised.
+
+    Returns import report.
+    """
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    batches = iter_csv_batches(text_stream, batch_size)
+    # Check header (format, timeseries, permissions) by importing it alone
+    _, header = next(batches)
+    tsdcsvio.import_csv(header, data_state, campaign=campaign)
+    return _import_batches(batches, tsdcsvio.import_csv, data_state, campaign)
+
+
+def import_json(stream, data_state, campaign=None, *, batch_size):
+    """Import JSON payload from binary stream in batches
+
+    Each timeseries is checked when first read, before the batch containing its
+    first values is inserted. Timeseries errors are raised.
+
+    Returns import report.
+    """
+
+    def check_timeseries(label):
+        # Check timeseries (ID type, existence, permissions) by importing it alone
+        if label not in checked:
+            tsdjsonio.import_json(
+                json.dumps({label: {}}), data_state, campaign=campaign
+            )
+            checked.add(label)
+
+    checked = set()
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8")
+    batches = iter_json_batches(text_stream, batch_size, check_timeseries)
+    return _import_batches(batches, tsdjsonio.import_json, data_state, campaign)
@@ -0,0 +1,383 @@
+"""Timeseries data rollups
+
+Hourly, daily and monthly partial aggregates (sum, count, min, max) of
+timeseries data are computed by blocks and stored in the "rollups" cache store:
+
+- hourly rollups by day
+- daily rollups by month
+- monthly rollups by year
+
+Blocks are aligned on requested timezone and identified by the watermarks of
+their period, so that a write only discards the blocks of the modified periods.
+
+Hourly blocks are computed from raw data, by runs of contiguous days. Other
+blocks are computed from the blocks of the level below. A write therefore
+discards the hourly blocks of the modified days, which are recomputed from raw
+data, and the parent blocks, which are rebuilt from cached child blocks.
+
+Blocks are stored as arrays (timestamps, partials) to spare cache space.
+
+Aggregate requests are answered from the coarsest compatible rollup. The result
+is the same as the one computed from raw data by core (except for floating
+point rounding).
+"""
+
+from zoneinfo import ZoneInfo
+
+import sqlalchemy as sqla
+
+import flask
+
+import numpy as np
+import pandas as pd
+
+from bemserver_core.authorization import auth_mgr
+from bemserver_core.database import db
+from bemserver_core.input_output.timeseries_data_io import (
+    PANDAS_RE_AGGREG_FUNC_MAPPING,
+    TimeseriesDataCSVIO,
+    TimeseriesDataJSONIO,
+)
+from bemserver_core.time_utils import ceil, floor, make_date_offset, make_pandas_freq
+
+from bemserver_api.extensions.cache import cache
+
+from . import caching
+
+BLOCK_KEY = "timeseries_data:rollup:{}:{}:{}:{}:{}"
+
+# Requested bucket width unit -> rollup level
+ROLLUP_LEVELS = {
+    "hour": "hour",
+    "day": "day",
+    "week": "day",
+    "month": "month",
+    "year": "month",
+}
+# Rollup level -> block period
+BLOCK_PERIODS = {
+    "hour": "day",
+    "day": "month",
+    "month": "year",
+}
+# Rollup level -> rollup level below
+CHILD_LEVELS = {
+    "day": "hour",
+    "month": "day",
+}
+
+ROLLUP_QUERY = (
+    "SELECT date_trunc('hour', timestamp, :timezone) AS bucket,"
+    "  ts_by_data_state_id, sum(value), count(value), min(value), max(value) "
+    "FROM ts_data "
+    "WHERE ts_by_data_state_id = ANY(:tsbds_ids) "
+    "  AND timestamp >= :start_dt AND timestamp < :end_dt "
+    "GROUP BY bucket, ts_by_data_state_id "
+    "ORDER BY bucket;"
+)
+ROLLUP_COLUMNS = ("sum", "count", "min", "max")
+
+EMPTY_BLOCK = (np.empty(0, dtype="int64"), np.empty((0, len(ROLLUP_COLUMNS))))
+
+
+def is_enabled(bucket_width_unit, convert_to):
+    """Return True if aggregate can be computed from rollups"""
+    return (
+        cache.get_store("rollups") is not None
+        and flask.current_app.config["TIMESERIES_DATA_ROLLUPS"]
+        and bucket_width_unit in ROLLUP_LEVELS
+        and not convert_to
+    )
+
+
+def _to_block(partials_df):
+    """Make block from partials
+
+    Returns (UTC timestamps in ns, partials) arrays
+    """
+    return (
+        partials_df.index.as_unit("ns").asi8,
+        partials_df[list(ROLLUP_COLUMNS)].to_numpy(dtype=float),
+    )
+
+
+def _to_partials(blocks, tz_info):
+    """Make partials from a sequence of blocks"""
+    blocks = [EMPTY_BLOCK, *blocks]
+    return pd.DataFrame(
+        np.concatenate([values for _, values in blocks]),
+        columns=list(ROLLUP_COLUMNS),
+        index=pd.DatetimeIndex(
+            pd.to_datetime(np.concatenate([index for index, _ in blocks]), utc=True),
+            name="timestamp",
+        ).tz_convert(tz_info),
+    )
+
+
+def _rollup(partials_df, level):
+    """Aggregate partials to a coarser level"""
+    # Hourly partials are the finest level
+    if partials_df.empty or level == "hour":
+        return partials_df
+    if level == "day":
+        buckets = partials_df.index.normalize()
+    else:
+        buckets = partials_df.index.map(lambda x: floor(x, level))
+    groups = partials_df.groupby(buckets)
+    ret = pd.DataFrame(
+        {
+            "sum": groups["sum"].sum(min_count=1),
+            "count": groups["count"].sum(),
+            "min": groups["min"].min(),
+            "max": groups["max"].max(),
+        }
+    )
+    ret.index.name = "timestamp"
+    return ret
+
+
+def _iter_blocks(level, start_dt, end_dt):
+    """Iterate over (start, end) of level blocks intersecting [start_dt, end_dt)"""
+    period = BLOCK_PERIODS[level]
+    offset = make_date_offset(period, 1)
+    block_start = floor(start_dt, period)
+    while block_start < end_dt:
+        block_end = block_start + offset
+        yield block_start, block_end
+        block_start = block_end
+
+
+def _iter_runs(blocks):
+    """Iterate over runs of contiguous blocks
+
+    :param list blocks: Sorted (start, end) of blocks
+    """
+    run = []
+    for block in blocks:
+        if run and run[-1][1] != block[0]:
+            yield run
+            run = []
+        run.append(block)
+    if run:
+        yield run
+
+
+def _query_hourly(tsbds_ids, start_dt, end_dt, tz_info):
+    """Compute hourly partials from raw data"""
+    data = db.session.execute(
+        sqla.text(ROLLUP_QUERY),
+        {
+            "timezone": str(tz_info),
+            "tsbds_ids": list(tsbds_ids),
+            "start_dt": start_dt,
+            "end_dt": end_dt,
+        },
+    )
+    data_df = pd.DataFrame(
+        data, columns=("timestamp", "tsbds_id", *ROLLUP_COLUMNS)
+    ).set_index("timestamp")
+    data_df.index = pd.DatetimeIndex(data_df.index, tz="UTC").tz_convert(tz_info)
+    data_df = data_df.astype({col: float for col in ROLLUP_COLUMNS})
+    groups = {
+        tsbds_id: group_df[list(ROLLUP_COLUMNS)]
+        for tsbds_id, group_df in data_df.groupby("tsbds_id")
+    }
+    return {
+        tsbds_id: groups.get(tsbds_id, _to_partials([], tz_info))
+        for tsbds_id in tsbds_ids
+    }
+
+
+class _BlockStore:
+    """Get/compute/store rollup blocks of timeseries x data states"""
+
+    def __init__(self, tz_info):
+        self.store = cache.get_store("rollups")
+        self.watermarks = cache.watermarks
+        self.tz_info = tz_info
+
+    def _key(self, tsbds_id, level, block_start, block_end):
+        watermark = caching.get_period_watermark(
+            self.watermarks, tsbds_id, BLOCK_PERIODS[level], block_start, block_end
+        )
+        return BLOCK_KEY.format(
+            tsbds_id, level, self.tz_info, block_start.isoformat(), watermark
+        )
+
+    def get(self, level, requests):
+        """Return {(tsbds_id, block_start): block} for requested blocks
+
+        Missing blocks are computed and stored.
+
+        :param list requests: (tsbds_id, block_start, block_end) of the blocks
+        """
+        keys = {
+            (tsbds_id, block_start): self._key(tsbds_id, level, block_start, block_end)
+            for tsbds_id, block_start, block_end in requests
+        }
+        blocks = {k: self.store.get(key) for k, key in keys.items()}
+        missing = [req for req in requests if blocks[req[:2]] is None]
+        if missing:
+            if level == "hour":
+                computed = self._compute_hourly(missing)
+            else:
+                computed = self._compute_from_children(level, missing)
+            for k, block in computed.items():
+                self.store.set(keys[k], block)
+            blocks.update(computed)
+        return blocks
+
+    def _compute_hourly(self, requests):
+        """Compute hourly blocks from raw data, querying runs of contiguous days"""
+        blocks = {}
+        periods = sorted({(start, end) for _, start, end in requests})
+        for run in _iter_runs(periods):
+            run_starts = {start for start, _ in run}
+            tsbds_ids = sorted(
+                {tsbds_id for tsbds_id, start, _ in requests if start in run_starts}
+            )
+            hourly = _query_hourly(tsbds_ids, run[0][0], run[-1][1], self.tz_info)
+            bounds = [pd.Timestamp(block_start).value for block_start, _ in run]
+            bounds.append(pd.Timestamp(run[-1][1]).value)
+            for tsbds_id in tsbds_ids:
+                index, values = _to_block(hourly[tsbds_id])
+                cuts = np.searchsorted(index, bounds)
+                for (block_start, _), low, high in zip(
+                    run, cuts[:-1], cuts[1:], strict=True
+                ):
+                    # Copy slices not to keep the whole run in cache
+                    blocks[(tsbds_id, block_start)] = (
+                        index[low:high].copy(),
+                        values[low:high].copy(),
+                    )
+        return {req[:2]: blocks[req[:2]] for req in requests}
+
+    def _compute_from_children(self, level, requests):
+        """Compute blocks from the blocks of the level below"""
+        child_level = CHILD_LEVELS[level]
+        child_requests = {
+            (tsbds_id, block_start): [
+                (tsbds_id, child_start, child_end)
+                for child_start, child_end in _iter_blocks(
+                    child_level, block_start, block_end
+                )
+            ]
+            for tsbds_id, block_start, block_end in requests
+        }
+        children = self.get(
+            child_level, [req for reqs in child_requests.values() for req in reqs]
+        )
+        return {
+            k: _to_block(
+                _rollup(
+                    _to_partials([children[req[:2]] for req in reqs], self.tz_info),
+                    level,
+                )
+            )
+            for k, reqs in child_requests.items()
+        }
+
+
+def get_timeseries_buckets_data(
+    start_dt,
+    end_dt,
+    timeseries,
+    data_state,
+    bucket_width_value,
+    bucket_width_unit,
+    aggregation="avg",
+    *,
+    timezone="UTC",
+    col_label="id",
+):
+    """Bucket timeseries data using rollups
+
+    Same as core ``tsdio.get_timeseries_buckets_data``, without unit conversion.
+    """
+    for ts in timeseries:
+        auth_mgr.authorize("read_ts_data", ts)
+
+    fill_value = 0 if aggregation == "count" else float("nan")
+    dtype = int if aggregation == "count" else float
+
+    tz_info = ZoneInfo(timezone)
+    start_dt = start_dt.astimezone(tz_info)
+    end_dt = end_dt.astimezone(tz_info)
+    start_dt = floor(start_dt, bucket_width_unit, bucket_width_value)
+    end_dt = ceil(end_dt, bucket_width_unit, bucket_width_value)
+    pd_freq = make_pandas_freq(bucket_width_unit, bucket_width_value)
+    complete_idx = pd.date_range(
+        start_dt,
+        end_dt,
+        freq=pd_freq,
+        tz=tz_info,
+        name="timestamp",
+        inclusive="left",
+    )
+    labels = [getattr(ts, col_label) for ts in timeseries]
+
+    # Get rollup partials
+    level = ROLLUP_LEVELS[bucket_width_unit]
+    tsbds_ids = caching.get_tsbds_ids(timeseries, data_state)
+    level_blocks = list(_iter_blocks(level, start_dt, end_dt))
+    blocks = _BlockStore(tz_info).get(
+        level,
+        [
+            (tsbds_id, block_start, block_end)
+            for tsbds_id in tsbds_ids.values()
+            for block_start, block_end in level_blocks
+        ],
+    )
+
+    # Compute 1 x unit buckets, as date_trunc does in core
+    values = []
+    for ts, label in zip(timeseries, labels, strict=True):
+        if ts.id not in tsbds_ids:
+            continue
+        tsbds_id = tsbds_ids[ts.id]
+        partials_df = _to_partials(
+            [blocks[(tsbds_id, block_start)] for block_start, _ in level_blocks],
+            tz_info,
+        )
+        partials_df = partials_df[
+            (partials_df.index >= start_dt) & (partials_df.index < end_dt)
+        ]
+        if bucket_width_unit != level:
+            partials_df = _rollup(partials_df, bucket_width_unit)
+        if aggregation == "avg":
+            value = partials_df["sum"] / partials_df["count"].where(
+                partials_df["count"] != 0
+            )
+        else:
+            value = partials_df[aggregation]
+        values.append(pd.DataFrame({"value": value, "label": label}))
+
+    # Post-process as core does
+    if values:
+        data_df = (
+            pd.concat(values).pivot(values="value", columns="label").fillna(fill_value)
+        )
+    else:
+        data_df = pd.DataFrame(index=complete_idx[:0])
+    if bucket_width_value != 1:
+        func = PANDAS_RE_AGGREG_FUNC_MAPPING[aggregation]
+        data_df = data_df.resample(pd_freq, closed="left", label="left").agg(func)
+    data_df = data_df.reindex(complete_idx, fill_value=fill_value)
+    for label in set(labels) - set(data_df.columns):
+        data_df[label] = fill_value
+    data_df = data_df[labels].astype(dtype)
+    data_df.columns.name = col_label
+
+    return data_df
+
+
+class TimeseriesDataRollupsIO(TimeseriesDataCSVIO, TimeseriesDataJSONIO):
+    """Core timeseries data CSV and JSON IO bucketing data using rollups"""
+
+    @classmethod
+    def get_timeseries_buckets_data(cls, *args, convert_to=None, **kwargs):
+        # Rollups are not used with unit conversions (see is_enabled)
+        return get_timeseries_buckets_data(*args, **kwargs)
+
+
+tsdrollupsio = TimeseriesDataRollupsIO()
@@ -1,11 +1,13 @@
 """Timeseries data resources"""
 
+import functools
 from textwrap import dedent
 
 import flask
 
 from flask_smorest import abort
 
+from bemserver_core.authorization import auth_mgr, get_current_user
 from bemserver_core.database import db
 from bemserver_core.exceptions import (
     BEMServerCoreDimensionalityError,
@@ -15,11 +17,26 @@ from bemserver_core.exceptions import (
 from bemserver_core.input_output import tsdcsvio, tsdio, tsdjsonio
 from bemserver_core.model import Campaign, Timeseries, TimeseriesDataState
 
-from bemserver_api import Blueprint
-
+from bemserver_api import Blueprint, jobs
+
+from . import (
+    batch,
+    caching,
+    columnar,
+    downsampling,
+    exports,
+    ingestion,
+    rollups,
+    streaming,
+)
 from .schemas import (
+    TimeseriesDataBatchByIDSchema,
+    TimeseriesDataBatchByNameSchema,
+    TimeseriesDataBatchResultsSchema,
     TimeseriesDataDeleteByIDQueryArgsSchema,
     TimeseriesDataDeleteByNameQueryArgsSchema,
+    TimeseriesDataExportByIDSchema,
+    TimeseriesDataExportJobSchema,
     TimeseriesDataGetByIDAggregateQueryArgsSchema,
     TimeseriesDataGetByIDQueryArgsSchema,
     TimeseriesDataGetByNameAggregateQueryArgsSchema,
@@ -27,6 +44,7 @@ from .schemas import (
     TimeseriesDataGetStatsByIDBaseQueryArgsSchema,
     TimeseriesDataGetStatsByNameBaseQueryArgsSchema,
     TimeseriesDataPostQueryArgsSchema,
+    TimeseriesDataPostReportSchema,
     TimeseriesDataStatsByIDSchema,
     TimeseriesDataStatsByNameSchema,
 )
@@ -146,6 +164,9 @@ PAYLOAD_BY_NAME_CSV_EXAMPLE = dedent(
 )
 
 
+BINARY_SCHEMA = {"type": "string", "format": "binary"}
+
+
 def _get_data_state(data_state_id):
     return TimeseriesDataState.get_by_id(data_state_id) or abort(
         422, errors={"query": {"data_state": "Unknown data state ID"}}
@@ -166,6 +187,212 @@ def _get_many_timeseries_by_name(campaign, timeseries_ids):
         abort(422, message=str(exc))
 
 
+def _set_etag(blueprint, args, timeseries, tsbds_ids, mime_type):
+    """Set ETag of timeseries data read response, if cache is shared"""
+    etag_data = caching.get_etag_data(args, timeseries, tsbds_ids, mime_type)
+    if etag_data is not None:
+        blueprint.set_etag(etag_data)
+
+
+STREAM_ITERATORS = {
+    "text/csv": streaming.iter_csv,
+    columnar.ARROW_STREAM_MIME_TYPE: streaming.iter_arrow,
+}
+
+
+def _export_data(args, timeseries, data_state, mime_type, col_label):
+    kwargs = {
+        "convert_to": args.get("convert_to"),
+        "timezone": args["timezone"],
+        "col_label": col_label,
+    }
+    if mime_type in columnar.MIME_TYPES:
+        columnar.check_export_available()
+
+    # Parquet can't be streamed
+    if args["stream"] and mime_type != columnar.PARQUET_MIME_TYPE:
+        streaming.check_timeseries_data(
+            args["start_time"],
+            timeseries,
+            data_state,
+            convert_to=kwargs["convert_to"],
+            col_label=col_label,
+        )
+        iter_chunks = STREAM_ITERATORS.get(mime_type, streaming.iter_json)
+        chunks = iter_chunks(
+            args["start_time"],
+            args["end_time"],
+            timeseries,
+            data_state,
+            chunk_size=flask.current_app.config["TIMESERIES_DATA_STREAM_CHUNK_SIZE"],
+            **kwargs,
+        )
+        return streaming.stream_response(chunks, mime_type)
+
+    resp = _get_data_payload(args, timeseries, data_state, mime_type, col_label)
+    return flask.Response(resp, mimetype=mime_type)
+
+
+def _get_data_payload(args, timeseries, data_state, mime_type, col_label):
+    kwargs = {
+        "convert_to": args.get("convert_to"),
+        "timezone": args["timezone"],
+        "col_label": col_label,
+    }
+    if "max_points" in args:
+        csv_io = json_io = data_io = downsampling.make_io(
+            args["max_points"], args["downsample"]
+        )
+    else:
+        csv_io, json_io, data_io = tsdcsvio, tsdjsonio, tsdio
+    if mime_type == "text/csv":
+        return csv_io.export_csv(
+            args["start_time"], args["end_time"], timeseries, data_state, **kwargs
+        )
+    if mime_type in columnar.MIME_TYPES:
+        data_df = data_io.get_timeseries_data(
+            args["start_time"], args["end_time"], timeseries, data_state, **kwargs
+        )
+        return columnar.export_df(data_df, mime_type)
+    return json_io.export_json(
+        args["start_time"], args["end_time"], timeseries, data_state, **kwargs
+    )
+
+
+def _get_aggregate_payload(
+    args, timeseries, data_state, tsbds_ids, mime_type, col_label
+):
+    bucket_args = (
+        args["start_time"],
+        args["end_time"],
+        timeseries,
+        data_state,
+        args["bucket_width_value"],
+        args["bucket_width_unit"],
+        args["aggregation"],
+    )
+    kwargs = {
+        "convert_to": args.get("convert_to"),
+        "timezone": args["timezone"],
+        "col_label": col_label,
+    }
+    if mime_type in columnar.MIME_TYPES:
+        columnar.check_export_available()
+    cache_key = caching.aggregate_key(args, timeseries, tsbds_ids, mime_type)
+    resp = caching.get_response(cache_key)
+    if resp is None:
+        if rollups.is_enabled(args["bucket_width_unit"], args.get("convert_to")):
+            csv_io = json_io = data_io = rollups.tsdrollupsio
+        else:
+            csv_io, json_io, data_io = tsdcsvio, tsdjsonio, tsdio
+        if mime_type == "text/csv":
+            resp = csv_io.export_csv_bucket(*bucket_args, **kwargs)
+        elif mime_type in columnar.MIME_TYPES:
+            data_df = data_io.get_timeseries_buckets_data(*bucket_args, **kwargs)
+            resp = columnar.export_df(data_df, mime_type)
+        else:
+            resp = json_io.export_json_bucket(*bucket_args, **kwargs)
+        caching.set_response(cache_key, resp)
+    return resp
+
+
+def _export_aggregate_data(
+    args, timeseries, data_state, tsbds_ids, mime_type, col_label
+):
+    resp = _get_aggregate_payload(
+        args, timeseries, data_state, tsbds_ids, mime_type, col_label
+    )
+    return flask.Response(resp, mimetype=mime_type)
+
+
+def _get_stats(args, timeseries, data_state, col_label):
+    data_df = tsdio.get_timeseries_stats(
+        timeseries,
+        data_state,
+        timezone=args["timezone"],
+        col_label=col_label,
+    )
+    return {
+        "stats": data_df.astype(object)
+        .where(data_df.notnull(), None)
+        .to_dict(orient="index")
+    }
+
+
+def _run_batch_query(query, lookup, col_label, stats_schema):
+    timeseries = lookup.get_timeseries(query["timeseries"])
+    data_state = lookup.get_data_state(query["data_state"])
+    if query["type"] == "stats":
+        return stats_schema.dumps(_get_stats(query, timeseries, data_state, col_label))
+    if query["type"] == "aggregate":
+        tsbds_ids = caching.get_readable_tsbds_ids(timeseries, data_state)
+        return _get_aggregate_payload(
+            query, timeseries, data_state, tsbds_ids, "application/json", col_label
+        )
+    return _get_data_payload(
+        query, timeseries, data_state, "application/json", col_label
+    )
+
+
+def _run_batch(queries, lookup, col_label, stats_schema):
+    resp = batch.run_queries(
+        queries,
+        functools.partial(
+            _run_batch_query,
+            lookup=lookup,
+            col_label=col_label,
+            stats_schema=stats_schema,
+        ),
+        max_workers=flask.current_app.config["TIMESERIES_DATA_BATCH_MAX_WORKERS"],
+    )
+    return flask.Response(resp, mimetype="application/json")
+
+
+def _import_data_stream(mime_type, data_state, campaign=None):
+    if mime_type == "text/csv":
+        import_func = ingestion.import_csv
+    else:
+        import_func = ingestion.import_json
+    try:
+        report = import_func(
+            flask.request.stream,
+            data_state,
+            campaign=campaign,
+            batch_size=flask.current_app.config["TIMESERIES_DATA_IMPORT_BATCH_SIZE"],
+        )
+    except (
+        TimeseriesNotFoundError,
+        TimeseriesDataIOError,
+        UnicodeDecodeError,
+    ) as exc:
+        abort(422, message=str(exc))
+    return TimeseriesDataPostReportSchema().dump(report), 200
+
+
+def _import_data(mime_type, data_state, campaign=None):
+    if mime_type in columnar.MIME_TYPES:
+        columnar.check_import_available()
+        # Binary payload is read as is, without decoding
+        data = flask.request.get_data(cache=False)
+    else:
+        try:
+            data = flask.request.get_data(cache=True).decode("utf-8")
+        except UnicodeDecodeError as exc:
+            abort(422, message=str(exc))
+
+    try:
+        if mime_type == "text/csv":
+            tsdcsvio.import_csv(data, data_state, campaign=campaign)
+        elif mime_type in columnar.MIME_TYPES:
+            tsdio.set_timeseries_data(
+                columnar.read_df(data, mime_type), data_state, campaign=campaign
+            )
+        else:
+            tsdjsonio.import_json(data, data_state, campaign=campaign)
+    except (TimeseriesNotFoundError, TimeseriesDataIOError) as exc:
+        abort(422, message=str(exc))
+
+
 blp = Blueprint(
     "TimeseriesData",
     __name__,
@@ -184,36 +411,33 @@ blp4c = Blueprint(
 
 @blp.route("/stats", methods=("GET",))
 @blp.login_required
+@blp.etag
 @blp.arguments(TimeseriesDataGetStatsByIDBaseQueryArgsSchema, location="query")
 @blp.response(200, TimeseriesDataStatsByIDSchema, example=STATS_BY_ID_EXAMPLE)
 def get_stats(args):
     """Get timeseries data stats"""
     timeseries = _get_many_timeseries_by_id(args["timeseries"])
     data_state = _get_data_state(args["data_state"])
+    tsbds_ids = caching.get_readable_tsbds_ids(timeseries, data_state)
+    _set_etag(blp, args, timeseries, tsbds_ids, "application/json")
 
-    data_df = tsdio.get_timeseries_stats(
-        timeseries,
-        data_state,
-        timezone=args["timezone"],
-        col_label="id",
-    )
-
-    return {
-        "stats": data_df.astype(object)
-        .where(data_df.notnull(), None)
-        .to_dict(orient="index")
-    }
+    return _get_stats(args, timeseries, data_state, "id")
 
 
 @blp.route("/", methods=("GET",))
 @blp.login_required
+@blp.etag
 @blp.arguments(TimeseriesDataGetByIDQueryArgsSchema, location="query")
 @blp.response(200, content_type="application/json", example=PAYLOAD_BY_ID_JSON_EXAMPLE)
 @blp.alt_response(200, content_type="text/csv", example=PAYLOAD_BY_ID_CSV_EXAMPLE)
+@blp.alt_response(
+    200, schema=BINARY_SCHEMA, content_type=columnar.ARROW_STREAM_MIME_TYPE
+)
+@blp.alt_response(200, schema=BINARY_SCHEMA, content_type=columnar.PARQUET_MIME_TYPE)
 def get(args):
     """Get timeseries data
 
-    Returns data in either JSON or CSV format.
+    Returns data in JSON, CSV, Arrow IPC stream or Parquet format.
 
     JSON: Each key is a timeseries ID as string. For each timeseries, values are
     passed as {timestamp: value} mappings.
@@ -221,49 +445,44 @@ def get(args):
     CSV: The first column is the timestamp and each other column is a timeseries data.
     Column headers are timeseries IDs.
 
-    In both cases, timestamps are timezone aware datetimes.
+    Arrow/Parquet: The "Datetime" column is the timestamp and each other column is
+    a timeseries data. Column names are timeseries IDs.
+
+    In all cases, timestamps are timezone aware datetimes.
+
+    If stream is true, data is read and sent in time-window chunks. Parquet responses
+    are not streamed.
+
+    If max_points is passed, each timeseries is downsampled to at most max_points
+    values, preserving the shape of the curve. Downsampled data can't be streamed.
     """
     mime_type = flask.request.headers.get("Accept", "application/json")
 
     timeseries = _get_many_timeseries_by_id(args["timeseries"])
     data_state = _get_data_state(args["data_state"])
+    tsbds_ids = caching.get_readable_tsbds_ids(timeseries, data_state)
+    _set_etag(blp, args, timeseries, tsbds_ids, mime_type)
 
     try:
-        if mime_type == "text/csv":
-            resp = tsdcsvio.export_csv(
-                args["start_time"],
-                args["end_time"],
-                timeseries,
-                data_state,
-                convert_to=args.get("convert_to"),
-                timezone=args["timezone"],
-                col_label="id",
-            )
-        else:
-            resp = tsdjsonio.export_json(
-                args["start_time"],
-                args["end_time"],
-                timeseries,
-                data_state,
-                convert_to=args.get("convert_to"),
-                timezone=args["timezone"],
-                col_label="id",
-            )
+        return _export_data(args, timeseries, data_state, mime_type, "id")
     except BEMServerCoreDimensionalityError as exc:
         abort(422, message=str(exc))
 
-    return flask.Response(resp, mimetype=mime_type)
-
 
 @blp.route("/aggregate", methods=("GET",))
 @blp.login_required
+@blp.etag
 @blp.arguments(TimeseriesDataGetByIDAggregateQueryArgsSchema, location="query")
 @blp.response(200, content_type="application/json", example=PAYLOAD_BY_ID_JSON_EXAMPLE)
 @blp.alt_response(200, content_type="text/csv", example=PAYLOAD_BY_ID_CSV_EXAMPLE)
+@blp.alt_response(
+    200, schema=BINARY_SCHEMA, content_type=columnar.ARROW_STREAM_MIME_TYPE
+)
+@blp.alt_response(200, schema=BINARY_SCHEMA, content_type=columnar.PARQUET_MIME_TYPE)
 def get_aggregate(args):
     """Get aggregated timeseries data
 
-    Returns data in either JSON or CSV format.
+    Returns data in JSON, CSV, Arrow IPC stream or Parquet format.
 
     JSON: Each key is a timeseries ID as string. For each timeseries, values are
     passed as {timestamp: value} mappings.
@@ -271,41 +490,41 @@ def get_aggregate(args):
     CSV: The first column is the timestamp and each other column is a timeseries data.
     Column headers are timeseries IDs.
 
-    In both cases, timestamps are timezone aware datetimes.
+    Arrow/Parquet: The "Datetime" column is the timestamp and each other column is
+    a timeseries data. Column names are timeseries IDs.
+
+    In all cases, timestamps are timezone aware datetimes.
     """
     mime_type = flask.request.headers.get("Accept", "application/json")
 
     timeseries = _get_many_timeseries_by_id(args["timeseries"])
     data_state = _get_data_state(args["data_state"])
+    tsbds_ids = caching.get_readable_tsbds_ids(timeseries, data_state)
+    _set_etag(blp, args, timeseries, tsbds_ids, mime_type)
 
-    if mime_type == "text/csv":
-        resp = tsdcsvio.export_csv_bucket(
-            args["start_time"],
-            args["end_time"],
-            timeseries,
-            data_state,
-            args["bucket_width_value"],
-            args["bucket_width_unit"],
-            args["aggregation"],
-            convert_to=args.get("convert_to"),
-            timezone=args["timezone"],
-            col_label="id",
-        )
-    else:
-        resp = tsdjsonio.export_json_bucket(
-            args["start_time"],
-            args["end_time"],
-            timeseries,
-            data_state,
-            args["bucket_width_value"],
-            args["bucket_width_unit"],
-            args["aggregation"],
-            convert_to=args.get("convert_to"),
-            timezone=args["timezone"],
-            col_label="id",
-        )
+    return _export_aggregate_data(
+        args, timeseries, data_state, tsbds_ids, mime_type, "id"
+    )
 
-    return flask.Response(resp, mimetype=mime_type)
+
+@blp.route("/batch", methods=("POST",))
+@blp.login_required
+@blp.arguments(TimeseriesDataBatchByIDSchema)
+@blp.response(200, TimeseriesDataBatchResultsSchema)
+def post_batch(args):
+    """Run a batch of timeseries data queries
+
+    Each query is a raw data, aggregate or stats query with the same parameters as
+    the corresponding GET resource, plus a "type" field ("raw", "aggregate" or
+    "stats"). Timeseries are identified by ID.
+
+    Results are returned in the order of the queries. Each result has the HTTP
+    status of the query and either the data, as returned by the GET resource in
+    JSON format, or an error message.
+    """
+    queries = args["queries"]
+    lookup = batch.get_lookup_by_id(queries)
+    return _run_batch(queries, lookup, "id", TimeseriesDataStatsByIDSchema())
 
 
 @blp.route("/", methods=("POST",))
@@ -328,14 +547,21 @@ def get_aggregate(args):
                     "example": PAYLOAD_BY_ID_CSV_EXAMPLE,
                 }
             },
+            columnar.ARROW_STREAM_MIME_TYPE: {"schema": BINARY_SCHEMA},
+            columnar.PARQUET_MIME_TYPE: {"schema": BINARY_SCHEMA},
         }
     }
 )
 @blp.response(201)
+@blp.alt_response(
+    200,
+    schema=TimeseriesDataPostReportSchema,
+    description="Streamed request import report",
+)
 def post(args):
     """Post timeseries data
 
-    Loads data in either JSON or CSV format.
+    Loads data in JSON, CSV, Arrow IPC stream or Parquet format.
 
     JSON: Each key is a timeseries ID as string. For each timeseries, values are
     passed as {timestamp: value} mappings.
@@ -343,24 +569,24 @@ def post(args):
     CSV: The first column is the timestamp and each other column is a timeseries data.
     Column headers are timeseries IDs.
 
-    In both cases, timestamps are timezone aware datetimes.
+    Arrow/Parquet: The "Datetime" column is the timestamp and each other column is a
+    timeseries data. Column names are timeseries IDs.
+
+    In all cases, timestamps are timezone aware datetimes.
+
+    If stream is true, CSV and JSON data is read and inserted in batches, each batch
+    being committed on its own. Errors in a batch do not prevent other batches from
+    being inserted. An import report is returned with status code 200.
     """
     mime_type = flask.request.headers.get("content-type", "application/json")
 
     data_state = _get_data_state(args["data_state"])
 
-    try:
-        data = flask.request.get_data(cache=True).decode("utf-8")
-    except UnicodeDecodeError as exc:
-        abort(422, message=str(exc))
+    if args["stream"] and mime_type not in columnar.MIME_TYPES:
+        # Batches are committed during import
+        return _import_data_stream(mime_type, data_state)
 
-    try:
-        if mime_type == "text/csv":
-            tsdcsvio.import_csv(data, data_state)
-        else:
-            tsdjsonio.import_json(data, data_state)
-    except (TimeseriesNotFoundError, TimeseriesDataIOError) as exc:
-        abort(422, message=str(exc))
+    _import_data(mime_type, data_state)
 
     db.session.commit()
 
@@ -380,12 +606,114 @@ def delete(args):
         timeseries,
         data_state,
     )
+    caching.record_delete(args["start_time"], args["end_time"], timeseries, data_state)
 
     db.session.commit()
 
 
+def _get_export_dir():
+    export_dir = flask.current_app.config["TIMESERIES_DATA_EXPORT_DIR"]
+    if not export_dir:
+        abort(501, message="Timeseries data exports are disabled")
+    return export_dir
+
+
+def _get_export_job(job_id):
+    export_dir = _get_export_dir()
+    job = jobs.get_job(export_dir, job_id) or abort(404)
+    user = get_current_user()
+    if job["user_id"] != user.id and not user.is_admin:
+        abort(403)
+    return export_dir, job
+
+
+@blp.route("/exports/", methods=("POST",))
+@blp.login_required
+@blp.arguments(TimeseriesDataExportByIDSchema)
+@blp.response(202, TimeseriesDataExportJobSchema)
+def post_export(args):
+    """Start a timeseries data export job
+
+    Data is exported in background to a gzipped CSV or Parquet file. Use the job
+    resource to get the job status and the file resource to download the file
+    once the job is done. Jobs are deleted some time after they are done.
+
+    Recommended for very large exports.
+    """
+    export_dir = _get_export_dir()
+    timeseries = _get_many_timeseries_by_id(args["timeseries"])
+    data_state = _get_data_state(args["data_state"])
+    # Check permissions now rather than in background
+    for ts in timeseries:
+        auth_mgr.authorize("read_ts_data", ts)
+    if args["format"] == "parquet":
+        columnar.check_export_available()
+
+    retention = flask.current_app.config["TIMESERIES_DATA_EXPORT_RETENTION"]
+    if retention is not None:
+        jobs.delete_expired_jobs(export_dir, retention)
+    user = get_current_user()
+    job = jobs.create_job(export_dir, user.id, format=args["format"])
+    exports.export_task.delay(
+        export_dir,
+        job["id"],
+        user.id,
+        [ts.id for ts in timeseries],
+        data_state.id,
+        args["start_time"],
+        args["end_time"],
+        chunk_size=flask.current_app.config["TIMESERIES_DATA_STREAM_CHUNK_SIZE"],
+        compression=flask.current_app.config["TIMESERIES_DATA_COLUMNAR_COMPRESSION"],
+        convert_to=list(args.get("convert_to", {}).items()),
+        timezone=args["timezone"],
+    )
+    return job
+
+
+@blp.route("/exports/<string:job_id>", methods=("GET",))
+@blp.login_required
+@blp.response(200, TimeseriesDataExportJobSchema)
+def get_export(job_id):
+    """Get timeseries data export job"""
+    _, job = _get_export_job(job_id)
+    return job
+
+
+@blp.route("/exports/<string:job_id>/file", methods=("GET",))
+@blp.login_required
+@blp.response(200, schema=BINARY_SCHEMA, content_type="application/gzip")
+@blp.alt_response(200, schema=BINARY_SCHEMA, content_type=columnar.PARQUET_MIME_TYPE)
+@blp.alt_response(206, description="Partial content (Range request)")
+def get_export_file(job_id):
+    """Download timeseries data export file
+
+    Range requests are supported, so that an interrupted download can be resumed.
+    """
+    export_dir, job = _get_export_job(job_id)
+    if job["status"] != "done":
+        abort(409, message="Export job is not done")
+    export_format = exports.EXPORT_FORMATS[job["format"]]
+    return flask.send_file(
+        exports.get_job_file_path(export_dir, job),
+        mimetype=export_format["mime_type"],
+        as_attachment=True,
+        download_name=f"timeseries_data_{job_id}_{export_format['file_name']}",
+        conditional=True,
+    )
+
+
+@blp.route("/exports/<string:job_id>", methods=("DELETE",))
+@blp.login_required
+@blp.response(204)
+def delete_export(job_id):
+    """Delete timeseries data export job and its file"""
+    export_dir, _ = _get_export_job(job_id)
+    jobs.delete_job(export_dir, job_id)
+
+
 @blp4c.route("/stats", methods=("GET",))
 @blp4c.login_required
+@blp4c.etag
 @blp4c.arguments(TimeseriesDataGetStatsByNameBaseQueryArgsSchema, location="query")
 @blp4c.response(200, TimeseriesDataStatsByNameSchema, example=STATS_BY_NAME_EXAMPLE)
 def get_stats_for_campaign(args, campaign_id):
@@ -393,32 +721,28 @@ def get_stats_for_campaign(args, campaign_id):
     campaign = Campaign.get_by_id(campaign_id) or abort(404)
     timeseries = _get_many_timeseries_by_name(campaign, args["timeseries"])
     data_state = _get_data_state(args["data_state"])
+    tsbds_ids = caching.get_readable_tsbds_ids(timeseries, data_state)
+    _set_etag(blp4c, args, timeseries, tsbds_ids, "application/json")
 
-    data_df = tsdio.get_timeseries_stats(
-        timeseries,
-        data_state,
-        timezone=args["timezone"],
-        col_label="name",
-    )
-
-    return {
-        "stats": data_df.astype(object)
-        .where(data_df.notnull(), None)
-        .to_dict(orient="index")
-    }
+    return _get_stats(args, timeseries, data_state, "name")
 
 
 @blp4c.route("/", methods=("GET",))
 @blp4c.login_required
+@blp4c.etag
 @blp4c.arguments(TimeseriesDataGetByNameQueryArgsSchema, location="query")
 @blp4c.response(
     200, content_type="application/json", example=PAYLOAD_BY_NAME_JSON_EXAMPLE
 )
 @blp4c.alt_response(200, content_type="text/csv", example=PAYLOAD_BY_NAME_CSV_EXAMPLE)
+@blp4c.alt_response(
+    200, schema=BINARY_SCHEMA, content_type=columnar.ARROW_STREAM_MIME_TYPE
+)
+@blp4c.alt_response(200, schema=BINARY_SCHEMA, content_type=columnar.PARQUET_MIME_TYPE)
 def get_for_campaign(args, campaign_id):
     """Get timeseries data for a given campaign
 
-    Returns data in either JSON or CSV format.
+    Returns data in JSON, CSV, Arrow IPC stream or Parquet format.
 
     JSON: Each key is a timeseries name as string. For each timeseries, values are
     passed as {timestamp: value} mappings.
@@ -426,52 +750,47 @@ def get_for_campaign(args, campaign_id):
     CSV: The first column is the timestamp and each other column is a timeseries data.
     Column headers are timeseries names.
 
-    In both cases, timestamps are timezone aware datetimes.
+    Arrow/Parquet: The "Datetime" column is the timestamp and each other column is
+    a timeseries data. Column names are timeseries names.
+
+    In all cases, timestamps are timezone aware datetimes.
+
+    If stream is true, data is read and sent in time-window chunks. Parquet responses
+    are not streamed.
+
+    If max_points is passed, each timeseries is downsampled to at most max_points
+    values, preserving the shape of the curve. Downsampled data can't be streamed.
     """
     mime_type = flask.request.headers.get("Accept", "application/json")
 
     campaign = Campaign.get_by_id(campaign_id) or abort(404)
     timeseries = _get_many_timeseries_by_name(campaign, args["timeseries"])
     data_state = _get_data_state(args["data_state"])
+    tsbds_ids = caching.get_readable_tsbds_ids(timeseries, data_state)
+    _set_etag(blp4c, args, timeseries, tsbds_ids, mime_type)
 
     try:
-        if mime_type == "text/csv":
-            resp = tsdcsvio.export_csv(
-                args["start_time"],
-                args["end_time"],
-                timeseries,
-                data_state,
-                convert_to=args.get("convert_to"),
-                timezone=args["timezone"],
-                col_label="name",
-            )
-        else:
-            resp = tsdjsonio.export_json(
-                args["start_time"],
-                args["end_time"],
-                timeseries,
-                data_state,
-                convert_to=args.get("convert_to"),
-                timezone=args["timezone"],
-                col_label="name",
-            )
+        return _export_data(args, timeseries, data_state, mime_type, "name")
     except BEMServerCoreDimensionalityError as exc:
         abort(422, message=str(exc))
 
-    return flask.Response(resp, mimetype=mime_type)
-
 
 @blp4c.route("/aggregate", methods=("GET",))
 @blp4c.login_required
+@blp4c.etag
 @blp4c.arguments(TimeseriesDataGetByNameAggregateQueryArgsSchema, location="query")
 @blp4c.response(
     200, content_type="application/json", example=PAYLOAD_BY_NAME_JSON_EXAMPLE
 )
 @blp4c.alt_response(200, content_type="text/csv", example=PAYLOAD_BY_NAME_CSV_EXAMPLE)
+@blp4c.alt_response(
+    200, schema=BINARY_SCHEMA, content_type=columnar.ARROW_STREAM_MIME_TYPE
+)
+@blp4c.alt_response(200, schema=BINARY_SCHEMA, content_type=columnar.PARQUET_MIME_TYPE)
 def get_aggregate_for_campaign(args, campaign_id):
     """Get aggregated timeseries data for a given campaign
 
-    Returns data in either JSON or CSV format.
+    Returns data in JSON, CSV, Arrow IPC stream or Parquet format.
 
     JSON: Each key is a timeseries name as string. For each timeseries, values are
     passed as {timestamp: value} mappings.
@@ -479,42 +798,43 @@ def get_aggregate_for_campaign(args, campaign_id):
     CSV: The first column is the timestamp and each other column is a timeseries data.
     Column headers are timeseries names.
 
-    In both cases, timestamps are timezone aware datetimes.
+    Arrow/Parquet: The "Datetime" column is the timestamp and each other column is
+    a timeseries data. Column names are timeseries names.
+
+    In all cases, timestamps are timezone aware datetimes.
     """
     mime_type = flask.request.headers.get("Accept", "application/json")
 
     campaign = Campaign.get_by_id(campaign_id) or abort(404)
     timeseries = _get_many_timeseries_by_name(campaign, args["timeseries"])
     data_state = _get_data_state(args["data_state"])
+    tsbds_ids = caching.get_readable_tsbds_ids(timeseries, data_state)
+    _set_etag(blp4c, args, timeseries, tsbds_ids, mime_type)
 
-    if mime_type == "text/csv":
-        resp = tsdcsvio.export_csv_bucket(
-            args["start_time"],
-            args["end_time"],
-            timeseries,
-            data_state,
-            args["bucket_width_value"],
-            args["bucket_width_unit"],
-            args["aggregation"],
-            convert_to=args.get("convert_to"),
-            timezone=args["timezone"],
-            col_label="name",
-        )
-    else:
-        resp = tsdjsonio.export_json_bucket(
-            args["start_time"],
-            args["end_time"],
-            timeseries,
-            data_state,
-            args["bucket_width_value"],
-            args["bucket_width_unit"],
-            args["aggregation"],
-            convert_to=args.get("convert_to"),
-            timezone=args["timezone"],
-            col_label="name",
-        )
+    return _export_aggregate_data(
+        args, timeseries, data_state, tsbds_ids, mime_type, "name"
+    )
 
-    return flask.Response(resp, mimetype=mime_type)
+
+@blp4c.route("/batch", methods=("POST",))
+@blp4c.login_required
+@blp4c.arguments(TimeseriesDataBatchByNameSchema)
+@blp4c.response(200, TimeseriesDataBatchResultsSchema)
+def post_batch_for_campaign(args, campaign_id):
+    """Run a batch of timeseries data queries for a given campaign
+
+    Each query is a raw data, aggregate or stats query with the same parameters as
+    the corresponding GET resource, plus a "type" field ("raw", "aggregate" or
+    "stats"). Timeseries are identified by name.
+
+    Results are returned in the order of the queries. Each result has the HTTP
+    status of the query and either the data, as returned by the GET resource in
+    JSON format, or an error message.
+    """
+    campaign = Campaign.get_by_id(campaign_id) or abort(404)
+    queries = args["queries"]
+    lookup = batch.get_lookup_by_name(campaign, queries)
+    return _run_batch(queries, lookup, "name", TimeseriesDataStatsByNameSchema())
 
 
 @blp4c.route("/", methods=("POST",))
@@ -537,14 +857,21 @@ def get_aggregate_for_campaign(args, campaign_id):
                     "example": PAYLOAD_BY_NAME_CSV_EXAMPLE,
                 }
             },
+            columnar.ARROW_STREAM_MIME_TYPE: {"schema": BINARY_SCHEMA},
+            columnar.PARQUET_MIME_TYPE: {"schema": BINARY_SCHEMA},
         }
     }
 )
 @blp4c.response(201)
+@blp4c.alt_response(
+    200,
+    schema=TimeseriesDataPostReportSchema,
+    description="Streamed request import report",
+)
 def post_for_campaign(args, campaign_id):
     """Post timeseries data for a given campaign
 
-    Loads data in either JSON or CSV format.
+    Loads data in JSON, CSV, Arrow IPC stream or Parquet format.
 
     JSON: Each key is a timeseries name as string. For each timeseries, values are
     passed as {timestamp: value} mappings.
@@ -552,25 +879,25 @@ def post_for_campaign(args, campaign_id):
     CSV: The first column is the timestamp and each other column is a timeseries data.
     Column headers are timeseries names.
 
-    In both cases, timestamps are timezone aware datetimes.
+    Arrow/Parquet: The "Datetime" column is the timestamp and each other column is a
+    timeseries data. Column names are timeseries names.
+
+    In all cases, timestamps are timezone aware datetimes.
+
+    If stream is true, CSV and JSON data is read and inserted in batches, each batch
+    being committed on its own. Errors in a batch do not prevent other batches from
+    being inserted. An import report is returned with status code 200.
     """
     mime_type = flask.request.headers.get("content-type", "application/json")
 
     campaign = Campaign.get_by_id(campaign_id) or abort(404)
     data_state = _get_data_state(args["data_state"])
 
-    try:
-        data = flask.request.get_data(cache=True).decode("utf-8")
-    except UnicodeDecodeError as exc:
-        abort(422, message=str(exc))
+    if args["stream"] and mime_type not in columnar.MIME_TYPES:
+        # Batches are committed during import
+        return _import_data_stream(mime_type, data_state, campaign=campaign)
 
-    try:
-        if mime_type == "text/csv":
-            tsdcsvio.import_csv(data, data_state, campaign=campaign)
-        else:
-            tsdjsonio.import_json(data, data_state, campaign=campaign)
-    except (TimeseriesNotFoundError, TimeseriesDataIOError) as exc:
-        abort(422, message=str(exc))
+    _import_data(mime_type, data_state, campaign=campaign)
 
     db.session.commit()
 
@@ -591,5 +918,6 @@ def delete_for_campaign(args, campaign_id):
         timeseries,
         data_state,
     )
+    caching.record_delete(args["start_time"], args["end_time"], timeseries, data_state)
 
     db.session.commit()
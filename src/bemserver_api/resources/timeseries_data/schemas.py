@@ -8,6 +8,9 @@ from bemserver_core.time_utils import FIXED_SIZE_PERIODS, PERIODS
 from bemserver_api import Schema
 from bemserver_api.extensions import ma_fields
 
+from .downsampling import DOWNSAMPLING_METHODS
+from .exports import EXPORT_FORMATS
+
 
 class TimeseriesIDListMixinSchema(Schema):
     timeseries = ma.fields.List(
@@ -190,14 +193,62 @@ class TimeseriesDataGetBaseQueryArgsSchema(TimeseriesDataBaseQueryArgsSchema):
         return data
 
 
+class TimeseriesDataStreamMixinSchema(Schema):
+    stream = ma.fields.Boolean(
+        load_default=False,
+        metadata={
+            "description": (
+                "Stream response. Data is read and sent in time-window chunks. "
+                "Recommended for large exports."
+            ),
+        },
+    )
+
+
+class TimeseriesDataDownsampleMixinSchema(Schema):
+    max_points = ma.fields.Int(
+        validate=ma.validate.Range(min=3),
+        metadata={
+            "description": (
+                "Maximum number of values per timeseries. If passed, data is "
+                "downsampled preserving its shape."
+            ),
+        },
+    )
+    downsample = ma.fields.String(
+        load_default="lttb",
+        validate=ma.validate.OneOf(DOWNSAMPLING_METHODS),
+        metadata={
+            "description": (
+                "Downsampling method. "
+                "lttb: Largest-Triangle-Three-Buckets. "
+                "minmax: min and max values in max_points / 2 intervals."
+            ),
+        },
+    )
+
+    @ma.validates_schema
+    def validate_max_points(self, data, **kwargs):
+        if data.get("stream") and "max_points" in data:
+            raise ma.ValidationError(
+                "Downsampled data can't be streamed.", field_name="max_points"
+            )
+
+
 class TimeseriesDataGetByIDQueryArgsSchema(
-    TimeseriesDataGetBaseQueryArgsSchema, TimeseriesIDListMixinSchema
+    TimeseriesDataStreamMixinSchema,
+    TimeseriesDataDownsampleMixinSchema,
+    TimeseriesDataGetBaseQueryArgsSchema,
+    TimeseriesIDListMixinSchema,
 ):
     """Timeseries values GET by ID query parameters schema"""
 
 
 class TimeseriesDataGetByNameQueryArgsSchema(
-    TimeseriesDataGetBaseQueryArgsSchema, TimeseriesNameListMixinSchema
+    TimeseriesDataStreamMixinSchema,
+    TimeseriesDataDownsampleMixinSchema,
+    TimeseriesDataGetBaseQueryArgsSchema,
+    TimeseriesNameListMixinSchema,
 ):
     """Timeseries values GET by name query parameters schema"""
 
@@ -269,3 +320,215 @@ class TimeseriesDataPostQueryArgsSchema(Schema):
             "description": "Data state ID",
         },
     )
+    stream = ma.fields.Boolean(
+        load_default=False,
+        metadata={
+            "description": (
+                "Stream request. CSV or JSON data is read and inserted in batches. "
+                "Recommended for large imports."
+            ),
+        },
+    )
+
+
+class TimeseriesDataPostBatchErrorSchema(Schema):
+    batch = ma.fields.Integer(
+        metadata={
+            "description": "Batch index",
+        },
+    )
+    message = ma.fields.String(
+        metadata={
+            "description": "Error message",
+        },
+    )
+
+
+class TimeseriesDataPostReportSchema(Schema):
+    """Timeseries values streamed POST report schema"""
+
+    row_count = ma.fields.Integer(
+        metadata={
+            "description": "Number of CSV rows or JSON values inserted",
+        },
+    )
+    batch_count = ma.fields.Integer(
+        metadata={
+            "description": "Number of batches read",
+        },
+    )
+    errors = ma.fields.List(
+        ma.fields.Nested(TimeseriesDataPostBatchErrorSchema),
+        metadata={
+            "description": "Errors of batches that could not be inserted",
+        },
+    )
+
+
+class TimeseriesDataGetDataByIDQueryArgsSchema(
+    TimeseriesDataDownsampleMixinSchema,
+    TimeseriesDataGetBaseQueryArgsSchema,
+    TimeseriesIDListMixinSchema,
+):
+    """Timeseries values by ID batch query schema"""
+
+
+class TimeseriesDataGetDataByNameQueryArgsSchema(
+    TimeseriesDataDownsampleMixinSchema,
+    TimeseriesDataGetBaseQueryArgsSchema,
+    TimeseriesNameListMixinSchema,
+):
+    """Timeseries values by name batch query schema"""
+
+
+class BatchQuery(ma.fields.Dict):
+    """Batch query field
+
+    The query is loaded with the schema matching its type.
+
+    :param dict schemas: Mapping of query type -> query schema
+    """
+
+    def __init__(self, schemas, **kwargs):
+        super().__init__(**kwargs)
+        self.schemas = schemas
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        value = dict(super()._deserialize(value, attr, data, **kwargs))
+        query_type = value.pop("type", None)
+        if query_type not in self.schemas:
+            raise ma.ValidationError(
+                {"type": [f"Must be one of: {', '.join(self.schemas)}."]}
+            )
+        return {"type": query_type, **self.schemas[query_type]().load(value)}
+
+
+BATCH_MAX_QUERIES = 100
+BATCH_QUERIES_DESCRIPTION = (
+    'List of queries. Each query has a "type" ("raw", "aggregate" or "stats") '
+    "and the parameters of the corresponding GET resource."
+)
+
+
+class TimeseriesDataBatchByIDSchema(Schema):
+    """Timeseries data batch by ID schema"""
+
+    queries = ma.fields.List(
+        BatchQuery(
+            {
+                "raw": TimeseriesDataGetDataByIDQueryArgsSchema,
+                "aggregate": TimeseriesDataGetByIDAggregateQueryArgsSchema,
+                "stats": TimeseriesDataGetStatsByIDBaseQueryArgsSchema,
+            }
+        ),
+        required=True,
+        validate=ma.validate.Length(min=1, max=BATCH_MAX_QUERIES),
+        metadata={
+            "description": BATCH_QUERIES_DESCRIPTION,
+        },
+    )
+
+
+class TimeseriesDataBatchByNameSchema(Schema):
+    """Timeseries data batch by name schema"""
+
+    queries = ma.fields.List(
+        BatchQuery(
+            {
+                "raw": TimeseriesDataGetDataByNameQueryArgsSchema,
+                "aggregate": TimeseriesDataGetByNameAggregateQueryArgsSchema,
+                "stats": TimeseriesDataGetStatsByNameBaseQueryArgsSchema,
+            }
+        ),
+        required=True,
+        validate=ma.validate.Length(min=1, max=BATCH_MAX_QUERIES),
+        metadata={
+            "description": BATCH_QUERIES_DESCRIPTION,
+        },
+    )
+
+
+class TimeseriesDataBatchResultSchema(Schema):
+    status = ma.fields.Integer(
+        metadata={
+            "description": "HTTP status code of the query",
+        },
+    )
+    data = ma.fields.Raw(
+        metadata={
+            "description": (
+                "Query result, as returned by the GET resource in JSON format "
+                "(if successful)"
+            ),
+        },
+    )
+    message = ma.fields.String(
+        metadata={
+            "description": "Error message (if failed)",
+        },
+    )
+
+
+class TimeseriesDataBatchResultsSchema(Schema):
+    """Timeseries data batch response schema"""
+
+    results = ma.fields.List(
+        ma.fields.Nested(TimeseriesDataBatchResultSchema),
+        metadata={
+            "description": "Query results, in the order of the queries",
+        },
+    )
+
+
+class TimeseriesDataExportByIDSchema(
+    TimeseriesDataGetBaseQueryArgsSchema, TimeseriesIDListMixinSchema
+):
+    """Timeseries data export job creation schema"""
+
+    format = ma.fields.String(
+        load_default="csv",
+        validate=ma.validate.OneOf(EXPORT_FORMATS),
+        metadata={
+            "description": "File format (csv: gzipped CSV, parquet: Parquet)",
+        },
+    )
+
+
+class TimeseriesDataExportJobSchema(Schema):
+    """Timeseries data export job schema"""
+
+    id = ma.fields.String(
+        metadata={
+            "description": "Job ID",
+        },
+    )
+    status = ma.fields.String(
+        metadata={
+            "description": "Job status (pending, running, done or failed)",
+        },
+    )
+    format = ma.fields.String(
+        metadata={
+            "description": "File format",
+        },
+    )
+    created_at = ma_fields.AwareDateTime(
+        metadata={
+            "description": "Creation datetime",
+        },
+    )
+    updated_at = ma_fields.AwareDateTime(
+        metadata={
+            "description": "Last status update datetime",
+        },
+    )
+    size = ma.fields.Integer(
+        metadata={
+            "description": "File size in bytes (if done)",
+        },
+    )
+    message = ma.fields.String(
+        metadata={
+            "description": "Error message (if failed)",
+        },
+    )
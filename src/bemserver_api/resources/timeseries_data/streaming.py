@@ -0,0 +1,215 @@
+"""Timeseries data streaming export
+
+Data is read from the database in time-window chunks and serialized chunk by
+chunk, so that the whole dataset never sits in memory and the client receives
+the first bytes as soon as the first chunk is read. JSON payload is indexed by
+timeseries, so it is read timeseries by timeseries.
+"""
+
+import datetime as dt
+import io
+import itertools
+import json
+
+import flask
+
+from bemserver_core.authorization import CurrentUser, get_current_user
+from bemserver_core.input_output import tsdio
+
+from . import columnar
+
+# Same as in bemserver-core CSV export
+# https://github.com/pandas-dev/pandas/issues/27328
+CSV_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+
+def iter_windows(start_dt, end_dt, chunk_size):
+    """Iterate over [start, end) time windows of chunk_size seconds
+
+    Always yields at least one window, even if the interval is empty.
+    """
+    step = dt.timedelta(seconds=chunk_size)
+    win_start = start_dt
+    while True:
+        win_end = min(win_start + step, end_dt)
+        yield win_start, win_end
+        if win_end >= end_dt:
+            break
+        win_start = win_end
+
+
+def iter_csv(
+    start_dt,
+    end_dt,
+    timeseries,
+    data_state,
+    *,
+    chunk_size,
+    convert_to=None,
+    timezone="UTC",
+    col_label="id",
+):
+    """Iterate over timeseries data as CSV chunks
+
+    Output is identical to ``tsdcsvio.export_csv``.
+    """
+    user = get_current_user()
+    header = True
+    for win_start, win_end in iter_windows(start_dt, end_dt, chunk_size):
+        # Current user is set for each chunk rather than for the whole generator
+        # to avoid leaking it out of the request when the generator is suspended
+        with CurrentUser(user):
+            data_df = tsdio.get_timeseries_data(
+                win_start,
+                win_end,
+                timeseries,
+                data_state,
+                convert_to=convert_to,
+                timezone=timezone,
+                col_label=col_label,
+            )
+        if data_df.empty and not header:
+            continue
+        data_df.index.name = "Datetime"
+        yield data_df.to_csv(header=header, date_format=CSV_DATE_FORMAT)
+        header = False
+
+
+def iter_json(
+    start_dt,
+    end_dt,
+    timeseries,
+    data_state,
+    *,
+    chunk_size,
+    convert_to=None,
+    timezone="UTC",
+    col_label="id",
+):
+    """Iterate over timeseries data as JSON chunks
+
+    Output is identical to ``tsdjsonio.export_json``.
+
+    As JSON payload is indexed by timeseries, data is read timeseries by
+    timeseries, in time-window chunks, each chunk being sent as soon as it is
+    read.
+    """
+    user = get_current_user()
+    ts_sep = "{"
+    for ts in timeseries:
+        label = getattr(ts, col_label)
+        ts_convert_to = (
+            {label: convert_to[label]} if convert_to and label in convert_to else None
+        )
+        val_sep = None
+        for win_start, win_end in iter_windows(start_dt, end_dt, chunk_size):
+            with CurrentUser(user):
+                data_df = tsdio.get_timeseries_data(
+                    win_start,
+                    win_end,
+                    [ts],
+                    data_state,
+                    convert_to=ts_convert_to,
+                    timezone=timezone,
+                    col_label=col_label,
+                )
+            values = data_df[label].dropna()
+            if values.empty:
+                continue
+            values.index = values.index.map(lambda x: x.isoformat())
+            chunk = json.dumps(values.to_dict())[1:-1]
+            if val_sep is None:
+                yield f"{ts_sep}{json.dumps(str(label))}: {{{chunk}"
+                ts_sep = ", "
+                val_sep = ", "
+            else:
+                yield val_sep + chunk
+        if val_sep is not None:
+            yield "}"
+    yield "{}" if ts_sep == "{" else "}"
+
+
+def iter_arrow(
+    start_dt,
+    end_dt,
+    timeseries,
+    data_state,
+    *,
+    chunk_size,
+    convert_to=None,
+    timezone="UTC",
+    col_label="id",
+):
+    """Iterate over timeseries data as Arrow IPC stream chunks
+
+    Each time window is sent as a record batch.
+    """
+    user = get_current_user()
+    sink = io.BytesIO()
+    schema = None
+    for win_start, win_end in iter_windows(start_dt, end_dt, chunk_size):
+        with CurrentUser(user):
+            data_df = tsdio.get_timeseries_data(
+                win_start,
+                win_end,
+                timeseries,
+                data_state,
+                convert_to=convert_to,
+                timezone=timezone,
+                col_label=col_label,
+            )
+        if schema is None:
+            table = columnar.df_to_table(data_df)
+            schema = table.schema
+            writer = columnar.new_arrow_stream_writer(sink, schema)
+        elif data_df.empty:
+            continue
+        else:
+            table = columnar.df_to_table(data_df, schema=schema)
+        writer.write_table(table)
+        yield _pop_bytes(sink)
+    writer.close()
+    yield _pop_bytes(sink)
+
+
+def _pop_bytes(sink):
+    ret = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return ret
+
+
+def check_timeseries_data(
+    start_dt, timeseries, data_state, *, convert_to=None, col_label="id"
+):
+    """Check timeseries data can be read before streaming it
+
+    Checks read permission on all timeseries and unit conversions by reading an
+    empty time window, so that errors result in an appropriate error code
+    rather than in a truncated response.
+    """
+    tsdio.get_timeseries_data(
+        start_dt,
+        start_dt,
+        timeseries,
+        data_state,
+        convert_to=convert_to,
+        col_label=col_label,
+    )
+
+
+def stream_response(chunks, mimetype):
+    """Make a streamed response from a chunk iterator
+
+    The first chunk is computed before the response is returned so that errors
+    raised while reading the first chunk are caught in the view function.
+    Permissions and unit conversions are checked beforehand (see
+    check_timeseries_data).
+    """
+    first_chunk = next(chunks)
+    return flask.Response(
+        flask.stream_with_context(itertools.chain((first_chunk,), chunks)),
+        mimetype=mimetype,
+        # Prevent reverse proxies from buffering the whole response
+        headers={"X-Accel-Buffering": "no"},
+    )
@@ -7,10 +7,14 @@ from flask_smorest import abort
 from bemserver_core.exceptions import PropertyTypeInvalidError
 from bemserver_core.model import TimeseriesPropertyData
 
-from bemserver_api import Blueprint
+from bemserver_api import Blueprint, SQLCursorPage
 from bemserver_api.database import db
+from bemserver_api.extensions import bulk
 
 from .schemas import (
+    TimeseriesPropertyDataBulkPostSchema,
+    TimeseriesPropertyDataBulkPutSchema,
+    TimeseriesPropertyDataBulkResultSchema,
     TimeseriesPropertyDataQueryArgsSchema,
     TimeseriesPropertyDataSchema,
 )
@@ -28,7 +32,8 @@ class TimeseriesPropertyDataViews(MethodView):
     @blp.login_required
     @blp.etag
     @blp.arguments(TimeseriesPropertyDataQueryArgsSchema, location="query")
-    @blp.response(200, TimeseriesPropertyDataSchema(many=True))
+    @blp.response(200, TimeseriesPropertyDataSchema(many=True), ndjson=True)
+    @blp.paginate(SQLCursorPage, optional=True)
     def get(self, args):
         """List timeseries property data"""
         return TimeseriesPropertyData.get(**args)
@@ -48,6 +53,46 @@ class TimeseriesPropertyDataViews(MethodView):
         return item
 
 
+@blp.route("/bulk")
+class TimeseriesPropertyDataBulkViews(MethodView):
+    @blp.login_required
+    @blp.arguments(TimeseriesPropertyDataBulkPostSchema(many=True))
+    @blp.response(200, TimeseriesPropertyDataBulkResultSchema(many=True))
+    def post(self, new_items):
+        """Add new timeseries property data in bulk
+
+        Items are created in a single transaction. Returns the status of each
+        item, in request order.
+        """
+        return bulk.create(
+            TimeseriesPropertyData, new_items, TimeseriesPropertyDataSchema()
+        )
+
+    @blp.login_required
+    @blp.arguments(TimeseriesPropertyDataBulkPutSchema(many=True))
+    @blp.response(200, TimeseriesPropertyDataBulkResultSchema(many=True))
+    def put(self, new_items):
+        """Update existing timeseries property data in bulk
+
+        Items are updated in a single transaction, without ETag check. Returns
+        the status of each item, in request order.
+        """
+        return bulk.update(
+            TimeseriesPropertyData, new_items, TimeseriesPropertyDataSchema()
+        )
+
+    @blp.login_required
+    @blp.arguments(bulk.BulkDeleteSchema)
+    @blp.response(200, bulk.BulkResultSchema(many=True))
+    def delete(self, args):
+        """Delete timeseries property data in bulk
+
+        Items are deleted in a single transaction, without ETag check. Returns
+        the status of each item, in request order.
+        """
+        return bulk.delete(TimeseriesPropertyData, args["ids"])
+
+
 @blp.route("/<int:item_id>")
 class TimeseriesPropertyDataByIdViews(MethodView):
     @blp.login_required
@@ -6,6 +6,7 @@ import marshmallow_sqlalchemy as msa
 from bemserver_core.model import TimeseriesPropertyData
 
 from bemserver_api import AutoSchema, Schema
+from bemserver_api.extensions.bulk import BulkItemsMixinSchema, BulkResultSchema
 
 
 class TimeseriesPropertyDataSchema(AutoSchema):
@@ -15,6 +16,22 @@ class TimeseriesPropertyDataSchema(AutoSchema):
     id = msa.auto_field(dump_only=True)
 
 
+class TimeseriesPropertyDataBulkPostSchema(
+    TimeseriesPropertyDataSchema, BulkItemsMixinSchema
+):
+    pass
+
+
+class TimeseriesPropertyDataBulkPutSchema(
+    TimeseriesPropertyDataSchema, BulkItemsMixinSchema
+):
+    id = ma.fields.Integer(required=True)
+
+
+class TimeseriesPropertyDataBulkResultSchema(BulkResultSchema):
+    item = ma.fields.Nested(TimeseriesPropertyDataSchema)
+
+
 class TimeseriesPropertyDataQueryArgsSchema(Schema):
     timeseries_id = ma.fields.Int()
     property_id = ma.fields.Int()
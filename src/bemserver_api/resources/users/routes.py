@@ -6,8 +6,9 @@ from flask_smorest import abort
 
 from bemserver_core.model import User
 
-from bemserver_api import Blueprint
+from bemserver_api import Blueprint, SQLCursorPage
 from bemserver_api.database import db
+from bemserver_api.extensions.authentication import auth
 
 from .schemas import BooleanValueSchema, UserQueryArgsSchema, UserSchema
 
@@ -21,7 +22,8 @@ class UserViews(MethodView):
     @blp.login_required
     @blp.etag
     @blp.arguments(UserQueryArgsSchema, location="query")
-    @blp.response(200, UserSchema(many=True))
+    @blp.response(200, UserSchema(many=True), ndjson=True)
+    @blp.paginate(SQLCursorPage, optional=True)
     def get(self, args):
         """List users"""
         return User.get(**args)
@@ -66,9 +68,11 @@ class UserByIdViews(MethodView):
             abort(404)
         blp.check_etag(item, UserSchema)
         password = new_item.pop("password")
+        email = item.email
         item.update(**new_item)
         item.set_password(password)
         db.session.commit()
+        auth.invalidate_user(email)
         return item
 
     @blp.login_required
@@ -80,8 +84,10 @@ class UserByIdViews(MethodView):
         if item is None:
             abort(404)
         blp.check_etag(item, UserSchema)
+        email = item.email
         item.delete()
         db.session.commit()
+        auth.invalidate_user(email)
 
 
 @blp.route("/<int:item_id>/set_admin", methods=("PUT",))
@@ -97,6 +103,7 @@ def set_admin(args, item_id):
     blp.check_etag(item, UserSchema)
     item.is_admin = args["value"]
     db.session.commit()
+    auth.invalidate_user(item.email)
     blp.set_etag(item, UserSchema)
 
 
@@ -113,4 +120,5 @@ def set_active(args, item_id):
     blp.check_etag(item, UserSchema)
     item.is_active = args["value"]
     db.session.commit()
+    auth.invalidate_user(item.email)
     blp.set_etag(item, UserSchema)
@@ -6,7 +6,7 @@ from flask_smorest import abort
 
 from bemserver_core.model import WeatherTimeseriesBySite
 
-from bemserver_api import Blueprint
+from bemserver_api import Blueprint, SQLCursorPage
 from bemserver_api.database import db
 
 from .schemas import (
@@ -27,7 +27,8 @@ class WeatherTimeseriesBySiteViews(MethodView):
     @blp.login_required
     @blp.etag
     @blp.arguments(WeatherTimeseriesBySiteQueryArgsSchema, location="query")
-    @blp.response(200, WeatherTimeseriesBySiteSchema(many=True))
+    @blp.response(200, WeatherTimeseriesBySiteSchema(many=True), ndjson=True)
+    @blp.paginate(SQLCursorPage, optional=True)
     def get(self, args):
         """List weather timeseries x site associations"""
         return WeatherTimeseriesBySite.get(**args)
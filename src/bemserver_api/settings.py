@@ -9,10 +9,32 @@ class Config:
     AUTH_METHODS = [
         "Bearer",
     ]
+    # Cache of authenticated users, to avoid a user query on each request
+    # Each process has its own cache. User modifications are visible immediately
+    # in the process handling the modification and after TTL in other processes:
+    # a user deactivated, removed from admins or deleted keeps their access in
+    # other processes until then.
+    # Lifetime in seconds (0: cache disabled)
+    AUTH_USER_CACHE_TTL = 0
+    AUTH_USER_CACHE_MAX_SIZE = 1024
+    # Cache of verified passwords, to avoid hashing password on each request
+    # using HTTP Basic authentication. Only keyed digests are stored.
+    # Lifetime in seconds (0: cache disabled)
+    AUTH_PASSWORD_CACHE_TTL = 0
+    AUTH_PASSWORD_CACHE_MAX_SIZE = 1024
+    # Cache of verified tokens, to avoid decoding token on each request
+    # Tokens are cached until expiration (0: cache disabled)
+    AUTH_TOKEN_CACHE_MAX_SIZE = 1024
 
     # API parameters
     API_TITLE = "BEMServer API"
+    # Only import and register these resource modules (e.g. "timeseries",
+    # "timeseries_data"), all if empty. "about" is always registered.
+    API_MODULES = []
     OPENAPI_JSON_PATH = "api-spec.json"
+    # Precomputed spec file, to avoid documenting views at startup
+    # Generate with "flask openapi write" with OPENAPI_SPEC_FILE unset
+    OPENAPI_SPEC_FILE = ""
     OPENAPI_URL_PREFIX = "/"
     OPENAPI_RAPIDOC_PATH = "/"
     OPENAPI_RAPIDOC_URL = "https://cdn.jsdelivr.net/npm/rapidoc/dist/rapidoc-min.js"
@@ -24,5 +46,97 @@ class Config:
         "show-components": "true",
     }
 
+    # Pagination
+    # Lifetime in seconds of item counts cached for "estimate" count mode
+    # (requires CACHE_BACKEND). Cached counts are discarded on writes.
+    PAGINATION_COUNT_CACHE_TTL = 60
+    # Without cache, counts estimated by the query planner below this value are
+    # computed exactly in "estimate" count mode
+    PAGINATION_COUNT_ESTIMATE_THRESHOLD = 10_000
+    # Number of items read and serialized at once when streaming listings as
+    # newline-delimited JSON
+    NDJSON_BATCH_SIZE = 1000
+
+    # Bulk operations
+    # Maximum number of items per bulk create, update or delete request
+    BULK_MAX_ITEMS = 1000
+
+    # Timeseries data
+    # Time window (in seconds) of the chunks read when streaming data
+    TIMESERIES_DATA_STREAM_CHUNK_SIZE = 60 * 60 * 24  # 1 day
+    # Number of CSV rows or JSON values inserted at once when streaming uploads
+    TIMESERIES_DATA_IMPORT_BATCH_SIZE = 10_000
+    # Compression codec used in Arrow and Parquet payloads ("zstd", "lz4" or None)
+    TIMESERIES_DATA_COLUMNAR_COMPRESSION = "zstd"
+    # Compute aggregates from hourly, daily and monthly rollups stored in cache
+    # (requires CACHE_BACKEND, size set by CACHE_ROLLUPS_MAX_SIZE)
+    TIMESERIES_DATA_ROLLUPS = False
+    # Number of threads running batch queries in parallel (1: sequential)
+    # Each thread uses its own DB connection
+    TIMESERIES_DATA_BATCH_MAX_WORKERS = 1
+    # Directory where export jobs write their files (exports disabled if empty)
+    # Must be shared with Celery workers
+    TIMESERIES_DATA_EXPORT_DIR = ""
+    # Time (in seconds) export jobs and files are kept once done or failed
+    # (None: forever). Expired jobs are deleted when a new export is started.
+    TIMESERIES_DATA_EXPORT_RETENTION = 60 * 60 * 24  # 1 day
+
+    # Input/Output
+    # Number of CSV rows imported per transaction by bulk imports
+    IO_IMPORT_BATCH_SIZE = 1000
+    # Directory where import jobs store uploaded files (import jobs disabled if
+    # empty). Must be shared with Celery workers
+    IO_IMPORT_DIR = ""
+    # Time (in seconds) import jobs are kept once done or failed (None: forever).
+    # Expired jobs are deleted when a new import is started.
+    IO_IMPORT_RETENTION = 60 * 60 * 24  # 1 day
+
+    # Cache
+    # Backend: None (disabled), "memory" (one cache per process) or "filesystem"
+    # (cache shared by all processes of the host). Cached responses are
+    # invalidated on writes, so the memory backend is disabled when the server
+    # runs several processes. Celery workers should import bemserver_api.worker
+    # to invalidate the filesystem cache when writing data.
+    # Also stores table watermarks used to compute ETags of paginated listings
+    # without querying items.
+    CACHE_BACKEND = None
+    CACHE_DIR = ""
+    # Maximum number of cached responses and counts
+    CACHE_MAX_SIZE = 1024
+    # Maximum number of watermarks, stored apart from responses so that they
+    # are not evicted by large responses
+    CACHE_WATERMARKS_MAX_SIZE = 65536
+    # Maximum number of timeseries data rollup blocks (about 1 kB each), stored
+    # apart from responses. Hourly rollups use a block per timeseries and day.
+    CACHE_ROLLUPS_MAX_SIZE = 100_000
+    # Entry lifetime in seconds (required when cache is enabled)
+    # Data written without using the API or the workers is only visible after
+    # cache expiration.
+    CACHE_DEFAULT_TTL = 60 * 60
+
+    # Instrumentation
+    # Record number of SQL queries and database, authentication and
+    # serialization times per request, exposed in Server-Timing response header
+    # and aggregated per endpoint
+    INSTRUMENTATION = False
+
+    # Metrics
+    # Expose request metrics in Prometheus format at /metrics (no authentication)
+    METRICS = False
+
     # Profiling
+    # Profile requests and write aggregated stats in PROFILE_DIR (disabled if empty)
     PROFILE_DIR = ""
+    # Profile 1 in N requests
+    PROFILE_SAMPLE_RATE = 1
+    # Only keep profiles of requests slower than this duration (in seconds)
+    PROFILE_MIN_DURATION = 0
+    # Only profile these endpoints (e.g. "TimeseriesData.get"), all if empty
+    PROFILE_ENDPOINTS = []
+    # Write aggregated stats every PROFILE_DUMP_INTERVAL seconds
+    # Files are rotated: only the last PROFILE_MAX_FILES are kept
+    PROFILE_DUMP_INTERVAL = 60
+    PROFILE_MAX_FILES = 100
+    # Sample call stacks of profiled requests every PROFILE_STACKS_INTERVAL
+    # seconds and write them in collapsed format for flame graphs (0: disabled)
+    PROFILE_STACKS_INTERVAL = 0
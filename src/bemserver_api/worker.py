@@ -0,0 +1,30 @@
+"""Celery worker setup
+
+Data written by Celery tasks (e.g. core cleanup task) must renew the watermarks
+of the API cache, otherwise cached responses, counts and ETags are stale until
+cache expiration.
+
+The worker must import this module, for instance with the ``imports`` Celery
+setting. API settings are read from the file pointed by
+BEMSERVER_API_SETTINGS_FILE environment variable, as in the API. Only the
+filesystem cache backend is shared with the API.
+"""
+
+import os
+
+import flask
+
+from bemserver_api import load_config
+from bemserver_api.extensions import watermarks  # noqa: F401
+from bemserver_api.extensions.cache import cache
+from bemserver_api.resources.timeseries_data import caching  # noqa: F401
+
+
+def init_worker():
+    """Open API cache to track data written by tasks"""
+    config = flask.Config(os.getcwd())
+    load_config(config)
+    cache.init_worker(config)
+
+
+init_worker()
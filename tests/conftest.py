@@ -66,9 +66,11 @@ class TestClient(flask.testing.FlaskClient):
 
 
 @pytest.fixture(params=(TestConfig,))
-def app(request, bsc_config, monkeypatch):
+def app(request, bsc_config, tmp_path, monkeypatch):
     with monkeypatch.context() as mp_ctx:
         mp_ctx.setattr(bemserver_api.settings, "Config", request.param)
+        # Don't share filesystem cache between tests
+        mp_ctx.setattr(request.param, "CACHE_DIR", str(tmp_path / "cache"))
         application = bemserver_api.create_app()
     application.test_client_class = TestClient
     setup_db()
@@ -2,6 +2,7 @@
 
 import base64
 import datetime as dt
+import time
 from unittest import mock
 
 import pytest
@@ -15,9 +16,11 @@ from authlib.jose.errors import (
 from tests.common import TestConfig
 
 from bemserver_core.authorization import get_current_user
+from bemserver_core.model import User
 
 from bemserver_api import Blueprint
-from bemserver_api.extensions.authentication import auth, jwt
+from bemserver_api.database import db
+from bemserver_api.extensions.authentication import Auth, auth, jwt
 
 
 class HBATestConfig(TestConfig):
@@ -32,6 +35,21 @@ class JWTTestConfig(TestConfig):
     ]
 
 
+class HBAPasswordCacheTestConfig(TestConfig):
+    AUTH_METHODS = [
+        "Basic",
+    ]
+    AUTH_PASSWORD_CACHE_TTL = 60
+
+
+class NoTokenCacheTestConfig(TestConfig):
+    AUTH_TOKEN_CACHE_MAX_SIZE = 0
+
+
+class UserCacheTestConfig(TestConfig):
+    AUTH_USER_CACHE_TTL = 60
+
+
 class TestAuthentication:
     @mock.patch("bemserver_api.extensions.authentication.datetime")
     @mock.patch("bemserver_api.extensions.authentication.jwt.encode")
@@ -360,3 +378,166 @@ class TestAuthentication:
         no_auth_spec = spec["paths"]["/auth_test/no_auth"]
         assert "401" not in no_auth_spec["get"]["responses"]
         assert no_auth_spec["get"]["security"] == []
+
+    @pytest.mark.parametrize("app", (UserCacheTestConfig, TestConfig), indirect=True)
+    def test_auth_user_cache(self, app, users):
+        user_1_id = users["Active"]["id"]
+        active_user_jwt_creds = users["Active"]["creds"]
+        admin_user_jwt_creds = users["Chuck"]["creds"]
+        api = app.extensions["flask-smorest"]["apis"][""]["ext_obj"]
+        blp = Blueprint("AuthTest", __name__, url_prefix="/auth_test")
+
+        @blp.route("/auth")
+        @blp.login_required
+        @blp.response(200)
+        def auth_func():
+            return get_current_user().name
+
+        api.register_blueprint(blp)
+        client = app.test_client()
+
+        cache_enabled = app.config["AUTH_USER_CACHE_TTL"] != 0
+        assert (auth.user_cache is not None) is cache_enabled
+
+        headers = {"Authorization": active_user_jwt_creds}
+        resp = client.get("/auth_test/auth", headers=headers)
+        assert resp.status_code == 200
+        assert resp.json == "Active"
+
+        # User is cached: no query
+        with mock.patch.object(
+            Auth, "_query_user_by_email", wraps=Auth._query_user_by_email
+        ) as mock_query:
+            resp = client.get("/auth_test/auth", headers=headers)
+            assert resp.status_code == 200
+            assert resp.json == "Active"
+            assert mock_query.called is not cache_enabled
+
+        # User already loaded in session is returned as is
+        user = db.session.get(User, user_1_id)
+        user.name = "Modified"
+        assert auth.get_user_by_email(user.email) is user
+        assert user.name == "Modified"
+        db.session.rollback()
+
+        # Modifying user invalidates cache
+        admin_headers = {"Authorization": admin_user_jwt_creds}
+        resp = client.get(f"/users/{user_1_id}", headers=admin_headers)
+        resp = client.put(
+            f"/users/{user_1_id}/set_active",
+            json={"value": False},
+            headers={**admin_headers, "If-Match": resp.headers["ETag"]},
+        )
+        assert resp.status_code == 204
+        resp = client.get("/auth_test/auth", headers=headers)
+        assert resp.status_code == 403
+
+    @pytest.mark.parametrize("app", (HBAPasswordCacheTestConfig,), indirect=True)
+    def test_auth_password_cache(self, app, users):
+        user_1_id = users["Active"]["id"]
+        active_user_hba_creds = users["Active"]["hba_creds"]
+        active_user_invalid_hba_creds = base64.b64encode(
+            f"{users['Active']['user'].email}:bad_pwd".encode()
+        ).decode()
+        api = app.extensions["flask-smorest"]["apis"][""]["ext_obj"]
+        blp = Blueprint("AuthTest", __name__, url_prefix="/auth_test")
+
+        @blp.route("/auth")
+        @blp.login_required
+        @blp.response(200)
+        def auth_func():
+            return get_current_user().name
+
+        api.register_blueprint(blp)
+        client = app.test_client()
+
+        headers = {"Authorization": active_user_hba_creds}
+        resp = client.get("/auth_test/auth", headers=headers)
+        assert resp.status_code == 200
+
+        with mock.patch.object(
+            User, "check_password", autospec=True, side_effect=User.check_password
+        ) as mock_check:
+            # Verified password is cached
+            resp = client.get("/auth_test/auth", headers=headers)
+            assert resp.status_code == 200
+            mock_check.assert_not_called()
+
+            # Wrong password is checked
+            resp = client.get(
+                "/auth_test/auth",
+                headers={"Authorization": "Basic " + active_user_invalid_hba_creds},
+            )
+            assert resp.status_code == 401
+            mock_check.assert_called_once()
+
+        # Cached password is not valid anymore after password change
+        resp = client.get(f"/users/{user_1_id}", headers=headers)
+        resp = client.put(
+            f"/users/{user_1_id}",
+            json={
+                "name": "Active",
+                "email": users["Active"]["user"].email,
+                "password": "new_pwd",
+            },
+            headers={**headers, "If-Match": resp.headers["ETag"]},
+        )
+        assert resp.status_code == 200
+        resp = client.get("/auth_test/auth", headers=headers)
+        assert resp.status_code == 401
+
+    @pytest.mark.parametrize(
+        "app", (JWTTestConfig, NoTokenCacheTestConfig), indirect=True
+    )
+    def test_auth_token_cache(self, app, users):
+        active_user_jwt_creds = users["Active"]["creds"]
+        api = app.extensions["flask-smorest"]["apis"][""]["ext_obj"]
+        blp = Blueprint("AuthTest", __name__, url_prefix="/auth_test")
+
+        @blp.route("/auth")
+        @blp.login_required
+        @blp.response(200)
+        def auth_func():
+            return get_current_user().name
+
+        api.register_blueprint(blp)
+        client = app.test_client()
+
+        cache_enabled = app.config["AUTH_TOKEN_CACHE_MAX_SIZE"] != 0
+        assert ("token" in auth.get_cache_stats()) is cache_enabled
+
+        headers = {"Authorization": active_user_jwt_creds}
+        resp = client.get("/auth_test/auth", headers=headers)
+        assert resp.status_code == 200
+
+        # Token is cached: not decoded
+        with mock.patch.object(auth, "decode", wraps=auth.decode) as mock_decode:
+            resp = client.get("/auth_test/auth", headers=headers)
+            assert resp.status_code == 200
+            assert mock_decode.called is not cache_enabled
+        if cache_enabled:
+            assert auth.get_cache_stats()["token"] == {
+                "hits": 1,
+                "misses": 1,
+                "size": 1,
+            }
+
+        # Token is evicted on expiration
+        headers = {
+            "Authorization": "Bearer "
+            + jwt.encode(
+                auth.HEADER,
+                {
+                    "email": users["Active"]["user"].email,
+                    "exp": int(time.time()) + 1,
+                    "type": "access",
+                },
+                app.config["SECRET_KEY"],
+            ).decode()
+        }
+        resp = client.get("/auth_test/auth", headers=headers)
+        assert resp.status_code == 200
+        time.sleep(2.5)
+        resp = client.get("/auth_test/auth", headers=headers)
+        assert resp.status_code == 401
+        assert resp.json["errors"]["authentication"] == "expired_token"
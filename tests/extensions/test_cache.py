@@ -0,0 +1,163 @@
+"""Test cache extension"""
+
+import datetime as dt
+from unittest import mock
+
+import pytest
+
+from tests.common import TestConfig
+
+from bemserver_core import model
+from bemserver_core.authorization import OpenBar
+from bemserver_core.database import db
+
+import bemserver_api
+from bemserver_api import worker
+from bemserver_api.extensions import watermarks
+from bemserver_api.extensions.cache import (
+    FileSystemCache,
+    MemoryCache,
+    cache,
+    get_watermark,
+)
+
+
+class TestCache:
+    @pytest.mark.parametrize("backend", ("memory", "filesystem"))
+    @mock.patch("bemserver_api.extensions.cache.time")
+    def test_cache_backend(self, mock_time, tmp_path, backend):
+        mock_time.monotonic.return_value = 0
+        mock_time.time.return_value = 0
+
+        if backend == "memory":
+            cache_backend = MemoryCache(max_size=2)
+        else:
+            cache_backend = FileSystemCache(tmp_path, max_size=2)
+
+        assert cache_backend.get("key_1") is None
+        assert cache_backend.get("key_1", "dummy") == "dummy"
+        assert cache_backend.misses == 2
+        cache_backend.set("key_1", {"value": 1})
+        assert cache_backend.get("key_1") == {"value": 1}
+        assert cache_backend.hits == 1
+        assert cache_backend.size == 1
+
+        # Least recently used entry is evicted
+        cache_backend.set("key_2", 2)
+        cache_backend.get("key_1")
+        cache_backend.set("key_3", 3)
+        assert cache_backend.size == 2
+        assert cache_backend.get("key_1") == {"value": 1}
+        assert cache_backend.get("key_2") is None
+        assert cache_backend.get("key_3") == 3
+
+        # TTL
+        cache_backend.set("key_1", 1, ttl=10)
+        mock_time.monotonic.return_value = 20
+        mock_time.time.return_value = 20
+        assert cache_backend.get("key_1") is None
+        assert cache_backend.get("key_3") == 3
+
+        cache_backend.delete("key_3")
+        cache_backend.delete("key_3")
+        assert cache_backend.get("key_3") is None
+        cache_backend.set("key_1", 1)
+        cache_backend.clear()
+        assert cache_backend.size == 0
+
+    def test_cache_default_ttl(self, tmp_path):
+        for cache_backend in (
+            MemoryCache(max_size=2, default_ttl=-1),
+            FileSystemCache(tmp_path, max_size=2, default_ttl=-1),
+        ):
+            cache_backend.set("key_1", 1)
+            assert cache_backend.get("key_1") is None
+            cache_backend.set("key_1", 1, ttl=10)
+            assert cache_backend.get("key_1") == 1
+
+    def test_cache_get_watermark(self):
+        cache_backend = MemoryCache(max_size=2)
+        watermark = get_watermark(cache_backend, "watermark")
+        assert get_watermark(cache_backend, "watermark") == watermark
+        cache_backend.delete("watermark")
+        assert get_watermark(cache_backend, "watermark") != watermark
+
+    def test_cache_init_app(self, app, tmp_path, monkeypatch):
+        with app.app_context():
+            assert cache.backend is None
+        assert cache.backend is None
+
+        class FileSystemCacheTestConfig(TestConfig):
+            CACHE_BACKEND = "filesystem"
+            CACHE_DIR = str(tmp_path)
+
+        monkeypatch.setattr(bemserver_api.settings, "Config", FileSystemCacheTestConfig)
+        application = bemserver_api.create_app()
+        with application.app_context():
+            assert isinstance(cache.backend, FileSystemCache)
+            assert isinstance(cache.watermarks, FileSystemCache)
+            # Watermarks are not evicted by responses
+            cache.watermarks.set("watermark", "token")
+            for idx in range(application.config["CACHE_MAX_SIZE"] + 1):
+                cache.backend.set(f"response_{idx}", idx)
+            assert cache.watermarks.get("watermark") == "token"
+            cache.clear()
+            assert cache.watermarks.size == 0
+            assert cache.backend.size == 0
+
+        class DummyCacheTestConfig(TestConfig):
+            CACHE_BACKEND = "dummy"
+
+        monkeypatch.setattr(bemserver_api.settings, "Config", DummyCacheTestConfig)
+        with pytest.raises(ValueError, match="Unknown cache backend"):
+            bemserver_api.create_app()
+
+        class NoTTLCacheTestConfig(TestConfig):
+            CACHE_BACKEND = "memory"
+            CACHE_DEFAULT_TTL = None
+
+        monkeypatch.setattr(bemserver_api.settings, "Config", NoTTLCacheTestConfig)
+        with pytest.raises(ValueError, match="CACHE_DEFAULT_TTL must be set"):
+            bemserver_api.create_app()
+
+    def test_cache_multiprocess(self, app, monkeypatch):
+        class MemoryCacheTestConfig(TestConfig):
+            CACHE_BACKEND = "memory"
+
+        monkeypatch.setattr(bemserver_api.settings, "Config", MemoryCacheTestConfig)
+        application = bemserver_api.create_app()
+        with application.test_request_context():
+            assert isinstance(cache.backend, MemoryCache)
+        # Memory cache can't be invalidated by writes in other processes
+        with application.test_request_context(multiprocess=True):
+            assert cache.backend is None
+            assert cache.watermarks is None
+        with application.test_request_context():
+            assert cache.backend is None
+
+    def test_cache_worker(self, app, tmp_path, monkeypatch):
+        class FileSystemCacheTestConfig(TestConfig):
+            CACHE_BACKEND = "filesystem"
+            CACHE_DIR = str(tmp_path)
+
+        monkeypatch.setattr(bemserver_api.settings, "Config", FileSystemCacheTestConfig)
+        monkeypatch.setattr(cache, "_worker_stores", None)
+        application = bemserver_api.create_app()
+        with application.app_context():
+            watermark = watermarks.get_table_watermark(cache.watermarks, "campaigns")
+
+        # Worker writes renew watermarks of shared cache
+        worker.init_worker()
+        assert isinstance(cache.watermarks, FileSystemCache)
+        with OpenBar():
+            model.Campaign.new(
+                name="Campaign 1",
+                start_time=dt.datetime(2020, 1, 1, tzinfo=dt.UTC),
+                timezone="UTC",
+            )
+            db.session.commit()
+        with application.app_context():
+            assert (
+                watermarks.get_table_watermark(cache.watermarks, "campaigns")
+                != watermark
+            )
@@ -0,0 +1,103 @@
+"""Test instrumentation extension"""
+
+import re
+from unittest import mock
+
+import pytest
+
+from tests.common import TestConfig
+
+from bemserver_api.extensions import instrumentation as instrumentation_ext
+from bemserver_api.extensions.instrumentation import instrumentation
+
+SERVER_TIMING_RE = re.compile(
+    r'db;dur=[\d.]+;desc="(\d+) queries", '
+    r"auth;dur=[\d.]+, "
+    r"serialization;dur=[\d.]+, "
+    r"total;dur=[\d.]+"
+)
+
+
+class InstrumentationTestConfig(TestConfig):
+    INSTRUMENTATION = True
+
+
+class TestInstrumentation:
+    @pytest.mark.parametrize("app", (InstrumentationTestConfig,), indirect=True)
+    def test_instrumentation(self, app, users):
+        creds = users["Chuck"]["creds"]
+        client = app.test_client()
+
+        with app.app_context():
+            assert instrumentation.stats.get() == {}
+
+        resp = client.get("/users/", headers={"Authorization": creds})
+        assert resp.status_code == 200
+        match = SERVER_TIMING_RE.fullmatch(resp.headers["Server-Timing"])
+        assert match
+        nb_queries = int(match.group(1))
+        assert nb_queries > 0
+
+        resp = client.get("/users/", headers={"Authorization": creds})
+        assert resp.status_code == 200
+        resp = client.get("/users/", headers={"Authorization": "Bearer Dummy"})
+        assert resp.status_code == 401
+        assert "Server-Timing" in resp.headers
+
+        with app.app_context():
+            stats = instrumentation.stats.get()
+            assert stats["User.UserViews"]["count"] == 3
+            assert stats["User.UserViews"]["queries"] >= nb_queries
+            for step in ("total", "db", "auth", "serialization"):
+                assert stats["User.UserViews"][step] > 0
+            instrumentation.stats.clear()
+            assert instrumentation.stats.get() == {}
+
+    @pytest.mark.parametrize("app", (InstrumentationTestConfig,), indirect=True)
+    @pytest.mark.parametrize("timeseries", (4,), indirect=True)
+    def test_instrumentation_batch_threads(self, app, users, timeseries):
+        creds = users["Chuck"]["creds"]
+        client = app.test_client()
+
+        queries = [
+            {
+                "type": "stats",
+                "timeseries": [ts_id],
+                "data_state": 1,
+            }
+            for ts_id in timeseries
+        ]
+
+        def get_nb_queries():
+            resp = client.post(
+                "/timeseries_data/batch",
+                json={"queries": queries},
+                headers={"Authorization": creds},
+            )
+            assert resp.status_code == 200
+            match = SERVER_TIMING_RE.fullmatch(resp.headers["Server-Timing"])
+            return int(match.group(1))
+
+        nb_queries = get_nb_queries()
+        # Queries run in worker threads are recorded
+        app.config["TIMESERIES_DATA_BATCH_MAX_WORKERS"] = 4
+        with mock.patch.object(
+            instrumentation_ext,
+            "merge_thread_stats",
+            wraps=instrumentation_ext.merge_thread_stats,
+        ) as merge_thread_stats:
+            assert get_nb_queries() == nb_queries
+        assert merge_thread_stats.call_count == len(queries)
+        # Each thread has its own stats
+        thread_stats = [call.args[0] for call in merge_thread_stats.call_args_list]
+        assert len({id(stats) for stats in thread_stats}) == len(queries)
+
+    def test_instrumentation_disabled(self, app, users):
+        creds = users["Chuck"]["creds"]
+        client = app.test_client()
+
+        resp = client.get("/users/", headers={"Authorization": creds})
+        assert resp.status_code == 200
+        assert "Server-Timing" not in resp.headers
+        with app.app_context():
+            assert instrumentation.stats is None
@@ -1,10 +1,24 @@
 """Test smorest extension"""
 
+import gzip
+import json
+from unittest import mock
+
 import pytest
 
 from tests.common import AuthHeader, TestConfig, make_token
 
+from bemserver_core import model
+from bemserver_core.authorization import OpenBar
+from bemserver_core.database import db
+
+import bemserver_api
+from bemserver_api.extensions import dumping, watermarks
 from bemserver_api.extensions.authentication import auth
+from bemserver_api.extensions.cache import cache
+from bemserver_api.resources.events.schemas import EventSchema
+from bemserver_api.resources.tasks_by_campaigns.schemas import TaskByCampaignSchema
+from bemserver_api.resources.timeseries.schemas import TimeseriesSchema
 
 
 class HBATestConfig(TestConfig):
@@ -13,6 +27,18 @@ class HBATestConfig(TestConfig):
     ]
 
 
+class PlannerCountTestConfig(TestConfig):
+    PAGINATION_COUNT_ESTIMATE_THRESHOLD = 0
+
+
+class CacheTestConfig(TestConfig):
+    CACHE_BACKEND = "memory"
+
+
+class FileSystemCacheTestConfig(TestConfig):
+    CACHE_BACKEND = "filesystem"
+
+
 class TestSmorest:
     def test_get_token(self, app, users):
         user_1 = users["Active"]["user"]
@@ -108,3 +134,374 @@ class TestSmorest:
         with AuthHeader(access_token):
             resp = client.post("/auth/token/refresh")
         assert resp.status_code == 404
+
+    def test_openapi_json(self, app, tmp_path, monkeypatch):
+        client = app.test_client()
+
+        resp = client.get("/api-spec.json")
+        assert resp.status_code == 200
+        spec = resp.json
+        assert "/timeseries/" in spec["paths"]
+        resp_headers = spec["paths"]["/timeseries/"]["get"]["responses"]["200"][
+            "headers"
+        ]
+        assert resp_headers["X-Pagination"] == {
+            "$ref": "#/components/headers/CURSOR_PAGINATION"
+        }
+        metadata_schema = spec["components"]["schemas"]["CursorPaginationMetadata"]
+        assert {"total", "total_estimated", "next_cursor"} <= set(
+            metadata_schema["properties"]
+        )
+        etag = resp.headers["ETag"]
+        assert "Accept-Encoding" in resp.headers["Vary"]
+        resp = client.get("/api-spec.json", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+
+        # Gzip
+        resp = client.get("/api-spec.json", headers={"Accept-Encoding": "gzip"})
+        assert resp.status_code == 200
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(resp.data)) == spec
+        gzip_etag = resp.headers["ETag"]
+        assert gzip_etag != etag
+        resp = client.get(
+            "/api-spec.json",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": gzip_etag},
+        )
+        assert resp.status_code == 304
+
+        # Precomputed spec
+        spec_file = tmp_path / "api-spec.json"
+        spec_file.write_text(json.dumps(spec))
+
+        class SpecFileTestConfig(TestConfig):
+            OPENAPI_SPEC_FILE = str(spec_file)
+
+        monkeypatch.setattr(bemserver_api.settings, "Config", SpecFileTestConfig)
+        spec_file_app = bemserver_api.create_app()
+        api = spec_file_app.extensions["flask-smorest"]["apis"][""]["ext_obj"]
+        assert not api.spec.to_dict()["paths"]
+        client = spec_file_app.test_client()
+        resp = client.get("/api-spec.json")
+        assert resp.status_code == 200
+        assert resp.json == spec
+        resp = client.get("/about/")
+        assert resp.status_code == 200
+
+    @pytest.mark.parametrize("timeseries", (7,), indirect=True)
+    def test_sql_cursor_page(self, app, users, timeseries):
+        client = app.test_client()
+
+        def get_page(**query_string):
+            resp = client.get("/timeseries/", query_string=query_string)
+            assert resp.status_code == 200
+            metadata = json.loads(resp.headers["X-Pagination"])
+            return [item["name"] for item in resp.json], metadata
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            # Offset pagination, with total count
+            names, metadata = get_page(page_size=3, page=2)
+            assert names == ["Timeseries 3", "Timeseries 4", "Timeseries 5"]
+            assert metadata["total"] == 7
+            assert metadata["next_page"] == 3
+
+            # Offset pagination, without total count
+            names, metadata = get_page(page_size=3, page=3, count="none")
+            assert names == ["Timeseries 6"]
+            assert metadata == {"page": 3, "previous_page": 2}
+
+            # Keyset pagination, sorted by id
+            names, metadata = get_page(page_size=3, count="none")
+            assert names == ["Timeseries 0", "Timeseries 1", "Timeseries 2"]
+            assert metadata == {
+                "page": 1,
+                "next_page": 2,
+                "next_cursor": metadata["next_cursor"],
+            }
+            names, metadata = get_page(page_size=3, cursor=metadata["next_cursor"])
+            assert names == ["Timeseries 3", "Timeseries 4", "Timeseries 5"]
+            assert metadata == {"total": 7, "next_cursor": metadata["next_cursor"]}
+            names, metadata = get_page(
+                page_size=3, cursor=metadata["next_cursor"], count="none"
+            )
+            assert names == ["Timeseries 6"]
+            assert metadata == {}
+
+            # Keyset pagination, sorted by name
+            all_names = []
+            cursor_args = {}
+            while True:
+                names, metadata = get_page(page_size=2, sort="-name", **cursor_args)
+                all_names.extend(names)
+                if "next_cursor" not in metadata:
+                    break
+                cursor_args = {"cursor": metadata["next_cursor"]}
+            assert all_names == [f"Timeseries {i}" for i in reversed(range(7))]
+
+            # Cursor sort order mismatch
+            _, metadata = get_page(page_size=2, sort="-name")
+            resp = client.get(
+                "/timeseries/", query_string={"cursor": metadata["next_cursor"]}
+            )
+            assert resp.status_code == 422
+            assert "cursor" in resp.json["errors"]["query"]
+
+            # Invalid cursor
+            for cursor in ("dummy", "W1siaWQiXSxbImR1bW15Il1d"):
+                resp = client.get("/timeseries/", query_string={"cursor": cursor})
+                assert resp.status_code == 422
+                assert "cursor" in resp.json["errors"]["query"]
+
+            # Page and cursor are mutually exclusive
+            resp = client.get(
+                "/timeseries/",
+                query_string={"page": 2, "cursor": metadata["next_cursor"]},
+            )
+            assert resp.status_code == 422
+
+    @pytest.mark.usefixtures("events")
+    def test_sql_cursor_page_mixed_sort(self, app, users):
+        client = app.test_client()
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            resp = client.get(
+                "/events/", query_string={"sort": "level,-timestamp", "page_size": 1}
+            )
+            assert resp.status_code == 200
+            assert resp.json[0]["level"] == "DEBUG"
+            metadata = json.loads(resp.headers["X-Pagination"])
+            resp = client.get(
+                "/events/",
+                query_string={
+                    "sort": "level,-timestamp",
+                    "page_size": 1,
+                    "cursor": metadata["next_cursor"],
+                },
+            )
+            assert resp.status_code == 200
+            assert resp.json[0]["level"] == "WARNING"
+            assert "next_cursor" not in json.loads(resp.headers["X-Pagination"])
+
+    @pytest.mark.parametrize("timeseries", (3,), indirect=True)
+    @pytest.mark.parametrize(
+        "app", (TestConfig, PlannerCountTestConfig, CacheTestConfig), indirect=True
+    )
+    def test_sql_cursor_page_estimated_count(
+        self, app, users, campaigns, campaign_scopes, timeseries
+    ):
+        client = app.test_client()
+        config = app.config
+
+        def get_metadata(**query_string):
+            resp = client.get("/timeseries/", query_string=query_string)
+            assert resp.status_code == 200
+            return json.loads(resp.headers["X-Pagination"])
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            metadata = get_metadata(count="exact")
+            assert metadata["total"] == 3
+            assert "total_estimated" not in metadata
+
+            metadata = get_metadata(count="estimate")
+            if config["CACHE_BACKEND"] is None:
+                if config["PAGINATION_COUNT_ESTIMATE_THRESHOLD"]:
+                    # Small planner estimate: exact count
+                    assert metadata["total"] == 3
+                    assert "total_estimated" not in metadata
+                else:
+                    assert metadata["total_estimated"] is True
+            else:
+                # Cache miss: exact count, stored in cache
+                assert metadata["total"] == 3
+                assert "total_estimated" not in metadata
+                metadata = get_metadata(count="estimate")
+                assert metadata["total"] == 3
+                assert metadata["total_estimated"] is True
+                # Cached count is specific to query
+                metadata = get_metadata(count="estimate", campaign_id=campaigns[0])
+                assert metadata["total"] == 2
+                assert "total_estimated" not in metadata
+                # Writes discard cached counts
+                resp = client.post(
+                    "/timeseries/",
+                    json={
+                        "name": "Timeseries 3",
+                        "campaign_id": campaigns[0],
+                        "campaign_scope_id": campaign_scopes[0],
+                    },
+                )
+                assert resp.status_code == 201
+                metadata = get_metadata(count="estimate")
+                assert metadata["total"] == 4
+                assert "total_estimated" not in metadata
+
+            resp = client.get("/timeseries/", query_string={"count": "dummy"})
+            assert resp.status_code == 422
+
+    @pytest.mark.usefixtures("sites")
+    def test_optional_pagination_and_ndjson(self, app, users):
+        client = app.test_client()
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            # No pagination parameter: all items, not paginated
+            resp = client.get("/sites/")
+            assert resp.status_code == 200
+            assert len(resp.json) == 2
+            assert "X-Pagination" not in resp.headers
+            assert resp.headers["ETag"]
+            all_items = resp.json
+
+            # Pagination parameters
+            resp = client.get("/sites/", query_string={"page_size": 1})
+            assert resp.status_code == 200
+            assert resp.json == all_items[:1]
+            metadata = json.loads(resp.headers["X-Pagination"])
+            assert metadata["total"] == 2
+            resp = client.get(
+                "/sites/", query_string={"cursor": metadata["next_cursor"]}
+            )
+            assert resp.status_code == 200
+            assert resp.json == all_items[1:]
+
+            # NDJSON
+            resp = client.get("/sites/", headers={"Accept": "application/x-ndjson"})
+            assert resp.status_code == 200
+            assert resp.mimetype == "application/x-ndjson"
+            assert resp.is_streamed
+            assert "ETag" not in resp.headers
+            lines = resp.get_data(as_text=True).splitlines()
+            assert [json.loads(line) for line in lines] == all_items
+            resp = client.get(
+                "/sites/",
+                query_string={"page_size": 1, "page": 2},
+                headers={"Accept": "application/x-ndjson"},
+            )
+            assert resp.status_code == 200
+            lines = resp.get_data(as_text=True).splitlines()
+            assert [json.loads(line) for line in lines] == all_items[1:]
+            assert json.loads(resp.headers["X-Pagination"])["total"] == 2
+
+            # Empty listing
+            resp = client.get(
+                "/sites/",
+                query_string={"name": "dummy"},
+                headers={"Accept": "application/x-ndjson"},
+            )
+            assert resp.status_code == 200
+            assert resp.get_data() == b""
+
+    @pytest.mark.usefixtures("events")
+    def test_auto_schema_generated_dump(self, app, timeseries):
+        with OpenBar():
+            for schema, model_cls in (
+                (TimeseriesSchema(many=True), model.Timeseries),
+                (EventSchema(many=True), model.Event),
+            ):
+                assert schema._get_dump_function() is not None
+                query = model_cls.get()
+                # Single items are dumped by marshmallow
+                expected = [schema.dump(item, many=False) for item in query]
+                assert expected
+                assert schema.dump(query) == expected
+                # Dump rows of projected query
+                projected = schema.project(query)
+                assert not any(isinstance(row, model_cls) for row in projected)
+                assert schema.dump(projected) == expected
+
+        # Schemas with other hooks or fields are dumped by marshmallow
+        schema = TaskByCampaignSchema(many=True)
+        assert schema._get_dump_function() is None
+        assert dumping.get_dump_function(TimeseriesSchema()) is None
+
+    @pytest.mark.parametrize("app", (FileSystemCacheTestConfig,), indirect=True)
+    def test_query_etag(self, app, users, campaigns, sites, monkeypatch):
+        client = app.test_client()
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            resp = client.get("/sites/")
+            assert resp.status_code == 200
+            etag = resp.headers["ETag"]
+            resp = client.get("/sites/", headers={"If-None-Match": etag})
+            assert resp.status_code == 304
+
+            # ETag depends on query arguments and response type
+            resp = client.get(
+                "/sites/",
+                query_string={"campaign_id": campaigns[0]},
+                headers={"If-None-Match": etag},
+            )
+            assert resp.status_code == 200
+            resp = client.get(
+                "/sites/",
+                headers={"If-None-Match": etag, "Accept": "application/x-ndjson"},
+            )
+            assert resp.status_code == 200
+            assert resp.headers["ETag"] != etag
+            resp = client.get(
+                "/sites/", query_string={"page": 1}, headers={"If-None-Match": etag}
+            )
+            assert resp.status_code == 200
+
+            # Writes renew table watermarks
+            resp = client.post(
+                "/sites/",
+                json={
+                    "name": "Site 3",
+                    "campaign_id": campaigns[0],
+                    "latitude": 43,
+                    "longitude": -1,
+                },
+            )
+            assert resp.status_code == 201
+            resp = client.get("/sites/", headers={"If-None-Match": etag})
+            assert resp.status_code == 200
+            assert len(resp.json) == 3
+            etag = resp.headers["ETag"]
+
+            # Deletes renew watermarks of tables referencing deleted table
+            resp = client.get("/site_property_data/")
+            assert resp.status_code == 200
+            spd_etag = resp.headers["ETag"]
+            resp = client.get(f"/sites/{sites[0]}")
+            resp = client.delete(
+                f"/sites/{sites[0]}", headers={"If-Match": resp.headers["ETag"]}
+            )
+            assert resp.status_code == 204
+            resp = client.get("/sites/", headers={"If-None-Match": etag})
+            assert resp.status_code == 200
+            assert len(resp.json) == 2
+            etag = resp.headers["ETag"]
+            resp = client.get(
+                "/site_property_data/", headers={"If-None-Match": spd_etag}
+            )
+            assert resp.status_code == 200
+
+            # Writes of workers renew table watermarks
+            monkeypatch.setattr(cache, "_worker_stores", None)
+            cache.init_worker(app.config)
+            with OpenBar():
+                model.Site.new(name="Site 4", campaign_id=campaigns[0])
+                db.session.commit()
+            resp = client.get("/sites/", headers={"If-None-Match": etag})
+            assert resp.status_code == 200
+            assert len(resp.json) == 3
+            etag = resp.headers["ETag"]
+
+        # ETag depends on user
+        with AuthHeader(users["Active"]["creds"]):
+            resp = client.get("/sites/", headers={"If-None-Match": etag})
+            assert resp.status_code == 200
+
+    @pytest.mark.parametrize("app", (CacheTestConfig,), indirect=True)
+    def test_query_etag_not_shared(self, app, users, sites):
+        client = app.test_client()
+
+        # Watermarks not shared with other processes: ETag computed from response
+        with AuthHeader(users["Chuck"]["creds"]):
+            with mock.patch.object(watermarks, "get_query_version") as mock_version:
+                resp = client.get("/sites/")
+                assert resp.status_code == 200
+                etag = resp.headers["ETag"]
+                resp = client.get("/sites/", headers={"If-None-Match": etag})
+                assert resp.status_code == 304
+            mock_version.assert_not_called()
@@ -5,17 +5,28 @@ import io
 
 import pytest
 
-from tests.common import AuthHeader
+from tests.common import AuthHeader, TestConfig
+
+from bemserver_api.resources.input_output import imports
 
 INPUT_OUTPUT_URL = "/io/"
 INPUT_OUTPUT_SITES_URL = f"{INPUT_OUTPUT_URL}sites"
 INPUT_OUTPUT_TIMESERIES_URL = f"{INPUT_OUTPUT_URL}timeseries"
+INPUT_OUTPUT_JOBS_URL = f"{INPUT_OUTPUT_URL}jobs/"
 BUILDINGS_URL = "/buildings/"
+BUILDING_PROPERTY_DATA_URL = "/building_property_data/"
 TIMESERIES_URL = "/timeseries/"
+TIMESERIES_BY_SPACES_URL = "/timeseries_by_spaces/"
+TIMESERIES_BY_BUILDINGS_URL = "/timeseries_by_buildings/"
+TIMESERIES_PROPERTY_DATA_URL = "/timeseries_property_data/"
 
 DUMMY_ID = "69"
 
 
+class BulkTestConfig(TestConfig):
+    IO_IMPORT_BATCH_SIZE = 2
+
+
 class TestInputOutputSites:
     @pytest.mark.parametrize("user", ("admin", "user", "anonym"))
     @pytest.mark.usefixtures("users_by_user_groups")
@@ -238,6 +249,144 @@ class TestInputOutputSites:
             ret_val = ret.json
             assert "campaign_id" in ret_val["errors"]["query"]
 
+    @pytest.mark.parametrize("app", (BulkTestConfig,), indirect=True)
+    @pytest.mark.usefixtures("site_properties")
+    @pytest.mark.usefixtures("building_properties")
+    def test_sites_csv_bulk_post(self, app, users, campaigns):
+        campaign_1_id = campaigns[0]
+
+        client = app.test_client()
+
+        sites_csv = (
+            "Name,Description,IFC_ID,Area\n"
+            "Site 1,Great site 1,,1000\n"
+            "Site 2,Great site 2,,2000\n"
+            "Site 3,Great site 3,,3000\n"
+        )
+        buildings_csv = (
+            "Name,Description,Site,IFC_ID,Area\n"
+            "Building 1,Great building 1,Site 1,,1000\n"
+            "Building 1,Great building 1,Site 2,,2000\n"
+        )
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = client.post(
+                f"{INPUT_OUTPUT_SITES_URL}/bulk",
+                query_string={"campaign_id": campaign_1_id},
+                data={
+                    "sites_csv": (io.BytesIO(sites_csv.encode()), "sites.csv"),
+                    "buildings_csv": (
+                        io.BytesIO(buildings_csv.encode()),
+                        "buildings.csv",
+                    ),
+                },
+            )
+            assert ret.status_code == 201
+            assert ret.json == {"rows": 5, "created": 5, "updated": 0}
+            ret = client.get(BUILDINGS_URL)
+            assert ret.status_code == 200
+            assert len(ret.json) == 2
+            ret = client.get(BUILDING_PROPERTY_DATA_URL)
+            assert ret.status_code == 200
+            assert sorted(x["value"] for x in ret.json) == ["1000", "2000"]
+
+            # Update
+            buildings_csv = (
+                "Name,Description,Site,IFC_ID,Area\n"
+                "Building 1,Greatest building 1,Site 2,,3000\n"
+                "Building 2,Great building 2,Site 3,,4000\n"
+            )
+            ret = client.post(
+                f"{INPUT_OUTPUT_SITES_URL}/bulk",
+                query_string={"campaign_id": campaign_1_id},
+                data={
+                    "buildings_csv": (
+                        io.BytesIO(buildings_csv.encode()),
+                        "buildings.csv",
+                    ),
+                },
+            )
+            assert ret.status_code == 201
+            assert ret.json == {"rows": 2, "created": 1, "updated": 1}
+            ret = client.get(BUILDINGS_URL, query_string={"name": "Building 1"})
+            assert sorted(x["description"] for x in ret.json) == [
+                "Great building 1",
+                "Greatest building 1",
+            ]
+            ret = client.get(BUILDING_PROPERTY_DATA_URL)
+            assert sorted(x["value"] for x in ret.json) == ["1000", "3000", "4000"]
+
+            # Error in second batch: first batch is imported
+            buildings_csv = (
+                "Name,Description,Site,IFC_ID,Area\n"
+                "Building 3,,Site 1,,\n"
+                "Building 4,,Site 1,,\n"
+                "Building 5,,Dummy,,\n"
+            )
+            ret = client.post(
+                f"{INPUT_OUTPUT_SITES_URL}/bulk",
+                query_string={"campaign_id": campaign_1_id},
+                data={
+                    "buildings_csv": (
+                        io.BytesIO(buildings_csv.encode()),
+                        "buildings.csv",
+                    ),
+                },
+            )
+            assert ret.status_code == 422
+            assert "Unknown site" in ret.json["message"]
+            assert ret.json["errors"]["report"]["rows"] == 2
+            ret = client.get(BUILDINGS_URL)
+            assert len(ret.json) == 5
+
+    @pytest.mark.parametrize("app", (BulkTestConfig,), indirect=True)
+    @pytest.mark.usefixtures("site_properties")
+    def test_sites_csv_bulk_post_errors(self, app, users, campaigns):
+        campaign_1_id = campaigns[0]
+
+        client = app.test_client()
+
+        for sites_csv in (
+            # Missing column in header
+            "Name,Description",
+            # Unknown property
+            "Name,Description,IFC_ID,Dummy\nSite 1,,,12\n",
+            # Invalid property value
+            "Name,Description,IFC_ID,Area\nSite 1,,,Dummy\n",
+        ):
+            with AuthHeader(users["Chuck"]["creds"]):
+                ret = client.post(
+                    f"{INPUT_OUTPUT_SITES_URL}/bulk",
+                    query_string={"campaign_id": campaign_1_id},
+                    data={
+                        "sites_csv": (io.BytesIO(sites_csv.encode()), "sites.csv"),
+                    },
+                )
+                assert ret.status_code == 422
+
+        # Unknown campaign
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = client.post(
+                f"{INPUT_OUTPUT_SITES_URL}/bulk",
+                query_string={"campaign_id": DUMMY_ID},
+                data={
+                    "sites_csv": (io.BytesIO(sites_csv.encode()), "sites.csv"),
+                },
+            )
+            assert ret.status_code == 422
+            assert "campaign_id" in ret.json["errors"]["query"]
+
+        # Forbidden
+        with AuthHeader(users["Active"]["creds"]):
+            ret = client.post(
+                f"{INPUT_OUTPUT_SITES_URL}/bulk",
+                query_string={"campaign_id": campaign_1_id},
+                data={
+                    "sites_csv": (io.BytesIO(sites_csv.encode()), "sites.csv"),
+                },
+            )
+            assert ret.status_code == 403
+
 
 class TestInputOutputTimeseries:
     @pytest.mark.parametrize("user", ("admin", "user", "anonym"))
@@ -456,3 +605,217 @@ class TestInputOutputTimeseries:
             assert ret.status_code == 422
             ret_val = ret.json
             assert "campaign_id" in ret_val["errors"]["query"]
+
+    @pytest.mark.parametrize("app", (BulkTestConfig,), indirect=True)
+    @pytest.mark.usefixtures("sites")
+    @pytest.mark.usefixtures("buildings")
+    @pytest.mark.usefixtures("storeys")
+    @pytest.mark.usefixtures("spaces")
+    @pytest.mark.usefixtures("zones")
+    @pytest.mark.usefixtures("campaign_scopes")
+    def test_timeseries_csv_bulk_post(self, app, users, campaigns):
+        campaign_1_id = campaigns[0]
+
+        client = app.test_client()
+
+        timeseries_csv = (
+            "Name,Description,Unit,Campaign scope,Site,Building,"
+            "Storey,Space,Zone,Min,Max\n"
+            "Space_1_Temp,Temperature,°C,Campaign 1 - Scope 1,Site 1,Building 1,"
+            "Storey 1,Space 1,Zone 1,-10,60\n"
+            "Space_2_Temp,Temperature,°C,Campaign 1 - Scope 1,Site 1,Building 1,"
+            "Storey 1,Space 1,Zone 1,-10,60\n"
+            "Space_3_Temp,Temperature,°C,Campaign 1 - Scope 1,,,,,,,\n"
+        )
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = client.post(
+                f"{INPUT_OUTPUT_TIMESERIES_URL}/bulk",
+                query_string={"campaign_id": campaign_1_id},
+                data={
+                    "timeseries_csv": (
+                        io.BytesIO(timeseries_csv.encode()),
+                        "timeseries.csv",
+                    ),
+                },
+            )
+            assert ret.status_code == 201
+            assert ret.json == {"rows": 3, "created": 3, "updated": 0}
+            ret = client.get(TIMESERIES_URL)
+            assert len(ret.json) == 3
+            ret = client.get(TIMESERIES_BY_SPACES_URL)
+            assert len(ret.json) == 2
+            ret = client.get(TIMESERIES_PROPERTY_DATA_URL)
+            assert len(ret.json) == 4
+
+            # Update: relation moved to building, properties updated
+            timeseries_csv = (
+                "Name,Description,Unit,Campaign scope,Site,Building,"
+                "Storey,Space,Zone,Min,Max\n"
+                "Space_2_Temp,Temperature 2,°C,Campaign 1 - Scope 1,Site 1,"
+                "Building 1,,,,-15,65\n"
+            )
+            ret = client.post(
+                f"{INPUT_OUTPUT_TIMESERIES_URL}/bulk",
+                query_string={"campaign_id": campaign_1_id},
+                data={
+                    "timeseries_csv": (
+                        io.BytesIO(timeseries_csv.encode()),
+                        "timeseries.csv",
+                    ),
+                },
+            )
+            assert ret.status_code == 201
+            assert ret.json == {"rows": 1, "created": 0, "updated": 1}
+            ret = client.get(TIMESERIES_URL, query_string={"name": "Space_2_Temp"})
+            ts_2 = ret.json[0]
+            assert ts_2["description"] == "Temperature 2"
+            ret = client.get(TIMESERIES_BY_SPACES_URL)
+            assert len(ret.json) == 1
+            ret = client.get(TIMESERIES_BY_BUILDINGS_URL)
+            assert [x["timeseries_id"] for x in ret.json] == [ts_2["id"]]
+            ret = client.get(
+                TIMESERIES_PROPERTY_DATA_URL, query_string={"timeseries_id": ts_2["id"]}
+            )
+            assert sorted(x["value"] for x in ret.json) == ["-15", "65"]
+
+    @pytest.mark.parametrize("app", (BulkTestConfig,), indirect=True)
+    @pytest.mark.usefixtures("sites")
+    @pytest.mark.usefixtures("campaign_scopes")
+    def test_timeseries_csv_bulk_post_errors(self, app, users, campaigns):
+        campaign_1_id = campaigns[0]
+
+        client = app.test_client()
+
+        header = "Name,Description,Unit,Campaign scope,Site,Building,Storey,Space,Zone"
+        for timeseries_csv in (
+            # Missing column in header
+            "Name,Description,Unit,Campaign scope\n",
+            # Unknown campaign scope
+            f"{header}\nTS_1,,,Dummy,,,,,\n",
+            # Unknown site
+            f"{header}\nTS_1,,,Campaign 1 - Scope 1,Dummy,,,,\n",
+            # Missing site
+            f"{header}\nTS_1,,,Campaign 1 - Scope 1,,Building 1,,,\n",
+            # Unknown unit
+            f"{header}\nTS_1,,dummy,Campaign 1 - Scope 1,,,,,\n",
+        ):
+            with AuthHeader(users["Chuck"]["creds"]):
+                ret = client.post(
+                    f"{INPUT_OUTPUT_TIMESERIES_URL}/bulk",
+                    query_string={"campaign_id": campaign_1_id},
+                    data={
+                        "timeseries_csv": (
+                            io.BytesIO(timeseries_csv.encode()),
+                            "timeseries.csv",
+                        ),
+                    },
+                )
+                assert ret.status_code == 422
+                assert ret.json["errors"]["report"]["rows"] == 0
+
+    @pytest.mark.usefixtures("campaign_scopes")
+    def test_timeseries_csv_job(self, app, users, campaigns, tmp_path, monkeypatch):
+        campaign_1_id = campaigns[0]
+
+        client = app.test_client()
+
+        timeseries_csv = (
+            "Name,Description,Unit,Campaign scope,Site,Building,"
+            "Storey,Space,Zone,Min\n"
+            "TS_1,,°C,Campaign 1 - Scope 1,,,,,,-10\n"
+            "TS_2,,°C,Campaign 1 - Scope 1,,,,,,-10\n"
+        )
+
+        def post_job():
+            return client.post(
+                f"{INPUT_OUTPUT_TIMESERIES_URL}/jobs",
+                query_string={"campaign_id": campaign_1_id},
+                data={
+                    "timeseries_csv": (
+                        io.BytesIO(timeseries_csv.encode()),
+                        "timeseries.csv",
+                    ),
+                },
+            )
+
+        # Import jobs disabled
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = post_job()
+            assert ret.status_code == 501
+
+        app.config["IO_IMPORT_DIR"] = str(tmp_path)
+        delayed = []
+        monkeypatch.setattr(
+            imports.import_task,
+            "delay",
+            lambda *args, **kwargs: delayed.append((args, kwargs)),
+        )
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = post_job()
+            assert ret.status_code == 202
+            job = ret.json
+            assert job["status"] == "pending"
+            assert job["kind"] == "timeseries"
+            job_url = f"{INPUT_OUTPUT_JOBS_URL}{job['id']}"
+
+            ret = client.get(job_url)
+            assert ret.status_code == 200
+            assert ret.json == job
+
+            # Run task
+            (args, kwargs) = delayed.pop()
+            imports.import_task.apply(args=args, kwargs=kwargs)
+
+            ret = client.get(job_url)
+            assert ret.status_code == 200
+            assert ret.json["status"] == "done"
+            assert ret.json["report"] == {"rows": 2, "created": 2, "updated": 0}
+            assert list(tmp_path.joinpath(job["id"]).iterdir()) == [
+                tmp_path / job["id"] / "job.json"
+            ]
+            ret = client.get(TIMESERIES_URL)
+            assert len(ret.json) == 2
+
+        # Other user can't access job
+        with AuthHeader(users["Active"]["creds"]):
+            ret = client.get(job_url)
+            assert ret.status_code == 403
+            ret = client.delete(job_url)
+            assert ret.status_code == 403
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            # Unknown or invalid job ID
+            for job_id in ("dummy", "0" * 32):
+                ret = client.get(f"{INPUT_OUTPUT_JOBS_URL}{job_id}")
+                assert ret.status_code == 404
+
+            ret = client.delete(job_url)
+            assert ret.status_code == 204
+            ret = client.get(job_url)
+            assert ret.status_code == 404
+
+            # Failed job
+            timeseries_csv = timeseries_csv.replace("°C", "dummy")
+            ret = post_job()
+            assert ret.status_code == 202
+            job_url = f"{INPUT_OUTPUT_JOBS_URL}{ret.json['id']}"
+            (args, kwargs) = delayed.pop()
+            imports.import_task.apply(args=args, kwargs=kwargs)
+            ret = client.get(job_url)
+            assert ret.json["status"] == "failed"
+            assert ret.json["message"]
+            assert ret.json["report"]["rows"] == 0
+
+            # Expired jobs are deleted when a job is started, pending jobs are kept
+            app.config["IO_IMPORT_RETENTION"] = 0
+            ret = post_job()
+            assert ret.status_code == 202
+            pending_job_url = f"{INPUT_OUTPUT_JOBS_URL}{ret.json['id']}"
+            ret = post_job()
+            assert ret.status_code == 202
+            ret = client.get(job_url)
+            assert ret.status_code == 404
+            ret = client.get(pending_job_url)
+            assert ret.status_code == 200
@@ -0,0 +1,112 @@
+"""Metrics routes tests"""
+
+import pytest
+
+from tests.common import AuthHeader, TestConfig
+
+METRICS_URL = "/metrics/"
+
+
+class MetricsTestConfig(TestConfig):
+    METRICS = True
+    CACHE_BACKEND = "memory"
+    AUTH_USER_CACHE_TTL = 60
+
+
+class InstrumentedMetricsTestConfig(MetricsTestConfig):
+    INSTRUMENTATION = True
+
+
+class TestMetricsApi:
+    @pytest.mark.parametrize("app", (MetricsTestConfig,), indirect=True)
+    def test_metrics_api(self, app, users, timeseries):
+        ts_1_id = timeseries[0]
+        client = app.test_client()
+
+        ret = client.get("/about/")
+        assert ret.status_code == 200
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = client.post(
+                "/timeseries_data/",
+                query_string={"data_state": 1},
+                json={
+                    str(ts_1_id): {
+                        "2020-01-01T00:00:00+00:00": 12,
+                        "2020-01-01T01:00:00+00:00": 42,
+                    }
+                },
+            )
+            assert ret.status_code == 201
+            # Duplicate points are not inserted
+            ret = client.post(
+                "/timeseries_data/",
+                query_string={"data_state": 1},
+                json={
+                    str(ts_1_id): {
+                        "2020-01-01T01:00:00+00:00": 42,
+                        "2020-01-01T02:00:00+00:00": 69,
+                    }
+                },
+            )
+            assert ret.status_code == 201
+
+        ret = client.get(METRICS_URL)
+        assert ret.status_code == 200
+        assert ret.mimetype == "text/plain"
+        lines = ret.data.decode("utf-8").splitlines()
+
+        labels = 'blueprint="About",endpoint="About.about"'
+        assert (
+            f'bemserver_api_requests_total{{{labels},method="GET",status="200"}} 1'
+        ) in lines
+        assert (
+            f'bemserver_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1'
+        ) in lines
+        assert f"bemserver_api_request_duration_seconds_count{{{labels}}} 1" in lines
+        assert any(
+            line.startswith(f"bemserver_api_response_size_bytes_sum{{{labels}}} ")
+            for line in lines
+        )
+        # Metrics request is being processed
+        assert "bemserver_api_requests_in_flight 1" in lines
+        assert (
+            "bemserver_api_timeseries_data_points_total"
+            '{endpoint="TimeseriesData.post"} 3'
+        ) in lines
+        assert 'bemserver_api_cache_misses_total{cache="user"} 1' in lines
+        assert any(line.startswith("# TYPE bemserver_api_db_pool") for line in lines)
+        # Instrumentation disabled
+        assert not any("bemserver_api_db_queries_total" in line for line in lines)
+
+    @pytest.mark.parametrize("app", (InstrumentedMetricsTestConfig,), indirect=True)
+    def test_metrics_api_instrumentation(self, app, users):
+        client = app.test_client()
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = client.get("/users/")
+            assert ret.status_code == 200
+
+        ret = client.get(METRICS_URL)
+        assert ret.status_code == 200
+        lines = ret.data.decode("utf-8").splitlines()
+
+        assert "# TYPE bemserver_api_db_queries_total counter" in lines
+        endpoint = 'endpoint="User.UserViews"'
+        assert any(
+            line.startswith(f"bemserver_api_db_queries_total{{{endpoint}}} ")
+            and int(line.split()[-1]) > 0
+            for line in lines
+        )
+        for step in ("db", "auth", "serialization"):
+            labels = f'{endpoint},step="{step}"'
+            assert any(
+                line.startswith(
+                    f"bemserver_api_request_step_seconds_total{{{labels}}} "
+                )
+                for line in lines
+            )
+
+    def test_metrics_api_disabled(self, app):
+        client = app.test_client()
+        ret = client.get(METRICS_URL)
+        assert ret.status_code == 404
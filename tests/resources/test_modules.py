@@ -0,0 +1,36 @@
+"""Resource modules registration tests"""
+
+import pytest
+
+from tests.common import TestConfig
+
+import bemserver_api
+
+
+class IngestionTestConfig(TestConfig):
+    API_MODULES = ["timeseries", "timeseries_data"]
+
+
+class UnknownModuleTestConfig(TestConfig):
+    API_MODULES = ["timeseries", "dummy"]
+
+
+class TestModules:
+    @pytest.mark.parametrize("app", (IngestionTestConfig,), indirect=True)
+    def test_api_modules(self, app):
+        blueprints = set(app.blueprints)
+        assert {"About", "Timeseries", "TimeseriesData"} <= blueprints
+        assert "Site" not in blueprints
+        assert "Event" not in blueprints
+
+        client = app.test_client()
+        assert client.get("/about/").status_code == 200
+        assert client.get("/sites/").status_code == 404
+        spec = client.get("/api-spec.json").json
+        assert "/timeseries/" in spec["paths"]
+        assert "/sites/" not in spec["paths"]
+
+    def test_api_modules_unknown(self, monkeypatch):
+        monkeypatch.setattr(bemserver_api.settings, "Config", UnknownModuleTestConfig)
+        with pytest.raises(ValueError, match="Unknown API modules: dummy"):
+            bemserver_api.create_app()
@@ -1,9 +1,14 @@
 """Spaces routes tests"""
 
+from unittest import mock
+
 import pytest
 
 from tests.common import AuthHeader
 
+from bemserver_core.authorization import auth_mgr
+from bemserver_core.model import Space
+
 DUMMY_ID = "69"
 
 SPACES_URL = "/spaces/"
@@ -251,3 +256,90 @@ class TestSpacesApi:
         )
         # ETag is wrong but we get rejected before ETag check anyway
         assert ret.status_code == 401
+
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    def test_spaces_bulk_api(self, app, users, storeys, spaces):
+        storey_1_id = storeys[0]
+        storey_2_id = storeys[1]
+
+        client = app.test_client()
+
+        # Allow user to create spaces in storey 1
+        create_rule = auth_mgr._rules["create"]
+
+        def authorize_create(actor, item):
+            if isinstance(item, Space) and item.storey_id == storey_1_id:
+                return True
+            return create_rule(actor, item)
+
+        with AuthHeader(users["Active"]["creds"]):
+            # POST with errors: valid items are created
+            with mock.patch.dict(auth_mgr._rules, {"create": authorize_create}):
+                ret = client.post(
+                    f"{SPACES_URL}bulk",
+                    json=[
+                        {"name": "Space 3", "storey_id": storey_1_id},
+                        {"name": "Space 1", "storey_id": storey_1_id},
+                        {"name": "Space 4", "storey_id": storey_2_id},
+                    ],
+                )
+            assert ret.status_code == 200
+            ret_val = ret.json
+            assert [res["status"] for res in ret_val] == [201, 409, 403]
+            assert ret_val[0]["item"]["name"] == "Space 3"
+            assert ret_val[1] == {
+                "status": 409,
+                "message": "Unique constraint violation",
+            }
+            assert ret_val[2] == {"status": 403, "message": "Authorization error"}
+            space_3_id = ret_val[0]["id"]
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = client.get(SPACES_URL)
+            assert sorted(space["name"] for space in ret.json) == [
+                "Space 1",
+                "Space 2",
+                "Space 3",
+            ]
+
+            # PUT
+            ret = client.put(
+                f"{SPACES_URL}bulk",
+                json=[
+                    {"id": space_3_id, "name": "Space 1"},
+                    {"id": space_3_id, "name": "Space 5"},
+                    {"id": DUMMY_ID, "name": "Space 6"},
+                ],
+            )
+            assert ret.status_code == 200
+            assert [res["status"] for res in ret.json] == [409, 200, 404]
+            ret = client.get(f"{SPACES_URL}{space_3_id}")
+            assert ret.json["name"] == "Space 5"
+
+            # DELETE
+            ret = client.delete(
+                f"{SPACES_URL}bulk", json={"ids": [space_3_id, DUMMY_ID]}
+            )
+            assert ret.status_code == 200
+            assert ret.json == [
+                {"status": 204, "id": space_3_id},
+                {"status": 404, "id": int(DUMMY_ID), "message": "Not Found"},
+            ]
+
+            # Too many items
+            app.config["BULK_MAX_ITEMS"] = 1
+            new_items = [
+                {"name": f"Space {i}", "storey_id": storey_1_id} for i in (7, 8)
+            ]
+            ret = client.post(f"{SPACES_URL}bulk", json=new_items)
+            assert ret.status_code == 422
+            ret = client.post(f"{SPACES_URL}bulk", json=new_items[:1])
+            assert ret.status_code == 200
+            ret = client.put(
+                f"{SPACES_URL}bulk",
+                json=[{"id": spaces[0], "name": "Space 1"}] * 2,
+            )
+            assert ret.status_code == 422
+            ret = client.delete(f"{SPACES_URL}bulk", json={"ids": list(spaces)})
+            assert ret.status_code == 422
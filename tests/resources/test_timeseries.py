@@ -162,6 +162,110 @@ class TestTimeseriesApi:
             ret = client.get(f"{TIMESERIES_URL}{timeseries_1_id}")
             assert ret.status_code == 404
 
+    def test_timeseries_bulk_api(self, app, users, campaigns, campaign_scopes):
+        creds = users["Chuck"]["creds"]
+        campaign_1_id = campaigns[0]
+        cs_1_id = campaign_scopes[0]
+
+        client = app.test_client()
+
+        with AuthHeader(creds):
+            n_ts = len(client.get(TIMESERIES_URL).json)
+
+            # POST
+            timeseries = [
+                {
+                    "name": f"Bulk timeseries {i}",
+                    "campaign_id": campaign_1_id,
+                    "campaign_scope_id": cs_1_id,
+                }
+                for i in range(3)
+            ]
+            ret = client.post(f"{TIMESERIES_URL}bulk", json=timeseries)
+            assert ret.status_code == 200
+            ret_val = ret.json
+            assert [res["status"] for res in ret_val] == [201, 201, 201]
+            assert [res["item"]["name"] for res in ret_val] == [
+                "Bulk timeseries 0",
+                "Bulk timeseries 1",
+                "Bulk timeseries 2",
+            ]
+            assert all(res["id"] == res["item"]["id"] for res in ret_val)
+            ts_ids = [res["id"] for res in ret_val]
+
+            # POST with errors: valid items are created
+            timeseries = [
+                {
+                    "name": name,
+                    "campaign_id": campaign_1_id,
+                    "campaign_scope_id": cs_1_id,
+                }
+                for name in (
+                    "Bulk timeseries 3",
+                    "Bulk timeseries 0",
+                    "Bulk timeseries 4",
+                )
+            ]
+            ret = client.post(f"{TIMESERIES_URL}bulk", json=timeseries)
+            assert ret.status_code == 200
+            ret_val = ret.json
+            assert [res["status"] for res in ret_val] == [201, 409, 201]
+            assert ret_val[1] == {
+                "status": 409,
+                "message": "Unique constraint violation",
+            }
+            ts_ids.extend([ret_val[0]["id"], ret_val[2]["id"]])
+            ret = client.get(TIMESERIES_URL)
+            assert len(ret.json) == n_ts + 5
+
+            # POST invalid payload
+            ret = client.post(f"{TIMESERIES_URL}bulk", json=[{"name": "Dummy"}])
+            assert ret.status_code == 422
+
+            # PUT
+            ret = client.put(
+                f"{TIMESERIES_URL}bulk",
+                json=[
+                    {"id": ts_ids[0], "name": "Bulk timeseries 0", "unit_symbol": "°C"},
+                    {"id": ts_ids[1], "name": "Bulk timeseries 2"},
+                    {"id": DUMMY_ID, "name": "Bulk timeseries 5"},
+                ],
+            )
+            assert ret.status_code == 200
+            ret_val = ret.json
+            assert [res["status"] for res in ret_val] == [200, 409, 404]
+            assert ret_val[0]["item"]["unit_symbol"] == "°C"
+            assert ret_val[2] == {
+                "status": 404,
+                "id": int(DUMMY_ID),
+                "message": "Not Found",
+            }
+            ret = client.get(f"{TIMESERIES_URL}{ts_ids[0]}")
+            assert ret.json["unit_symbol"] == "°C"
+            ret = client.get(f"{TIMESERIES_URL}{ts_ids[1]}")
+            assert ret.json["name"] == "Bulk timeseries 1"
+
+            # DELETE
+            ret = client.delete(
+                f"{TIMESERIES_URL}bulk", json={"ids": [*ts_ids[:2], DUMMY_ID]}
+            )
+            assert ret.status_code == 200
+            assert ret.json == [
+                {"status": 204, "id": ts_ids[0]},
+                {"status": 204, "id": ts_ids[1]},
+                {"status": 404, "id": int(DUMMY_ID), "message": "Not Found"},
+            ]
+            ret = client.get(TIMESERIES_URL)
+            assert len(ret.json) == n_ts + 3
+
+        with AuthHeader(users["Active"]["creds"]):
+            ret = client.post(f"{TIMESERIES_URL}bulk", json=timeseries[:1])
+            assert ret.status_code == 200
+            assert ret.json == [{"status": 403, "message": "Authorization error"}]
+            ret = client.delete(f"{TIMESERIES_URL}bulk", json={"ids": ts_ids[2:3]})
+            assert ret.status_code == 200
+            assert ret.json[0]["status"] in (403, 404)
+
     @pytest.mark.usefixtures("timeseries_properties")
     @pytest.mark.usefixtures("timeseries_property_data")
     def test_timeseries_filter_by_properties_data_api(self, app, users):
@@ -1,9 +1,14 @@
 """Timeseries by sites routes tests"""
 
+from unittest import mock
+
 import pytest
 
 from tests.common import AuthHeader
 
+from bemserver_core.authorization import auth_mgr
+from bemserver_core.model import TimeseriesBySite
+
 DUMMY_ID = "69"
 
 TIMESERIES_BY_SITES_URL = "/timeseries_by_sites/"
@@ -178,3 +183,71 @@ class TestTimeseriesBySiteApi:
         # DELETE
         ret = client.delete(f"{TIMESERIES_BY_SITES_URL}{tbs_1_id}")
         assert ret.status_code == 401
+
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
+    def test_timeseries_by_sites_bulk_api(
+        self, app, users, sites, timeseries, timeseries_by_sites
+    ):
+        site_1_id = sites[0]
+        site_2_id = sites[1]
+        ts_1_id = timeseries[0]
+        ts_2_id = timeseries[1]
+
+        client = app.test_client()
+
+        # Allow user to associate timeseries to site 1
+        create_rule = auth_mgr._rules["create"]
+
+        def authorize_create(actor, item):
+            if isinstance(item, TimeseriesBySite) and item.site_id == site_1_id:
+                return True
+            return create_rule(actor, item)
+
+        with AuthHeader(users["Active"]["creds"]):
+            # POST with errors: valid items are created
+            with mock.patch.dict(auth_mgr._rules, {"create": authorize_create}):
+                ret = client.post(
+                    f"{TIMESERIES_BY_SITES_URL}bulk",
+                    json=[
+                        {"site_id": site_1_id, "timeseries_id": ts_2_id},
+                        {"site_id": site_1_id, "timeseries_id": ts_1_id},
+                        {"site_id": site_2_id, "timeseries_id": ts_1_id},
+                    ],
+                )
+            assert ret.status_code == 200
+            ret_val = ret.json
+            assert [res["status"] for res in ret_val] == [201, 409, 403]
+            assert ret_val[0]["item"]["site"]["name"] == "Site 1"
+            assert ret_val[1] == {
+                "status": 409,
+                "message": "Unique constraint violation",
+            }
+            assert ret_val[2] == {"status": 403, "message": "Authorization error"}
+            tbs_3_id = ret_val[0]["id"]
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = client.get(TIMESERIES_BY_SITES_URL)
+            assert len(ret.json) == 3
+
+            # DELETE
+            ret = client.delete(
+                f"{TIMESERIES_BY_SITES_URL}bulk",
+                json={"ids": [tbs_3_id, DUMMY_ID, timeseries_by_sites[1]]},
+            )
+            assert ret.status_code == 200
+            assert [res["status"] for res in ret.json] == [204, 404, 204]
+            ret = client.get(TIMESERIES_BY_SITES_URL)
+            assert [tbs["id"] for tbs in ret.json] == [timeseries_by_sites[0]]
+
+            # Too many items
+            app.config["BULK_MAX_ITEMS"] = 1
+            ret = client.post(
+                f"{TIMESERIES_BY_SITES_URL}bulk",
+                json=[
+                    {"site_id": site_2_id, "timeseries_id": ts_1_id},
+                    {"site_id": site_2_id, "timeseries_id": ts_2_id},
+                ],
+            )
+            assert ret.status_code == 422
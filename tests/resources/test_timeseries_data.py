@@ -2,20 +2,52 @@
 
 import contextlib
 import datetime as dt
+import gzip
+import json
+from unittest import mock
 
 import pytest
 
-from tests.common import AuthHeader
+import pandas as pd
 
-from bemserver_core.authorization import OpenBar
-from bemserver_core.model import Timeseries
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tests.common import AuthHeader, TestConfig
+
+from bemserver_core.authorization import OpenBar, auth_mgr
+from bemserver_core.input_output import tsdcsvio, tsdio, tsdjsonio
+from bemserver_core.model import Timeseries, TimeseriesDataState
 
 from bemserver_api.database import db
+from bemserver_api.extensions.cache import cache
+from bemserver_api.resources.timeseries_data import (
+    exports,
+    ingestion,
+    rollups,
+    streaming,
+)
 
 TIMESERIES_DATA_URL = "/timeseries_data/"
 DUMMY_ID = "69"
 
 
+class CacheTestConfig(TestConfig):
+    CACHE_BACKEND = "memory"
+
+
+class FileSystemCacheTestConfig(TestConfig):
+    CACHE_BACKEND = "filesystem"
+
+
+class RollupsTestConfig(TestConfig):
+    CACHE_BACKEND = "memory"
+    TIMESERIES_DATA_ROLLUPS = True
+
+
+class BatchThreadsTestConfig(TestConfig):
+    TIMESERIES_DATA_BATCH_MAX_WORKERS = 4
+
+
 class TestTimeseriesDataApi:
     @pytest.mark.parametrize("user", ("admin", "user", "anonym"))
     @pytest.mark.usefixtures("users_by_user_groups")
@@ -425,6 +457,384 @@ class TestTimeseriesDataApi:
             else:
                 assert ret.status_code == 422
 
+    @pytest.mark.parametrize("user", ("admin", "user"))
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
+    @pytest.mark.parametrize("for_campaign", (True, False))
+    @pytest.mark.parametrize("mime_type", ("application/json", "text/csv"))
+    def test_timeseries_data_get_stream(
+        self,
+        app,
+        user,
+        users,
+        campaigns,
+        timeseries,
+        timeseries_data,
+        for_campaign,
+        mime_type,
+    ):
+        start_time, end_time = timeseries_data
+        ts_1_id = timeseries[0]
+        ts_2_id = timeseries[1]
+        campaign_1_id = campaigns[0]
+        campaign_2_id = campaigns[1]
+        ds_id = 1
+
+        # Use chunks not aligned on data timestamps, with data spanning 3 chunks
+        app.config["TIMESERIES_DATA_STREAM_CHUNK_SIZE"] = 60 * 90
+
+        with OpenBar():
+            Timeseries.get_by_id(ts_1_id).unit_symbol = "m"
+            db.session.commit()
+
+        if user == "admin":
+            creds = users["Chuck"]["creds"]
+        else:
+            creds = users["Active"]["creds"]
+
+        client = app.test_client()
+
+        with AuthHeader(creds):
+            if not for_campaign:
+                query_url = TIMESERIES_DATA_URL
+                ts_l = (ts_1_id,)
+            else:
+                query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_1_id}/"
+                ts_l = (f"Timeseries {ts_1_id - 1}",)
+
+            for query_string in (
+                {
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                },
+                {
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "timezone": "Europe/Paris",
+                    "convert_to": ("mm",),
+                },
+                # Window with no data
+                {
+                    "start_time": end_time.isoformat(),
+                    "end_time": (end_time + dt.timedelta(days=1)).isoformat(),
+                },
+                # Empty window
+                {
+                    "start_time": start_time.isoformat(),
+                    "end_time": start_time.isoformat(),
+                },
+            ):
+                query_string = {
+                    **query_string,
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                }
+                ret = client.get(
+                    query_url,
+                    query_string=query_string,
+                    headers={"Accept": mime_type},
+                )
+                assert ret.status_code == 200
+                ret_stream = client.get(
+                    query_url,
+                    query_string={**query_string, "stream": True},
+                    headers={"Accept": mime_type},
+                )
+                assert ret_stream.status_code == 200
+                assert ret_stream.is_streamed
+                assert ret_stream.mimetype == mime_type
+                assert ret_stream.data == ret.data
+
+            # First chunk is sent once first window is read
+            query_string = {
+                "start_time": start_time.isoformat(),
+                "end_time": end_time.isoformat(),
+                "timeseries": ts_l,
+                "data_state": ds_id,
+            }
+            ret = client.get(
+                query_url, query_string=query_string, headers={"Accept": mime_type}
+            )
+            with mock.patch.object(
+                streaming.tsdio,
+                "get_timeseries_data",
+                wraps=streaming.tsdio.get_timeseries_data,
+            ) as mock_get:
+                with contextlib.closing(
+                    client.get(
+                        query_url,
+                        query_string={**query_string, "stream": True},
+                        headers={"Accept": mime_type},
+                        buffered=False,
+                    )
+                ) as ret_stream:
+                    # Permission check and first window
+                    assert mock_get.call_count == 2
+                    assert b"".join(ret_stream.response) == ret.data
+                    assert mock_get.call_count == 4
+
+            # Conversions: incompatible convert_to unit
+            ret = client.get(
+                query_url,
+                query_string={
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                    "convert_to": ("Wh",),
+                    "stream": True,
+                },
+                headers={"Accept": mime_type},
+            )
+            assert ret.status_code == 422
+
+            # User not in Timeseries group
+            if not for_campaign:
+                query_url = TIMESERIES_DATA_URL
+                ts_l = (ts_2_id,)
+            else:
+                query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_2_id}/"
+                ts_l = (f"Timeseries {ts_2_id - 1}",)
+
+            ret = client.get(
+                query_url,
+                query_string={
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                    "stream": True,
+                },
+                headers={"Accept": mime_type},
+            )
+            if user == "user":
+                assert ret.status_code == 403
+            else:
+                assert ret.status_code == 200
+
+            # Several timeseries, some without data
+            if not for_campaign:
+                ts_l = (ts_1_id, ts_2_id)
+                query_string = {
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                }
+                ret = client.get(
+                    query_url,
+                    query_string=query_string,
+                    headers={"Accept": mime_type},
+                )
+                ret_stream = client.get(
+                    query_url,
+                    query_string={**query_string, "stream": True},
+                    headers={"Accept": mime_type},
+                )
+                if user == "user":
+                    assert ret.status_code == 403
+                    assert ret_stream.status_code == 403
+                else:
+                    assert ret.status_code == 200
+                    assert ret_stream.status_code == 200
+                    assert ret_stream.data == ret.data
+
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
+    @pytest.mark.parametrize(
+        "mime_type",
+        ("application/json", "text/csv", "application/vnd.apache.arrow.stream"),
+    )
+    def test_timeseries_data_get_stream_errors_on_next_timeseries(
+        self, app, users, campaigns, campaign_scopes, timeseries, mime_type
+    ):
+        """Errors on any timeseries are returned before streaming"""
+        ts_1_id = timeseries[0]
+        ds_id = 1
+
+        app.config["TIMESERIES_DATA_STREAM_CHUNK_SIZE"] = 60 * 90
+
+        with OpenBar():
+            ts_1 = Timeseries.get_by_id(ts_1_id)
+            ts_1.unit_symbol = "m"
+            ts_3 = Timeseries.new(
+                name="Timeseries 3",
+                campaign_id=campaigns[0],
+                campaign_scope_id=campaign_scopes[0],
+                unit_symbol="m",
+            )
+            db.session.commit()
+            ts_3_id = ts_3.id
+
+        query_string = {
+            "start_time": "2020-01-01T00:00:00+00:00",
+            "end_time": "2020-01-02T00:00:00+00:00",
+            "timeseries": (ts_1_id, ts_3_id),
+            "data_state": ds_id,
+            "stream": True,
+        }
+
+        client = app.test_client()
+
+        with AuthHeader(users["Active"]["creds"]):
+            ret = client.get(
+                TIMESERIES_DATA_URL,
+                query_string=query_string,
+                headers={"Accept": mime_type},
+            )
+            assert ret.status_code == 200
+
+            # Second timeseries data not readable
+            read_ts_data_rule = auth_mgr._rules["read_ts_data"]
+
+            def authorize_read_ts_data(actor, ts):
+                return ts.id != ts_3_id and read_ts_data_rule(actor, ts)
+
+            with mock.patch.dict(
+                auth_mgr._rules, {"read_ts_data": authorize_read_ts_data}
+            ):
+                ret = client.get(
+                    TIMESERIES_DATA_URL,
+                    query_string=query_string,
+                    headers={"Accept": mime_type},
+                )
+            assert ret.status_code == 403
+
+            # Incompatible convert_to unit for second timeseries
+            ret = client.get(
+                TIMESERIES_DATA_URL,
+                query_string={**query_string, "convert_to": ("mm", "Wh")},
+                headers={"Accept": mime_type},
+            )
+            assert ret.status_code == 422
+
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
+    @pytest.mark.parametrize("for_campaign", (True, False))
+    @pytest.mark.parametrize(
+        "mime_type",
+        ("application/vnd.apache.arrow.stream", "application/vnd.apache.parquet"),
+    )
+    @pytest.mark.parametrize("stream", (True, False))
+    def test_timeseries_data_get_columnar(
+        self,
+        app,
+        users,
+        campaigns,
+        timeseries,
+        timeseries_data,
+        for_campaign,
+        mime_type,
+        stream,
+    ):
+        start_time, end_time = timeseries_data
+        ts_1_id = timeseries[0]
+        ts_2_id = timeseries[1]
+        campaign_1_id = campaigns[0]
+        campaign_2_id = campaigns[1]
+        ds_id = 1
+
+        app.config["TIMESERIES_DATA_STREAM_CHUNK_SIZE"] = 60 * 90
+
+        def read_payload(data):
+            if mime_type == "application/vnd.apache.parquet":
+                return pq.read_table(pa.BufferReader(data)).to_pandas()
+            return pa.ipc.open_stream(data).read_pandas()
+
+        client = app.test_client()
+
+        with AuthHeader(users["Active"]["creds"]):
+            if not for_campaign:
+                query_url = TIMESERIES_DATA_URL
+                ts_l = (ts_1_id,)
+            else:
+                query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_1_id}/"
+                ts_l = (f"Timeseries {ts_1_id - 1}",)
+
+            ret = client.get(
+                query_url,
+                query_string={
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                    "timezone": "Europe/Paris",
+                    "stream": stream,
+                },
+                headers={"Accept": mime_type},
+            )
+            assert ret.status_code == 200
+            assert ret.mimetype == mime_type
+            data_df = read_payload(ret.data)
+            assert list(data_df.columns) == [str(ts_l[0])]
+            assert data_df.index.name == "Datetime"
+            assert str(data_df.index.tz) == "Europe/Paris"
+            assert list(data_df.index) == [
+                start_time + dt.timedelta(hours=i) for i in range(4)
+            ]
+            assert list(data_df[str(ts_l[0])]) == [0.0, 1.0, 2.0, 3.0]
+
+            # Window with no data
+            ret = client.get(
+                query_url,
+                query_string={
+                    "start_time": end_time.isoformat(),
+                    "end_time": (end_time + dt.timedelta(days=1)).isoformat(),
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                    "stream": stream,
+                },
+                headers={"Accept": mime_type},
+            )
+            assert ret.status_code == 200
+            data_df = read_payload(ret.data)
+            assert list(data_df.columns) == [str(ts_l[0])]
+            assert data_df.empty
+
+            ret = client.get(
+                f"{query_url}aggregate",
+                query_string={
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                    "bucket_width_value": 1,
+                    "bucket_width_unit": "day",
+                    "aggregation": "count",
+                },
+                headers={"Accept": mime_type},
+            )
+            assert ret.status_code == 200
+            assert ret.mimetype == mime_type
+            data_df = read_payload(ret.data)
+            assert list(data_df.index) == [start_time]
+            assert data_df[str(ts_l[0])].dtype == "int64"
+            assert list(data_df[str(ts_l[0])]) == [4]
+
+            # User not in Timeseries group
+            if not for_campaign:
+                query_url = TIMESERIES_DATA_URL
+                ts_l = (ts_2_id,)
+            else:
+                query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_2_id}/"
+                ts_l = (f"Timeseries {ts_2_id - 1}",)
+
+            ret = client.get(
+                query_url,
+                query_string={
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                    "stream": stream,
+                },
+                headers={"Accept": mime_type},
+            )
+            assert ret.status_code == 403
+
     @pytest.mark.parametrize("user", ("admin", "user", "anonym"))
     @pytest.mark.usefixtures("users_by_user_groups")
     @pytest.mark.usefixtures("user_groups_by_campaigns")
@@ -849,24 +1259,710 @@ class TestTimeseriesDataApi:
             )
             assert ret.status_code == 422
 
-    @pytest.mark.parametrize("user", ("admin", "user", "anonym"))
+    @pytest.mark.parametrize("app", (CacheTestConfig,), indirect=True)
     @pytest.mark.usefixtures("users_by_user_groups")
     @pytest.mark.usefixtures("user_groups_by_campaigns")
     @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
     @pytest.mark.parametrize("for_campaign", (True, False))
     @pytest.mark.parametrize("mime_type", ("application/json", "text/csv"))
-    def test_timeseries_data_post(
-        self, app, user, users, campaigns, timeseries, for_campaign, mime_type
+    def test_timeseries_data_get_aggregate_cache(
+        self,
+        app,
+        users,
+        campaigns,
+        timeseries,
+        timeseries_data,
+        for_campaign,
+        mime_type,
     ):
+        start_time, end_time = timeseries_data
         ts_1_id = timeseries[0]
         ts_2_id = timeseries[1]
         campaign_1_id = campaigns[0]
         campaign_2_id = campaigns[1]
         ds_id = 1
 
-        if user == "admin":
-            creds = users["Chuck"]["creds"]
-            auth_context = AuthHeader(creds)
+        cache = app.extensions["cache"]["responses"]
+
+        client = app.test_client()
+
+        def get_aggregate(query_url, ts_l):
+            return client.get(
+                f"{query_url}aggregate",
+                query_string={
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                    "bucket_width_value": 1,
+                    "bucket_width_unit": "day",
+                    "aggregation": "count",
+                },
+                headers={"Accept": mime_type},
+            )
+
+        def get_count(ret):
+            if mime_type == "text/csv":
+                return int(ret.data.decode("utf-8").splitlines()[1].split(",")[1])
+            return next(iter(ret.json[str(ts_l[0])].values()))
+
+        if not for_campaign:
+            query_url = TIMESERIES_DATA_URL
+            ts_l = (ts_1_id,)
+        else:
+            query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_1_id}/"
+            ts_l = (f"Timeseries {ts_1_id - 1}",)
+
+        with AuthHeader(users["Active"]["creds"]):
+            ret = get_aggregate(query_url, ts_l)
+            assert ret.status_code == 200
+            assert get_count(ret) == 4
+            assert cache.hits == 0
+            ret_2 = get_aggregate(query_url, ts_l)
+            assert ret_2.status_code == 200
+            assert ret_2.data == ret.data
+            assert cache.hits == 1
+
+            # POST invalidates cache
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id},
+                json={str(ts_l[0]): {"2020-01-01T00:30:00+00:00": 0}},
+            )
+            assert ret.status_code == 201
+            ret = get_aggregate(query_url, ts_l)
+            assert get_count(ret) == 5
+
+            # Streamed POST invalidates cache
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id, "stream": True},
+                json={str(ts_l[0]): {"2020-01-01T01:30:00+00:00": 0}},
+            )
+            assert ret.status_code == 200
+            ret = get_aggregate(query_url, ts_l)
+            assert get_count(ret) == 6
+
+            # DELETE invalidates cache
+            ret = client.delete(
+                query_url,
+                query_string={
+                    "start_time": start_time.isoformat(),
+                    "end_time": (start_time + dt.timedelta(hours=1)).isoformat(),
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                },
+            )
+            assert ret.status_code == 204
+            ret = get_aggregate(query_url, ts_l)
+            assert get_count(ret) == 4
+
+        # Permissions are checked on cached responses
+        if not for_campaign:
+            query_url = TIMESERIES_DATA_URL
+            ts_l = (ts_2_id,)
+        else:
+            query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_2_id}/"
+            ts_l = (f"Timeseries {ts_2_id - 1}",)
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = get_aggregate(query_url, ts_l)
+            assert ret.status_code == 200
+        with AuthHeader(users["Active"]["creds"]):
+            ret = get_aggregate(query_url, ts_l)
+            assert ret.status_code == 403
+
+    @pytest.mark.parametrize("app", (RollupsTestConfig,), indirect=True)
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
+    @pytest.mark.usefixtures("timeseries_by_data_states")
+    def test_timeseries_data_get_aggregate_rollups(self, app, users, timeseries):
+        ts_1_id = timeseries[0]
+        ts_2_id = timeseries[1]
+        ds_id = 1
+        start_time = dt.datetime(2019, 11, 25, 3, tzinfo=dt.UTC)
+        end_time = dt.datetime(2020, 4, 2, tzinfo=dt.UTC)
+
+        client = app.test_client()
+
+        def post_data(ts_id, step, nb_tsd):
+            csv_data = f"Datetime,{ts_id}\n" + "".join(
+                f"{(dt.datetime(2019, 11, 20, tzinfo=dt.UTC) + step * i).isoformat()},"
+                f"{i % 17}\n"
+                for i in range(nb_tsd)
+            )
+            ret = client.post(
+                TIMESERIES_DATA_URL,
+                query_string={"data_state": ds_id},
+                data=csv_data,
+                headers={"Content-Type": "text/csv"},
+            )
+            assert ret.status_code == 201
+
+        def check_aggregate(ts_l, width_value, width_unit, aggregation, timezone):
+            query_string = {
+                "start_time": start_time.isoformat(),
+                "end_time": end_time.isoformat(),
+                "timeseries": ts_l,
+                "data_state": ds_id,
+                "bucket_width_value": width_value,
+                "bucket_width_unit": width_unit,
+                "aggregation": aggregation,
+                "timezone": timezone,
+            }
+            with OpenBar():
+                bucket_args = (
+                    start_time,
+                    end_time,
+                    [Timeseries.get_by_id(ts_id) for ts_id in ts_l],
+                    TimeseriesDataState.get_by_id(ds_id),
+                    width_value,
+                    width_unit,
+                    aggregation,
+                )
+                expected_json = tsdjsonio.export_json_bucket(
+                    *bucket_args, timezone=timezone
+                )
+                expected_csv = tsdcsvio.export_csv_bucket(
+                    *bucket_args, timezone=timezone
+                )
+            ret = client.get(
+                f"{TIMESERIES_DATA_URL}aggregate", query_string=query_string
+            )
+            assert ret.status_code == 200
+            assert ret.json == json.loads(expected_json)
+            ret = client.get(
+                f"{TIMESERIES_DATA_URL}aggregate",
+                query_string=query_string,
+                headers={"Accept": "text/csv"},
+            )
+            assert ret.status_code == 200
+            assert ret.data.decode("utf-8") == expected_csv
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            post_data(ts_1_id, dt.timedelta(hours=5), 700)
+            post_data(ts_2_id, dt.timedelta(hours=11), 200)
+
+            for width_value, width_unit in (
+                (1, "hour"),
+                (2, "hour"),
+                (6, "hour"),
+                (1, "day"),
+                (1, "week"),
+                (1, "month"),
+                (1, "year"),
+            ):
+                for aggregation in ("avg", "sum", "min", "max", "count"):
+                    for timezone in ("UTC", "Europe/Paris"):
+                        check_aggregate(
+                            (ts_1_id, ts_2_id),
+                            width_value,
+                            width_unit,
+                            aggregation,
+                            timezone,
+                        )
+
+            # POST and DELETE only invalidate rollups of modified periods
+            ret = client.post(
+                TIMESERIES_DATA_URL,
+                query_string={"data_state": ds_id},
+                json={str(ts_1_id): {"2020-02-10T12:30:00+00:00": 100}},
+            )
+            assert ret.status_code == 201
+            ret = client.delete(
+                TIMESERIES_DATA_URL,
+                query_string={
+                    "start_time": "2020-01-05T00:00:00+00:00",
+                    "end_time": "2020-01-07T00:00:00+00:00",
+                    "timeseries": (ts_2_id,),
+                    "data_state": ds_id,
+                },
+            )
+            assert ret.status_code == 204
+            # Only hourly blocks of modified days are computed from raw data,
+            # other blocks are rebuilt from cached blocks
+            with mock.patch.object(
+                rollups, "_query_hourly", wraps=rollups._query_hourly
+            ) as mock_query:
+                check_aggregate((ts_1_id, ts_2_id), 1, "year", "max", "UTC")
+            assert mock_query.call_count == 2
+            for call in mock_query.call_args_list:
+                _, start_dt, end_dt, _ = call.args
+                assert end_dt - start_dt <= dt.timedelta(days=3)
+            for width_unit in ("hour", "day", "month", "year"):
+                for timezone in ("UTC", "Europe/Paris"):
+                    check_aggregate((ts_1_id, ts_2_id), 1, width_unit, "max", timezone)
+                    check_aggregate((ts_1_id, ts_2_id), 1, width_unit, "avg", timezone)
+
+        # Permissions are checked
+        with AuthHeader(users["Active"]["creds"]):
+            ret = client.get(
+                f"{TIMESERIES_DATA_URL}aggregate",
+                query_string={
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "timeseries": (ts_2_id,),
+                    "data_state": ds_id,
+                    "bucket_width_value": 1,
+                    "bucket_width_unit": "day",
+                },
+            )
+            assert ret.status_code == 403
+
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
+    @pytest.mark.usefixtures("timeseries_by_data_states")
+    @pytest.mark.parametrize("for_campaign", (True, False))
+    @pytest.mark.parametrize("method", ("lttb", "minmax"))
+    def test_timeseries_data_get_downsample(
+        self, app, users, campaigns, timeseries, for_campaign, method
+    ):
+        ts_1_id = timeseries[0]
+        campaign_1_id = campaigns[0]
+        ds_id = 1
+        start_time = dt.datetime(2020, 1, 1, tzinfo=dt.UTC)
+        end_time = start_time + dt.timedelta(days=10)
+
+        client = app.test_client()
+
+        if not for_campaign:
+            query_url = TIMESERIES_DATA_URL
+            ts_l = (ts_1_id,)
+        else:
+            query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_1_id}/"
+            ts_l = (f"Timeseries {ts_1_id - 1}",)
+
+        # Triangle wave with a peak and a dip
+        values = {
+            (start_time + dt.timedelta(minutes=10 * i)).isoformat(): float(
+                abs(i % 100 - 50)
+            )
+            for i in range(1000)
+        }
+        values[(start_time + dt.timedelta(minutes=3000)).isoformat()] = 100.0
+        values[(start_time + dt.timedelta(minutes=6000)).isoformat()] = -100.0
+        first_ts, last_ts = min(values), max(values)
+
+        with AuthHeader(users["Active"]["creds"]):
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id},
+                json={str(ts_l[0]): values},
+            )
+            assert ret.status_code == 201
+
+            query_string = {
+                "start_time": start_time.isoformat(),
+                "end_time": end_time.isoformat(),
+                "timeseries": ts_l,
+                "data_state": ds_id,
+                "max_points": 50,
+                "downsample": method,
+            }
+
+            ret = client.get(query_url, query_string=query_string)
+            assert ret.status_code == 200
+            ret_values = ret.json[str(ts_l[0])]
+            assert len(ret_values) <= 50
+            assert all(values[k] == v for k, v in ret_values.items())
+            # Extrema are kept
+            assert max(ret_values.values()) == 100.0
+            assert min(ret_values.values()) == -100.0
+            if method == "lttb":
+                assert len(ret_values) == 50
+                assert first_ts in ret_values
+                assert last_ts in ret_values
+
+            ret = client.get(
+                query_url, query_string=query_string, headers={"Accept": "text/csv"}
+            )
+            assert ret.status_code == 200
+            csv_lines = ret.data.decode("utf-8").splitlines()
+            assert csv_lines[0] == f"Datetime,{ts_l[0]}"
+            assert len(csv_lines) == len(ret_values) + 1
+
+            # No downsampling if less values than max_points
+            ret = client.get(
+                query_url, query_string={**query_string, "max_points": 2000}
+            )
+            assert ret.status_code == 200
+            assert ret.json == {str(ts_l[0]): values}
+
+            # Batch
+            ret = client.post(
+                f"{query_url}batch",
+                json={
+                    "queries": [
+                        {
+                            "type": "raw",
+                            **query_string,
+                            "timeseries": list(ts_l),
+                        }
+                    ]
+                },
+            )
+            assert ret.status_code == 200
+            assert ret.json["results"][0]["data"] == {str(ts_l[0]): ret_values}
+
+            # Errors
+            for error_args in (
+                {"max_points": 2},
+                {"downsample": "dummy"},
+                {"stream": True},
+            ):
+                ret = client.get(query_url, query_string={**query_string, **error_args})
+                assert ret.status_code == 422
+
+    @pytest.mark.parametrize(
+        "app",
+        (TestConfig, CacheTestConfig, FileSystemCacheTestConfig),
+        indirect=True,
+    )
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
+    @pytest.mark.parametrize("for_campaign", (True, False))
+    @pytest.mark.parametrize("route", ("", "aggregate", "stats"))
+    def test_timeseries_data_get_etag(
+        self,
+        app,
+        users,
+        campaigns,
+        timeseries,
+        timeseries_data,
+        for_campaign,
+        route,
+        monkeypatch,
+    ):
+        start_time, end_time = timeseries_data
+        ts_1_id = timeseries[0]
+        ts_2_id = timeseries[1]
+        campaign_1_id = campaigns[0]
+        campaign_2_id = campaigns[1]
+        ds_id = 1
+
+        client = app.test_client()
+
+        query_string = {"data_state": ds_id}
+        if route != "stats":
+            query_string.update(
+                {
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                }
+            )
+        if route == "aggregate":
+            query_string.update(
+                {
+                    "bucket_width_value": 1,
+                    "bucket_width_unit": "hour",
+                }
+            )
+
+        def post_value(query_url, ts_l, timestamp):
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id},
+                json={str(ts_l[0]): {timestamp.isoformat(): 42}},
+            )
+            assert ret.status_code == 201
+
+        if not for_campaign:
+            query_url = TIMESERIES_DATA_URL
+            ts_l = (ts_1_id,)
+        else:
+            query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_1_id}/"
+            ts_l = (f"Timeseries {ts_1_id - 1}",)
+
+        with AuthHeader(users["Active"]["creds"]):
+            ret = client.get(
+                f"{query_url}{route}", query_string={**query_string, "timeseries": ts_l}
+            )
+            assert ret.status_code == 200
+            if app.config["CACHE_BACKEND"] != "filesystem" and route != "stats":
+                # No watermarks shared with other processes: no ETag
+                # (stats ETag is computed from response)
+                assert "ETag" not in ret.headers
+                return
+            etag = ret.headers["ETag"]
+
+            # Unchanged data: 304
+            ret = client.get(
+                f"{query_url}{route}",
+                query_string={**query_string, "timeseries": ts_l},
+                headers={"If-None-Match": etag},
+            )
+            assert ret.status_code == 304
+            assert not ret.data
+
+            # ETag depends on response format
+            ret = client.get(
+                f"{query_url}{route}",
+                query_string={**query_string, "timeseries": ts_l},
+                headers={"If-None-Match": etag, "Accept": "text/csv"},
+            )
+            if route == "stats":
+                assert ret.status_code == 304
+            else:
+                assert ret.status_code == 200
+
+            # Data written outside of interval: 304 (except for stats)
+            post_value(query_url, ts_l, end_time + dt.timedelta(days=2))
+            ret = client.get(
+                f"{query_url}{route}",
+                query_string={**query_string, "timeseries": ts_l},
+                headers={"If-None-Match": etag},
+            )
+            if route == "stats":
+                assert ret.status_code == 200
+                etag = ret.headers["ETag"]
+            else:
+                assert ret.status_code == 304
+
+            # Data written in interval: 200
+            post_value(query_url, ts_l, start_time + dt.timedelta(minutes=30))
+            ret = client.get(
+                f"{query_url}{route}",
+                query_string={**query_string, "timeseries": ts_l},
+                headers={"If-None-Match": etag},
+            )
+            assert ret.status_code == 200
+            assert ret.headers["ETag"] != etag
+            etag = ret.headers["ETag"]
+
+            # Data written in interval by a worker: 200
+            monkeypatch.setattr(cache, "_worker_stores", None)
+            cache.init_worker(app.config)
+            with OpenBar():
+                data_df = pd.DataFrame(
+                    {ts_1_id: [12.0]},
+                    index=pd.DatetimeIndex(
+                        [start_time + dt.timedelta(minutes=45)], name="timestamp"
+                    ),
+                )
+                tsdio.set_timeseries_data(data_df, TimeseriesDataState.get_by_id(ds_id))
+                db.session.commit()
+            ret = client.get(
+                f"{query_url}{route}",
+                query_string={**query_string, "timeseries": ts_l},
+                headers={"If-None-Match": etag},
+            )
+            assert ret.status_code == 200
+            assert ret.headers["ETag"] != etag
+
+        # Permissions are checked before ETag
+        if not for_campaign:
+            query_url = TIMESERIES_DATA_URL
+            ts_l = (ts_2_id,)
+        else:
+            query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_2_id}/"
+            ts_l = (f"Timeseries {ts_2_id - 1}",)
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = client.get(
+                f"{query_url}{route}", query_string={**query_string, "timeseries": ts_l}
+            )
+            assert ret.status_code == 200
+            etag = ret.headers["ETag"]
+        with AuthHeader(users["Active"]["creds"]):
+            ret = client.get(
+                f"{query_url}{route}",
+                query_string={**query_string, "timeseries": ts_l},
+                headers={"If-None-Match": etag},
+            )
+            assert ret.status_code == 403
+
+    @pytest.mark.parametrize("app", (TestConfig, BatchThreadsTestConfig), indirect=True)
+    @pytest.mark.parametrize("user", ("admin", "user", "anonym"))
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
+    @pytest.mark.parametrize("for_campaign", (True, False))
+    def test_timeseries_data_post_batch(
+        self,
+        app,
+        user,
+        users,
+        campaigns,
+        timeseries,
+        timeseries_data,
+        for_campaign,
+    ):
+        start_time, end_time = timeseries_data
+        ts_1_id = timeseries[0]
+        ts_2_id = timeseries[1]
+        campaign_1_id = campaigns[0]
+        campaign_2_id = campaigns[1]
+        ds_id = 1
+
+        if user == "admin":
+            creds = users["Chuck"]["creds"]
+            auth_context = AuthHeader(creds)
+        elif user == "user":
+            creds = users["Active"]["creds"]
+            auth_context = AuthHeader(creds)
+        else:
+            auth_context = contextlib.nullcontext()
+
+        client = app.test_client()
+
+        def make_queries(ts_l):
+            return [
+                {
+                    "type": "raw",
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                },
+                {
+                    "type": "aggregate",
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "bucket_width_value": 1,
+                    "bucket_width_unit": "day",
+                    "aggregation": "sum",
+                },
+                {
+                    "type": "stats",
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                },
+            ]
+
+        with auth_context:
+            if not for_campaign:
+                query_url = f"{TIMESERIES_DATA_URL}batch"
+                ts_l = [ts_1_id]
+                other_ts_l = [ts_2_id]
+                unknown_ts_l = [DUMMY_ID]
+            else:
+                query_url = f"{TIMESERIES_DATA_URL}campaign/{campaign_1_id}/batch"
+                ts_l = [f"Timeseries {ts_1_id - 1}"]
+                # Timeseries 1 is not in campaign 1
+                other_ts_l = [f"Timeseries {ts_2_id - 1}"]
+                unknown_ts_l = ["Dummy"]
+
+            queries = make_queries(ts_l) + [
+                {
+                    "type": "raw",
+                    "timeseries": other_ts_l,
+                    "data_state": ds_id,
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                },
+                {
+                    "type": "stats",
+                    "timeseries": unknown_ts_l,
+                    "data_state": ds_id,
+                },
+                {
+                    "type": "stats",
+                    "timeseries": ts_l,
+                    "data_state": int(DUMMY_ID),
+                },
+            ]
+            ret = client.post(query_url, json={"queries": queries})
+            if user == "anonym":
+                assert ret.status_code == 401
+            else:
+                assert ret.status_code == 200
+                results = ret.json["results"]
+                assert len(results) == 6
+                assert results[0] == {
+                    "status": 200,
+                    "data": {
+                        str(ts_l[0]): {
+                            "2020-01-01T00:00:00+00:00": 0.0,
+                            "2020-01-01T01:00:00+00:00": 1.0,
+                            "2020-01-01T02:00:00+00:00": 2.0,
+                            "2020-01-01T03:00:00+00:00": 3.0,
+                        }
+                    },
+                }
+                assert results[1] == {
+                    "status": 200,
+                    "data": {str(ts_l[0]): {"2020-01-01T00:00:00+00:00": 6.0}},
+                }
+                assert results[2]["status"] == 200
+                assert results[2]["data"]["stats"][str(ts_l[0])]["count"] == 4
+                if for_campaign:
+                    assert results[3]["status"] == 422
+                elif user == "admin":
+                    assert results[3]["status"] == 200
+                else:
+                    assert results[3]["status"] == 403
+                assert results[4]["status"] == 422
+                assert "Unknown timeseries" in results[4]["message"]
+                assert results[5] == {"status": 422, "message": "Unknown data state ID"}
+
+                # Each result is the same as GET resource result
+                ret = client.get(
+                    query_url[: -len("batch")],
+                    query_string={
+                        "timeseries": ts_l,
+                        "data_state": ds_id,
+                        "start_time": start_time.isoformat(),
+                        "end_time": end_time.isoformat(),
+                    },
+                )
+                assert ret.json == results[0]["data"]
+
+            if not for_campaign:
+                query_url = f"{TIMESERIES_DATA_URL}batch"
+                ts_l = [ts_2_id]
+            else:
+                query_url = f"{TIMESERIES_DATA_URL}campaign/{campaign_2_id}/batch"
+                ts_l = [f"Timeseries {ts_2_id - 1}"]
+
+            ret = client.post(query_url, json={"queries": make_queries(ts_l)})
+            if user == "anonym":
+                assert ret.status_code == 401
+            elif user == "user":
+                if for_campaign:
+                    assert ret.status_code == 403
+                else:
+                    assert ret.status_code == 200
+                    assert all(res["status"] == 403 for res in ret.json["results"])
+            else:
+                assert ret.status_code == 200
+                assert all(res["status"] == 200 for res in ret.json["results"])
+
+            # Invalid queries
+            for queries in (
+                [],
+                [{"type": "dummy"}],
+                [{"type": "stats", "timeseries": ts_l}],
+                make_queries(ts_l) * 34,
+            ):
+                ret = client.post(query_url, json={"queries": queries})
+                if user == "anonym":
+                    assert ret.status_code == 401
+                else:
+                    assert ret.status_code == 422
+
+    @pytest.mark.parametrize("user", ("admin", "user", "anonym"))
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
+    @pytest.mark.parametrize("for_campaign", (True, False))
+    @pytest.mark.parametrize("mime_type", ("application/json", "text/csv"))
+    def test_timeseries_data_post(
+        self, app, user, users, campaigns, timeseries, for_campaign, mime_type
+    ):
+        ts_1_id = timeseries[0]
+        ts_2_id = timeseries[1]
+        campaign_1_id = campaigns[0]
+        campaign_2_id = campaigns[1]
+        ds_id = 1
+
+        if user == "admin":
+            creds = users["Chuck"]["creds"]
+            auth_context = AuthHeader(creds)
         elif user == "user":
             creds = users["Active"]["creds"]
             auth_context = AuthHeader(creds)
@@ -1139,6 +2235,324 @@ class TestTimeseriesDataApi:
             )
             assert ret.status_code == 422
 
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
+    @pytest.mark.parametrize("for_campaign", (True, False))
+    @pytest.mark.parametrize("mime_type", ("application/json", "text/csv"))
+    def test_timeseries_data_post_stream(
+        self, app, users, campaigns, timeseries, for_campaign, mime_type
+    ):
+        ts_1_id = timeseries[0]
+        ts_2_id = timeseries[1]
+        campaign_1_id = campaigns[0]
+        campaign_2_id = campaigns[1]
+        ds_id = 1
+
+        app.config["TIMESERIES_DATA_IMPORT_BATCH_SIZE"] = 2
+
+        def make_payload(label, values):
+            if mime_type == "text/csv":
+                return f"Datetime,{label}\n" + "".join(
+                    f"2020-01-01T0{i}:00:00+00:00,{val}\n"
+                    for i, val in enumerate(values)
+                )
+            return json.dumps(
+                {
+                    str(label): {
+                        f"2020-01-01T0{i}:00:00+00:00": val
+                        for i, val in enumerate(values)
+                    }
+                }
+            )
+
+        client = app.test_client()
+
+        with AuthHeader(users["Active"]["creds"]):
+            if not for_campaign:
+                query_url = TIMESERIES_DATA_URL
+                ts_l = (ts_1_id,)
+            else:
+                query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_1_id}/"
+                ts_l = (f"Timeseries {ts_1_id - 1}",)
+
+            # Second batch contains an invalid value
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id, "stream": True},
+                data=make_payload(ts_l[0], (0, 1, 2, "dummy", 4)),
+                headers={"content-type": mime_type},
+            )
+            assert ret.status_code == 200
+            assert ret.json["row_count"] == 3
+            assert ret.json["batch_count"] == 3
+            assert len(ret.json["errors"]) == 1
+            assert ret.json["errors"][0]["batch"] == 1
+            ret = client.get(
+                query_url,
+                query_string={
+                    "start_time": "2020-01-01T00:00:00+00:00",
+                    "end_time": "2020-01-01T05:00:00+00:00",
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                },
+            )
+            assert ret.json == {
+                str(ts_l[0]): {
+                    "2020-01-01T00:00:00+00:00": 0.0,
+                    "2020-01-01T01:00:00+00:00": 1.0,
+                    "2020-01-01T04:00:00+00:00": 4.0,
+                }
+            }
+
+            # Empty payload
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id, "stream": True},
+                data=make_payload(ts_l[0], ()),
+                headers={"content-type": mime_type},
+            )
+            assert ret.status_code == 200
+            assert ret.json == {"row_count": 0, "batch_count": 0, "errors": []}
+
+            # Unknown timeseries
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id, "stream": True},
+                data=make_payload(DUMMY_ID, (0, 1, 2)),
+                headers={"content-type": mime_type},
+            )
+            assert ret.status_code == 422
+
+            # Unknown timeseries is checked before its values are inserted
+            if mime_type == "application/json":
+                payload = json.loads(make_payload(ts_l[0], (5,)))
+                payload.update(json.loads(make_payload(DUMMY_ID, (0, 1, 2))))
+                with mock.patch.object(
+                    ingestion.tsdjsonio,
+                    "import_json",
+                    wraps=ingestion.tsdjsonio.import_json,
+                ) as import_json_mock:
+                    ret = client.post(
+                        query_url,
+                        query_string={"data_state": ds_id, "stream": True},
+                        data=json.dumps(payload),
+                        headers={"content-type": mime_type},
+                    )
+                assert ret.status_code == 422
+                # Only timeseries were checked, no batch was inserted
+                assert [
+                    json.loads(call.args[0]) for call in import_json_mock.call_args_list
+                ] == [{str(ts_l[0]): {}}, {str(DUMMY_ID): {}}]
+
+            # Truncated payload
+            if mime_type == "application/json":
+                ret = client.post(
+                    query_url,
+                    query_string={"data_state": ds_id, "stream": True},
+                    data=make_payload(ts_l[0], (0, 1, 2))[:-4],
+                    headers={"content-type": mime_type},
+                )
+                assert ret.status_code == 200
+                assert ret.json["row_count"] == 2
+                assert ret.json["errors"] == [
+                    {"batch": 1, "message": "Wrong JSON file"}
+                ]
+
+            # Invalid encoding
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id, "stream": True},
+                data=bytes.fromhex("2Ef0"),
+                headers={"content-type": mime_type},
+            )
+            if mime_type == "text/csv":
+                assert ret.status_code == 422
+            else:
+                assert ret.status_code == 200
+                assert ret.json["row_count"] == 0
+                assert len(ret.json["errors"]) == 1
+
+            # User not in Timeseries group
+            if not for_campaign:
+                query_url = TIMESERIES_DATA_URL
+                ts_l = (ts_2_id,)
+            else:
+                query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_2_id}/"
+                ts_l = (f"Timeseries {ts_2_id - 1}",)
+
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id, "stream": True},
+                data=make_payload(ts_l[0], (0, 1, 2)),
+                headers={"content-type": mime_type},
+            )
+            # Campaign and timeseries are checked before inserting data
+            assert ret.status_code == 403
+
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
+    @pytest.mark.parametrize("for_campaign", (True, False))
+    @pytest.mark.parametrize(
+        "mime_type",
+        ("application/vnd.apache.arrow.stream", "application/vnd.apache.parquet"),
+    )
+    def test_timeseries_data_post_columnar(
+        self, app, users, campaigns, timeseries, for_campaign, mime_type
+    ):
+        ts_1_id = timeseries[0]
+        ts_2_id = timeseries[1]
+        campaign_1_id = campaigns[0]
+        campaign_2_id = campaigns[1]
+        ds_id = 1
+
+        def make_payload(table):
+            sink = pa.BufferOutputStream()
+            if mime_type == "application/vnd.apache.parquet":
+                pq.write_table(table, sink)
+            else:
+                with pa.ipc.new_stream(sink, table.schema) as writer:
+                    writer.write_table(table)
+            return sink.getvalue().to_pybytes()
+
+        timestamps = pa.array(
+            [dt.datetime(2020, 1, 1, i, tzinfo=dt.UTC) for i in range(4)],
+            type=pa.timestamp("us", tz="Europe/Paris"),
+        )
+
+        client = app.test_client()
+
+        with AuthHeader(users["Active"]["creds"]):
+            if not for_campaign:
+                query_url = TIMESERIES_DATA_URL
+                ts_l = (ts_1_id,)
+            else:
+                query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_1_id}/"
+                ts_l = (f"Timeseries {ts_1_id - 1}",)
+
+            table = pa.table(
+                {"Datetime": timestamps, str(ts_l[0]): pa.array([0, 1, None, 3])}
+            )
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id},
+                data=make_payload(table),
+                headers={"content-type": mime_type},
+            )
+            assert ret.status_code == 201
+            ret = client.get(
+                query_url,
+                query_string={
+                    "start_time": "2020-01-01T00:00:00+00:00",
+                    "end_time": "2020-01-01T04:00:00+00:00",
+                    "timeseries": ts_l,
+                    "data_state": ds_id,
+                },
+            )
+            assert ret.json == {
+                str(ts_l[0]): {
+                    "2020-01-01T00:00:00+00:00": 0.0,
+                    "2020-01-01T01:00:00+00:00": 1.0,
+                    "2020-01-01T03:00:00+00:00": 3.0,
+                }
+            }
+
+            # Round trip
+            ret = client.get(
+                query_url,
+                query_string={
+                    "start_time": "2020-01-01T00:00:00+00:00",
+                    "end_time": "2020-01-01T04:00:00+00:00",
+                    "timeseries": ts_l,
+                    "data_state": 2,
+                },
+                headers={"Accept": mime_type},
+            )
+            assert ret.status_code == 200
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id},
+                data=ret.data,
+                headers={"content-type": mime_type},
+            )
+            assert ret.status_code == 201
+
+            # Naive timestamps
+            table = pa.table(
+                {
+                    "Datetime": pa.array(
+                        [dt.datetime(2020, 1, 1)], type=pa.timestamp("us")
+                    ),
+                    str(ts_l[0]): pa.array([0.0]),
+                }
+            )
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id},
+                data=make_payload(table),
+                headers={"content-type": mime_type},
+            )
+            assert ret.status_code == 422
+
+            # Missing Datetime column
+            table = pa.table({str(ts_l[0]): pa.array([0.0])})
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id},
+                data=make_payload(table),
+                headers={"content-type": mime_type},
+            )
+            assert ret.status_code == 422
+
+            # Invalid values
+            table = pa.table(
+                {"Datetime": timestamps[:1], str(ts_l[0]): pa.array(["dummy"])}
+            )
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id},
+                data=make_payload(table),
+                headers={"content-type": mime_type},
+            )
+            assert ret.status_code == 422
+
+            # Unknown timeseries
+            table = pa.table({"Datetime": timestamps[:1], DUMMY_ID: pa.array([0.0])})
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id},
+                data=make_payload(table),
+                headers={"content-type": mime_type},
+            )
+            assert ret.status_code == 422
+
+            # Invalid file
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id},
+                data=b"Dummy",
+                headers={"content-type": mime_type},
+            )
+            assert ret.status_code == 422
+
+            # User not in Timeseries group
+            if not for_campaign:
+                query_url = TIMESERIES_DATA_URL
+                ts_l = (ts_2_id,)
+            else:
+                query_url = TIMESERIES_DATA_URL + f"campaign/{campaign_2_id}/"
+                ts_l = (f"Timeseries {ts_2_id - 1}",)
+
+            table = pa.table({"Datetime": timestamps, str(ts_l[0]): pa.array([0] * 4)})
+            ret = client.post(
+                query_url,
+                query_string={"data_state": ds_id},
+                data=make_payload(table),
+                headers={"content-type": mime_type},
+            )
+            assert ret.status_code == 403
+
     @pytest.mark.parametrize("user", ("admin", "user", "anonym"))
     @pytest.mark.usefixtures("users_by_user_groups")
     @pytest.mark.usefixtures("user_groups_by_campaigns")
@@ -1348,3 +2762,171 @@ class TestTimeseriesDataApi:
             )
             assert ret.status_code == 422
             assert ret.json["message"].startswith("Unknown timeseries")
+
+    @pytest.mark.usefixtures("users_by_user_groups")
+    @pytest.mark.usefixtures("user_groups_by_campaigns")
+    @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
+    @pytest.mark.parametrize("export_format", ("csv", "parquet"))
+    def test_timeseries_data_export(
+        self,
+        app,
+        users,
+        timeseries,
+        timeseries_data,
+        export_format,
+        tmp_path,
+        monkeypatch,
+    ):
+        start_time, end_time = timeseries_data
+        ts_1_id = timeseries[0]
+        ts_2_id = timeseries[1]
+        ds_id = 1
+
+        client = app.test_client()
+
+        payload = {
+            "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat(),
+            "timeseries": [ts_1_id],
+            "data_state": ds_id,
+            "format": export_format,
+        }
+
+        # Exports disabled
+        with AuthHeader(users["Active"]["creds"]):
+            ret = client.post(f"{TIMESERIES_DATA_URL}exports/", json=payload)
+            assert ret.status_code == 501
+
+        app.config["TIMESERIES_DATA_EXPORT_DIR"] = str(tmp_path)
+        delayed = []
+        monkeypatch.setattr(
+            exports.export_task,
+            "delay",
+            lambda *args, **kwargs: delayed.append((args, kwargs)),
+        )
+
+        with AuthHeader(users["Active"]["creds"]):
+            ret = client.post(f"{TIMESERIES_DATA_URL}exports/", json=payload)
+            assert ret.status_code == 202
+            job = ret.json
+            assert job["status"] == "pending"
+            assert job["format"] == export_format
+            job_url = f"{TIMESERIES_DATA_URL}exports/{job['id']}"
+
+            ret = client.get(job_url)
+            assert ret.status_code == 200
+            assert ret.json == job
+
+            # Job not done
+            ret = client.get(f"{job_url}/file")
+            assert ret.status_code == 409
+
+            # Run task
+            (args, kwargs) = delayed.pop()
+            exports.export_task.apply(args=args, kwargs=kwargs)
+
+            ret = client.get(job_url)
+            assert ret.status_code == 200
+            assert ret.json["status"] == "done"
+            size = ret.json["size"]
+
+            ret = client.get(f"{job_url}/file")
+            assert ret.status_code == 200
+            assert len(ret.data) == size
+            assert "attachment" in ret.headers["Content-Disposition"]
+            if export_format == "csv":
+                assert ret.mimetype == "application/gzip"
+                assert gzip.decompress(ret.data).decode("utf-8") == (
+                    "Datetime,1\n"
+                    "2020-01-01T00:00:00+0000,0.0\n"
+                    "2020-01-01T01:00:00+0000,1.0\n"
+                    "2020-01-01T02:00:00+0000,2.0\n"
+                    "2020-01-01T03:00:00+0000,3.0\n"
+                )
+            else:
+                assert ret.mimetype == "application/vnd.apache.parquet"
+                table = pq.read_table(pa.BufferReader(ret.data))
+                assert table.column("1").to_pylist() == [0.0, 1.0, 2.0, 3.0]
+
+            # Range request
+            ret = client.get(f"{job_url}/file", headers={"Range": "bytes=10-"})
+            assert ret.status_code == 206
+            assert len(ret.data) == size - 10
+
+        # Admin can access job
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = client.get(job_url)
+            assert ret.status_code == 200
+
+        with AuthHeader(users["Active"]["creds"]):
+            # Forbidden timeseries
+            ret = client.post(
+                f"{TIMESERIES_DATA_URL}exports/",
+                json={**payload, "timeseries": [ts_2_id]},
+            )
+            assert ret.status_code == 403
+            assert not delayed
+
+            # Unknown or invalid job ID
+            for job_id in ("dummy", "0" * 32):
+                ret = client.get(f"{TIMESERIES_DATA_URL}exports/{job_id}")
+                assert ret.status_code == 404
+
+            ret = client.delete(job_url)
+            assert ret.status_code == 204
+            ret = client.get(job_url)
+            assert ret.status_code == 404
+
+        # Failed job
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = client.post(f"{TIMESERIES_DATA_URL}exports/", json=payload)
+            assert ret.status_code == 202
+            job_url = f"{TIMESERIES_DATA_URL}exports/{ret.json['id']}"
+            (args, kwargs) = delayed.pop()
+            kwargs["convert_to"] = [(ts_1_id, "dummy")]
+            exports.export_task.apply(args=args, kwargs=kwargs)
+            ret = client.get(job_url)
+            assert ret.json["status"] == "failed"
+            assert ret.json["message"]
+
+        # Other user can't access job
+        with AuthHeader(users["Active"]["creds"]):
+            ret = client.get(job_url)
+            assert ret.status_code == 403
+
+        # Expired jobs are deleted when a job is started, pending jobs are kept
+        app.config["TIMESERIES_DATA_EXPORT_RETENTION"] = 0
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = client.post(f"{TIMESERIES_DATA_URL}exports/", json=payload)
+            assert ret.status_code == 202
+            pending_job_url = f"{TIMESERIES_DATA_URL}exports/{ret.json['id']}"
+            ret = client.post(f"{TIMESERIES_DATA_URL}exports/", json=payload)
+            assert ret.status_code == 202
+            ret = client.get(job_url)
+            assert ret.status_code == 404
+            ret = client.get(pending_job_url)
+            assert ret.status_code == 200
+
+    def test_timeseries_data_export_parquet_error(self, tmp_path):
+        start_dt = dt.datetime(2020, 1, 1, tzinfo=dt.UTC)
+        data_df = pd.DataFrame(
+            {1: [0.0]}, index=pd.DatetimeIndex([start_dt], name="Datetime")
+        )
+        path = tmp_path / "data.parquet"
+        with mock.patch.object(
+            exports.tsdio, "get_timeseries_data", side_effect=(data_df, ValueError)
+        ):
+            # Keep traceback, hence writer, alive: writer is not closed on delete
+            with pytest.raises(ValueError) as excinfo:
+                exports._write_parquet(
+                    path,
+                    start_dt,
+                    start_dt + dt.timedelta(hours=2),
+                    [],
+                    None,
+                    chunk_size=3600,
+                    compression=None,
+                )
+        # Writer is closed: first row group is readable
+        assert pq.read_table(path).column("1").to_pylist() == [0.0]
+        del excinfo
@@ -141,6 +141,55 @@ class TestTimeseriesPropertyDataApi:
             ret = client.get(f"{TIMESERIES_PROPERTY_DATA_URL}{tsg_1_id}")
             assert ret.status_code == 404
 
+    def test_timeseries_property_data_bulk_api(
+        self, app, users, timeseries_properties, timeseries
+    ):
+        tsp_1_id = timeseries_properties[0]
+        tsp_2_id = timeseries_properties[1]
+
+        client = app.test_client()
+
+        with AuthHeader(users["Chuck"]["creds"]):
+            ret = client.post(
+                f"{TIMESERIES_PROPERTY_DATA_URL}bulk",
+                json=[
+                    {"timeseries_id": ts_id, "property_id": tsp_id, "value": value}
+                    for ts_id, tsp_id, value in (
+                        (timeseries[0], tsp_1_id, "12"),
+                        (timeseries[0], tsp_2_id, "wrong type"),
+                        (timeseries[1], tsp_1_id, "42"),
+                    )
+                ],
+            )
+            assert ret.status_code == 200
+            ret_val = ret.json
+            assert [res["status"] for res in ret_val] == [201, 422, 201]
+            assert ret_val[1]["errors"] == {"value": ["Invalid type."]}
+            tspd_1_id = ret_val[0]["id"]
+
+            ret = client.put(
+                f"{TIMESERIES_PROPERTY_DATA_URL}bulk",
+                json=[
+                    {
+                        "id": tspd_1_id,
+                        "timeseries_id": timeseries[0],
+                        "property_id": tsp_1_id,
+                        "value": "24",
+                    }
+                ],
+            )
+            assert ret.status_code == 200
+            assert ret.json[0]["status"] == 200
+            assert ret.json[0]["item"]["value"] == "24"
+
+            ret = client.delete(
+                f"{TIMESERIES_PROPERTY_DATA_URL}bulk", json={"ids": [tspd_1_id]}
+            )
+            assert ret.status_code == 200
+            assert ret.json == [{"status": 204, "id": tspd_1_id}]
+            ret = client.get(TIMESERIES_PROPERTY_DATA_URL)
+            assert len(ret.json) == 1
+
     @pytest.mark.usefixtures("users_by_user_groups")
     @pytest.mark.usefixtures("user_groups_by_campaign_scopes")
     def test_timeseries_property_data_as_user_api(
@@ -0,0 +1,142 @@
+"""Test sampling profiler"""
+
+import functools
+import pstats
+import time
+
+import flask
+
+from bemserver_api.profiling import SamplingProfilerMiddleware
+
+
+class TestSamplingProfiler:
+    def test_sampling_profiler(self, app, tmp_path):
+        wsgi_app = app.wsgi_app
+        client = app.test_client()
+        # Profiles are added when responses are closed, as WSGI servers do
+        get = functools.partial(client.get, buffered=True)
+
+        @app.get("/slow")
+        def slow():
+            time.sleep(0.05)
+            return ""
+
+        def list_files(suffix):
+            return sorted(p for p in tmp_path.iterdir() if p.suffix == suffix)
+
+        # Profile 1 in 2 requests, write stats for each profiled request
+        middleware = SamplingProfilerMiddleware(
+            app, wsgi_app, tmp_path, sample_rate=2, dump_interval=0, max_files=2
+        )
+        app.wsgi_app = middleware
+        for _ in range(3):
+            ret = get("/about/")
+            assert ret.status_code == 200
+            assert ret.json["versions"]
+        prof_files = list_files(".prof")
+        assert len(prof_files) == 2
+        stats = pstats.Stats(str(prof_files[-1]))
+        assert any(func[2] == "about" for func in stats.stats)
+
+        # Files are rotated
+        for _ in range(2):
+            get("/about/")
+        assert len(list_files(".prof")) == 2
+        assert prof_files[0] not in list_files(".prof")
+
+        # Endpoint selection
+        for path in tmp_path.iterdir():
+            path.unlink()
+        app.wsgi_app = SamplingProfilerMiddleware(
+            app, wsgi_app, tmp_path, endpoints=["About.about"], dump_interval=0
+        )
+        get("/users/")
+        get("/dummy/")
+        assert not list_files(".prof")
+        get("/about/")
+        assert len(list_files(".prof")) == 1
+
+        # Slow requests only
+        for path in tmp_path.iterdir():
+            path.unlink()
+        app.wsgi_app = SamplingProfilerMiddleware(
+            app, wsgi_app, tmp_path, min_duration=60, dump_interval=0
+        )
+        get("/about/")
+        assert not list_files(".prof")
+
+        # Aggregated stats
+        app.wsgi_app = SamplingProfilerMiddleware(
+            app, wsgi_app, tmp_path, dump_interval=60
+        )
+        get("/about/")
+        get("/about/")
+        assert not list_files(".prof")
+
+        # Collapsed stacks
+        app.wsgi_app = SamplingProfilerMiddleware(
+            app, wsgi_app, tmp_path, dump_interval=0, stacks_interval=0.001
+        )
+
+        get("/slow")
+        (folded_file,) = list_files(".folded")
+        lines = folded_file.read_text().splitlines()
+        assert lines
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert any("slow (" in line for line in lines)
+
+    def test_sampling_profiler_streamed_response(self, app, tmp_path):
+        steps = []
+
+        @app.get("/stream")
+        def stream():
+            def generate():
+                for i in range(3):
+                    steps.append(i)
+                    yield f"{i}\n"
+
+            return flask.Response(generate())
+
+        profile_dir = tmp_path / "profiles"
+        middleware = SamplingProfilerMiddleware(
+            app, app.wsgi_app, profile_dir, dump_interval=0
+        )
+        app.wsgi_app = middleware
+        client = app.test_client()
+
+        # Response is not buffered
+        ret = client.get("/stream", buffered=False)
+        assert ret.is_streamed
+        chunks = ret.iter_encoded()
+        assert next(chunks) == b"0\n"
+        assert steps == [0]
+        assert not list(profile_dir.iterdir())
+        assert b"".join(chunks) == b"1\n2\n"
+
+        # Profile is written when response is closed
+        ret.close()
+        (prof_file,) = profile_dir.iterdir()
+        stats = pstats.Stats(str(prof_file))
+        assert any(func[2] == "generate" for func in stats.stats)
+
+    def test_sampling_profiler_flush(self, app, tmp_path):
+        profile_dir = tmp_path / "profiles"
+        middleware = SamplingProfilerMiddleware(
+            app, app.wsgi_app, profile_dir, dump_interval=1
+        )
+        app.wsgi_app = middleware
+        client = app.test_client()
+
+        client.get("/about/", buffered=True)
+        assert not list(profile_dir.iterdir())
+        # Stats are written at the end of the interval without further requests
+        middleware._timer.join(timeout=5)
+        assert len(list(profile_dir.iterdir())) == 1
+
+        # Stats are written on flush (e.g. at exit)
+        client.get("/about/", buffered=True)
+        middleware.flush()
+        assert len(list(profile_dir.iterdir())) == 2
+        # Nothing to write
+        middleware.flush()
+        assert len(list(profile_dir.iterdir())) == 2